@@ -0,0 +1,84 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+"""store the contact fields as jsonb
+
+Revision ID: 1b11995c4253
+Revises: 4f76dc8ffb57
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+# revision identifiers, used by Alembic.
+revision = '1b11995c4253'
+down_revision = '4f76dc8ffb57'
+
+contact_table_name = 'dird_contact'
+fields_table_name = 'dird_contact_fields'
+search_index_name = 'dird_contact__idx__search'
+
+
+def upgrade():
+    op.execute('''
+        CREATE OR REPLACE FUNCTION dird_unaccent(text) RETURNS text
+            AS $$ SELECT public.unaccent('public.unaccent', $1) $$
+            LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+        CREATE OR REPLACE FUNCTION dird_contact_search(jsonb) RETURNS text
+            AS $$ SELECT coalesce(dird_unaccent(string_agg(value, ' ')), '')
+                  FROM jsonb_each_text($1) $$
+            LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+        ''')
+    op.add_column(
+        contact_table_name,
+        sa.Column(
+            'fields',
+            JSONB,
+            nullable=False,
+            server_default=sa.text("'{}'::jsonb"),
+        ),
+    )
+    op.execute('''
+        UPDATE dird_contact SET fields = contact_fields.fields
+        FROM (
+            SELECT contact_uuid, jsonb_object_agg(name, value) AS fields
+            FROM dird_contact_fields
+            WHERE name != 'id'
+            GROUP BY contact_uuid
+        ) AS contact_fields
+        WHERE dird_contact.uuid = contact_fields.contact_uuid
+        ''')
+    op.execute('''
+        CREATE INDEX {index} ON {table}
+            USING gin (dird_contact_search(fields) gin_trgm_ops)
+        '''.format(index=search_index_name, table=contact_table_name))
+    op.drop_table(fields_table_name)
+
+
+def downgrade():
+    op.create_table(
+        fields_table_name,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('name', sa.Text(), nullable=False, index=True),
+        sa.Column('value', sa.Text(), index=True),
+        sa.Column(
+            'contact_uuid',
+            sa.String(38),
+            sa.ForeignKey('dird_contact.uuid', ondelete='CASCADE'),
+            nullable=False,
+        ),
+    )
+    op.execute('''
+        INSERT INTO dird_contact_fields (name, value, contact_uuid)
+        SELECT 'id', uuid, uuid FROM dird_contact
+        UNION ALL
+        SELECT contact_field.key, contact_field.value, dird_contact.uuid
+        FROM dird_contact, jsonb_each_text(dird_contact.fields) AS contact_field
+        ''')
+    op.drop_index(search_index_name, table_name=contact_table_name)
+    op.drop_column(contact_table_name, 'fields')
+    op.execute('''
+        DROP FUNCTION dird_contact_search(jsonb);
+        DROP FUNCTION dird_unaccent(text);
+        ''')
@@ -320,6 +320,13 @@ class BaseDirdIntegrationTest(AutoConfiguredDirdTestCase):
         assert_that(response.status_code, equal_to(200))
         return response.text
 
+    @classmethod
+    def export_personal_ndjson(cls, token=VALID_TOKEN_MAIN_TENANT):
+        url = cls.url('personal')
+        response = cls.get(url, params={'format': 'application/x-ndjson'}, token=token)
+        assert_that(response.status_code, equal_to(200))
+        return response.text
+
     @classmethod
     def get_personal_result(cls, personal_id, token=None):
         url = cls.url('personal', personal_id)
@@ -4,7 +4,6 @@
 import functools
 import unittest
 
-from collections import defaultdict
 from contextlib import closing, contextmanager
 from uuid import uuid4
 from hamcrest import (
@@ -122,24 +121,18 @@ class _BaseTest(unittest.TestCase):
         with closing(Session()) as session:
             for contact in contacts:
                 hash_ = base.compute_contact_hash(contact)
-                dird_contact = database.Contact(user_uuid=user_uuid, hash=hash_)
+                dird_contact = database.Contact(
+                    user_uuid=user_uuid, hash=hash_, fields=contact
+                )
                 session.add(dird_contact)
                 session.flush()
                 ids.append(dird_contact.uuid)
-                for name, value in contact.items():
-                    field = database.ContactFields(
-                        name=name, value=value, contact_uuid=dird_contact.uuid
-                    )
-                    session.add(field)
                 session.commit()
         return ids
 
     def _list_contacts(self):
         with closing(Session()) as s:
-            contacts = defaultdict(dict)
-            for field in s.query(database.ContactFields).all():
-                contacts[field.contact_uuid][field.name] = field.value
-        return list(contacts.values())
+            return [contact for (contact,) in s.query(base.contact_document()).all()]
 
 
 class _BasePhonebookCRUDTest(_BaseTest):
@@ -695,6 +688,29 @@ class TestPhonebookContactImport(_BasePhonebookContactCRUDTest):
         )
         assert_that(errors, contains_inanyorder(has_entries(**contact_2)))
 
+    def test_that_existing_and_invalid_contacts_fail_in_any_batch(self):
+        existing = self._crud.create(
+            self._tenant_uuid,
+            self._phonebook_id,
+            self._new_contact('Foo', 'Bar', '5555551111'),
+        )
+        contact_1 = self._new_contact('Alice', 'AAA', '5555552222')
+        contact_2 = self._new_contact('Foo', 'Bar', '5555551111')
+        contact_3 = self._new_contact('Bob', 'BBB', '5555553333')
+        contact_4 = self._new_contact('Null', 'Char\x00', '5555554444')
+        body = [contact_1, contact_2, contact_3, contact_4]
+
+        created, errors = self._crud.create_many(
+            self._tenant_uuid, self._phonebook_id, body, batch_size=2
+        )
+
+        assert_that(
+            created,
+            contains(has_entries(**contact_1), has_entries(**contact_3)),
+        )
+        assert_that(errors, contains_inanyorder(contact_2, contact_4))
+        assert_that(self._list_contacts(), has_items(existing, *created))
+
     @staticmethod
     def _new_contact(firstname, lastname, number):
         return {'firstname': firstname, 'lastname': lastname, 'number': number}
@@ -872,6 +888,54 @@ class TestPhonebookContactCRUDList(_BasePhonebookContactCRUDTest):
 
         assert_that(result, contains_inanyorder(self._contact_1, self._contact_2))
 
+    def test_that_the_list_can_be_paginated(self):
+        result = self._crud.list(
+            self._tenant_uuid, self._phonebook_id, order='name', limit=2, offset=1
+        )
+
+        assert_that(result, contains(self._contact_3, self._contact_2))
+
+    def test_that_the_list_can_start_after_a_contact(self):
+        result = self._crud.list(
+            self._tenant_uuid,
+            self._phonebook_id,
+            order='name',
+            direction='desc',
+            after=self._contact_2['id'],
+        )
+
+        assert_that(result, contains(self._contact_3, self._contact_1))
+
+    def test_that_the_list_cannot_start_after_an_unknown_contact(self):
+        assert_that(
+            calling(self._crud.list).with_args(
+                self._tenant_uuid, self._phonebook_id, after=new_uuid()
+            ),
+            raises(exception.InvalidArgumentError),
+        )
+        assert_that(
+            calling(self._crud.list_and_count).with_args(
+                self._tenant_uuid, self._phonebook_id, after=new_uuid()
+            ),
+            raises(exception.InvalidArgumentError),
+        )
+
+    def test_that_the_list_can_be_counted(self):
+        result = self._crud.list_and_count(
+            self._tenant_uuid, self._phonebook_id, search='o', limit=1
+        )
+
+        assert_that(
+            result, contains(contains(any_of(self._contact_1, self._contact_2)), 2)
+        )
+
+    def test_that_an_empty_page_is_counted(self):
+        result = self._crud.list_and_count(
+            self._tenant_uuid, self._phonebook_id, offset=3
+        )
+
+        assert_that(result, contains(empty(), 3))
+
 
 class TestPhonebookContactCRUDCount(_BasePhonebookContactCRUDTest):
     def setUp(self):
@@ -925,6 +989,23 @@ class TestContactCRUD(_BaseTest):
         contact_list = self._crud.list_personal_contacts(user_uuid)
         assert_that(contact_list, contains(expected(self.contact_1)))
 
+    @with_user_uuid
+    def test_that_a_closed_export_releases_its_connection(self, user_uuid):
+        self._crud.create_personal_contacts(
+            user_uuid, [dict(self.contact_1), dict(self.contact_2)]
+        )
+        pool = DBStarter.engine.pool
+        checked_out = pool.checkedout()
+
+        contacts = self._crud.iter_personal_contacts(user_uuid, batch_size=1)
+        next(contacts)
+        assert_that(pool.checkedout(), equal_to(checked_out + 1))
+
+        contacts.close()
+
+        assert_that(pool.checkedout(), equal_to(checked_out))
+        assert_that(Session.registry.has(), equal_to(False))
+
     @with_user_uuid
     def test_that_personal_contacts_are_unique(self, user_uuid):
         self._crud.create_personal_contact(user_uuid, self.contact_1)
@@ -1,7 +1,15 @@
 # Copyright 2015-2019 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from hamcrest import assert_that, contains_inanyorder, equal_to, matches_regexp
+import json
+
+from hamcrest import (
+    assert_that,
+    contains_inanyorder,
+    equal_to,
+    has_entries,
+    matches_regexp,
+)
 
 from .helpers.base import BaseDirdIntegrationTest
 
@@ -84,3 +92,27 @@ class TestPersonalExport(BaseDirdIntegrationTest):
             ),
         )
         assert_that(result[-1], equal_to(''))
+
+    def test_that_export_ndjson_returns_a_contact_per_line(self):
+        self.post_personal({'firstname': 'Éloïse'})
+        self.post_personal({'lastname': 'Bodkartan'})
+
+        result = self.export_personal_ndjson()
+
+        contacts = [json.loads(line) for line in result.splitlines()]
+        assert_that(
+            contacts,
+            contains_inanyorder(
+                has_entries(firstname='Éloïse'), has_entries(lastname='Bodkartan')
+            ),
+        )
+
+    def test_that_export_of_many_contacts_is_complete(self):
+        csv = '\n'.join(['firstname'] + ['Alice{}'.format(i) for i in range(2500)])
+        self.import_personal(csv)
+
+        result = self.export_personal()
+
+        result = result.split('\r\n')
+        assert_that(result[0], equal_to('firstname,id'))
+        assert_that(len(result[1:-1]), equal_to(2500))
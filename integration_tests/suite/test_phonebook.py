@@ -397,6 +397,16 @@ class TestContactList(_BasePhonebookContactTestCase):
         )
         assert_matches(result, contact_2)
 
+        result = self.list_phonebook_contacts(
+            *args, order='firstname', after=contact_1['id']
+        )
+        assert_matches(result, contact_2, contact_3)
+
+        result = self.list_phonebook_contacts(
+            *args, order='firstname', direction='desc', limit=1, after=contact_2['id']
+        )
+        assert_matches(result, contact_1)
+
         invalid_limit_offset = [-1, True, False, 'foobar', 3.14]
         for value in invalid_limit_offset:
             result = self.list_phonebook_contacts(*args, limit=value)
@@ -20,6 +20,7 @@ setup(
     entry_points={
         'console_scripts': ['wazo-dird=wazo_dird.main:main'],
         'wazo_dird.services': [
+            'bus_event = wazo_dird.plugins.bus_event_service.plugin:BusEventServicePlugin',
             'cleanup = wazo_dird.plugins.cleanup_service.plugin:StorageCleanupServicePlugin',
             'config = wazo_dird.plugins.config_service.plugin:ConfigServicePlugin',
             'display = wazo_dird.plugins.display_service.plugin:DisplayServicePlugin',
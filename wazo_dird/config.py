@@ -34,6 +34,7 @@ _DEFAULT_CONFIG = {
             'wazo': True,
         },
         'services': {
+            'bus_event': True,
             'cleanup': True,
             'config': True,
             'display': True,
@@ -84,10 +85,11 @@ _DEFAULT_CONFIG = {
         },
     },
     'services': {
+        'phonebook': {'import_batch_size': 1000},
         'service_discovery': {
             'template_path': '/etc/wazo-dird/templates.d/',
             'services': {},
-        }
+        },
     },
     'user': 'www-data',
     'bus': {
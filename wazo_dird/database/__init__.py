@@ -4,7 +4,6 @@
 from .models import (
     Base,
     Contact,
-    ContactFields,
     Display,
     DisplayColumn,
     Favorite,
@@ -33,7 +32,6 @@ from .queries.source import SourceCRUD
 __all__ = [
     'Base',
     'Contact',
-    'ContactFields',
     'delete_user',
     'Display',
     'DisplayColumn',
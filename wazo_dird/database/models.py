@@ -1,11 +1,21 @@
 # Copyright 2016-2019 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from sqlalchemy import Column, ForeignKey, Integer, schema, String, text, Text
+from sqlalchemy import (
+    Column,
+    DDL,
+    event,
+    ForeignKey,
+    Integer,
+    schema,
+    String,
+    text,
+    Text,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.dialects.postgresql import ARRAY, HSTORE, JSON
+from sqlalchemy.dialects.postgresql import ARRAY, HSTORE, JSON, JSONB
 
 Base = declarative_base()
 
@@ -30,18 +40,27 @@ class Contact(Base):
         Integer(), ForeignKey('dird_phonebook.id', ondelete='CASCADE')
     )
     hash = Column(String(40), nullable=False)
-
-
-class ContactFields(Base):
-
-    __tablename__ = 'dird_contact_fields'
-
-    id = Column(Integer(), primary_key=True)
-    name = Column(Text(), nullable=False, index=True)
-    value = Column(Text(), index=True)
-    contact_uuid = Column(
-        String(38), ForeignKey('dird_contact.uuid', ondelete='CASCADE'), nullable=False
-    )
+    fields = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+
+
+# dird_contact_search(fields) is the unaccented text of all the values of a
+# contact. Its trigram index finds the candidates of a search or a first match,
+# the matching of each searched column is then checked on these candidates.
+CONTACT_SEARCH_FUNCTIONS = DDL("""
+CREATE OR REPLACE FUNCTION dird_unaccent(text) RETURNS text
+    AS $$ SELECT public.unaccent('public.unaccent', $1) $$
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+CREATE OR REPLACE FUNCTION dird_contact_search(jsonb) RETURNS text
+    AS $$ SELECT coalesce(dird_unaccent(string_agg(value, ' ')), '')
+          FROM jsonb_each_text($1) $$
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+""")
+CONTACT_SEARCH_INDEX = DDL("""
+CREATE INDEX dird_contact__idx__search
+    ON dird_contact USING gin (dird_contact_search(fields) gin_trgm_ops);
+""")
+event.listen(Contact.__table__, 'before_create', CONTACT_SEARCH_FUNCTIONS)
+event.listen(Contact.__table__, 'after_create', CONTACT_SEARCH_INDEX)
 
 
 class Display(Base):
@@ -5,11 +5,17 @@ import hashlib
 import json
 
 from contextlib import contextmanager
-from sqlalchemy import exc
+from sqlalchemy import exc, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql.functions import ReturnTypeFromArgs
 from wazo_dird.exception import DatabaseServiceUnavailable
 from wazo_dird.database import Tenant, User
 
-from .. import ContactFields
+from .. import Contact
+
+
+class dird_unaccent(ReturnTypeFromArgs):
+    pass
 
 
 def delete_user(session, user_uuid):
@@ -23,20 +29,28 @@ def extract_constraint_name(error):
         return None
 
 
-def list_contacts_by_uuid(session, uuids):
-    if not uuids:
-        return []
-
-    contact_fields = session.query(ContactFields).filter(
-        ContactFields.contact_uuid.in_(uuids)
-    )
-    result = {}
-    for contact_field in contact_fields.all():
-        uuid = contact_field.contact_uuid
-        if uuid not in result:
-            result[uuid] = {'id': uuid}
-        result[uuid][contact_field.name] = contact_field.value
-    return list(result.values())
+def contact_document():
+    """The id and the fields of a contact, as one jsonb object"""
+    id_ = func.jsonb_build_object('id', Contact.uuid)
+    return id_.op('||', return_type=JSONB)(Contact.fields)
+
+
+def contact_fields(contact_info):
+    return {
+        name: value if value is None else str(value)
+        for name, value in contact_info.items()
+        if name != 'id'
+    }
+
+
+def new_contact_candidate_filter(term):
+    """Matches the contacts having `term` in the unaccented text of their values
+
+    This filter uses the trigram index of the contacts. It selects a superset of
+    the contacts matching `term` on a given column, which must still be checked.
+    """
+    pattern = '%' + dird_unaccent(term) + '%'
+    return func.dird_contact_search(Contact.fields).ilike(pattern)
 
 
 def compute_contact_hash(contact_info):
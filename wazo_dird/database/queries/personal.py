@@ -2,15 +2,19 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from unidecode import unidecode
-from sqlalchemy import and_, distinct, text
-from sqlalchemy.sql.functions import ReturnTypeFromArgs
+from sqlalchemy import and_, func, or_, text
 from wazo_dird.exception import DuplicatedContactException, NoSuchContact
-from .base import BaseDAO, compute_contact_hash, list_contacts_by_uuid
-from .. import Contact, ContactFields, User
+from .base import (
+    BaseDAO,
+    compute_contact_hash,
+    contact_document,
+    contact_fields,
+    dird_unaccent,
+    new_contact_candidate_filter,
+)
+from .. import Contact, User
 
-
-class unaccent(ReturnTypeFromArgs):
-    pass
+DEFAULT_STREAM_BATCH_SIZE = 1000
 
 
 class PersonalContactSearchEngine(BaseDAO):
@@ -39,50 +43,47 @@ class PersonalContactSearchEngine(BaseDAO):
             return []
 
         with self.new_session() as s:
-            base_query = (
-                s.query(distinct(ContactFields.contact_uuid))
-                .join(Contact)
-                .join(User)
-                .filter(filter_)
-            )
+            query = s.query(contact_document()).filter(filter_)
             if limit:
-                query = base_query.limit(limit)
-            else:
-                query = base_query
-
-            uuids = [uuid for (uuid,) in query.all()]
+                query = query.limit(limit)
 
-            return list_contacts_by_uuid(s, uuids)
+            return [contact for (contact,) in query.all()]
 
     def _new_list_filter(self, user_uuid, uuids):
         if not uuids:
             return False
 
-        return and_(User.user_uuid == user_uuid, ContactFields.contact_uuid.in_(uuids))
+        return and_(Contact.user_uuid == user_uuid, Contact.uuid.in_(uuids))
 
     def _new_search_filter(self, user_uuid, term, columns):
         if not columns:
             return False
 
-        pattern = '%{}%'.format(unidecode(term))
+        term = unidecode(term)
+        pattern = '%{}%'.format(term)
         return and_(
-            User.user_uuid == user_uuid,
-            unaccent(ContactFields.value).ilike(pattern),
-            ContactFields.name.in_(columns),
+            Contact.user_uuid == user_uuid,
+            new_contact_candidate_filter(term),
+            or_(*[self._unaccented(column).ilike(pattern) for column in columns]),
         )
 
     def _new_strict_filter(self, user_uuid, term, columns):
         if not columns:
             return False
 
+        term = unidecode(term)
         return and_(
-            User.user_uuid == user_uuid,
-            unaccent(ContactFields.value) == unidecode(term),
-            ContactFields.name.in_(columns),
+            Contact.user_uuid == user_uuid,
+            new_contact_candidate_filter(term),
+            or_(*[self._unaccented(column) == term for column in columns]),
         )
 
     def _new_user_contacts_filter(self, user_uuid):
-        return User.user_uuid == user_uuid
+        return Contact.user_uuid == user_uuid
+
+    @staticmethod
+    def _unaccented(column):
+        return dird_unaccent(Contact.fields[column].astext)
 
 
 class PersonalContactCRUD(BaseDAO):
@@ -92,9 +93,35 @@ class PersonalContactCRUD(BaseDAO):
             filter_ = and_(filter_, Contact.user_uuid == user_uuid)
 
         with self.new_session() as s:
-            query = s.query(distinct(Contact.uuid)).filter(filter_)
-            contact_uuids = [uuid for (uuid,) in query.all()]
-            return list_contacts_by_uuid(s, contact_uuids)
+            query = s.query(contact_document()).filter(filter_)
+            return [contact for (contact,) in query.all()]
+
+    def list_personal_contact_fieldnames(self, user_uuid):
+        with self.new_session() as s:
+            query = (
+                s.query(func.jsonb_object_keys(contact_document()))
+                .filter(Contact.user_uuid == user_uuid)
+                .distinct()
+            )
+            return sorted(fieldname for (fieldname,) in query.all())
+
+    def iter_personal_contacts(self, user_uuid, batch_size=DEFAULT_STREAM_BATCH_SIZE):
+        """Yields the contacts of the user, fetched `batch_size` at a time
+
+        The rows are read from a server-side cursor. The session, its transaction
+        and its connection stay open until the generator is exhausted or closed.
+        When the contacts are streamed in a response, they are held for the whole
+        download and released when the WSGI server closes the response, after
+        the last chunk or when the client disconnects.
+        """
+        with self.new_session() as s:
+            query = (
+                s.query(contact_document())
+                .filter(Contact.user_uuid == user_uuid)
+                .yield_per(batch_size)
+            )
+            for (contact,) in query:
+                yield contact
 
     def create_personal_contact(self, user_uuid, contact_info):
         with self.new_session() as s:
@@ -123,7 +150,11 @@ class PersonalContactCRUD(BaseDAO):
 
         for hash_ in to_add:
             contact_info = hash_and_contact[hash_]
-            contact_args = {'user_uuid': user.user_uuid, 'hash': hash_}
+            contact_args = {
+                'user_uuid': user.user_uuid,
+                'hash': hash_,
+                'fields': contact_fields(contact_info),
+            }
             contact_uuid = contact_info.get('id')
             if contact_uuid:
                 contact_args['uuid'] = contact_uuid
@@ -132,10 +163,6 @@ class PersonalContactCRUD(BaseDAO):
             session.flush()
 
             contact_info['id'] = contact.uuid
-            for name, value in contact_info.items():
-                session.add(
-                    ContactFields(name=name, value=value, contact_uuid=contact.uuid)
-                )
 
         for hash_ in existing:
             contact_info = hash_and_contact[hash_]
@@ -143,6 +170,14 @@ class PersonalContactCRUD(BaseDAO):
 
         return contact_infos
 
+    def find_existing_contact_uuids(self, uuids):
+        if not uuids:
+            return set()
+
+        with self.new_session() as s:
+            query = s.query(Contact.uuid).filter(Contact.uuid.in_(list(uuids)))
+            return {uuid for (uuid,) in query.all()}
+
     def _find_existing_contact_by_hash(self, session, user_uuid, hashes):
         if not hashes:
             return {}
@@ -164,20 +199,12 @@ class PersonalContactCRUD(BaseDAO):
 
     def get_personal_contact(self, user_uuid, contact_uuid):
         with self.new_session() as s:
-            filter_ = and_(
-                User.user_uuid == user_uuid, ContactFields.contact_uuid == contact_uuid
-            )
-            contact_uuids = (
-                s.query(distinct(ContactFields.contact_uuid))
-                .join(Contact)
-                .join(User)
-                .filter(filter_)
-            )
+            filter_ = and_(Contact.user_uuid == user_uuid, Contact.uuid == contact_uuid)
+            contact = s.query(contact_document()).filter(filter_).scalar()
 
-            for contact in list_contacts_by_uuid(s, contact_uuids):
-                return contact
-
-        raise NoSuchContact(contact_uuid)
+        if not contact:
+            raise NoSuchContact(contact_uuid)
+        return contact
 
     def delete_all_personal_contacts(self, user_uuid):
         with self.new_session() as s:
@@ -189,17 +216,13 @@ class PersonalContactCRUD(BaseDAO):
             self._delete_personal_contact(s, user_uuid, contact_uuid)
 
     def _delete_personal_contact(self, session, user_uuid, contact_uuid):
-        filter_ = and_(
-            User.user_uuid == user_uuid, ContactFields.contact_uuid == contact_uuid
-        )
+        filter_ = and_(User.user_uuid == user_uuid, Contact.uuid == contact_uuid)
         nb_deleted = self._delete_personal_contacts_with_filter(session, filter_)
         if nb_deleted == 0:
             raise NoSuchContact(contact_uuid)
 
     def _delete_personal_contacts_with_filter(self, session, filter_):
-        contacts = (
-            session.query(Contact).join(ContactFields).join(User).filter(filter_).all()
-        )
+        contacts = session.query(Contact).join(User).filter(filter_).all()
         deleted = 0
         for contact in contacts:
             session.delete(contact)
@@ -1,18 +1,44 @@
 # Copyright 2019 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-from collections import defaultdict
-from sqlalchemy import and_, distinct, func, or_
+import logging
+
+from sqlalchemy import (
+    and_,
+    column,
+    exc,
+    exists,
+    func,
+    or_,
+    select,
+    text,
+    Text,
+    tuple_,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
 
 from wazo_dird.exception import (
     DuplicatedContactException,
     DuplicatedPhonebookException,
+    InvalidArgumentError,
     NoSuchContact,
     NoSuchPhonebook,
 )
 
-from .base import BaseDAO, compute_contact_hash, list_contacts_by_uuid
-from .. import Contact, ContactFields, Phonebook, Tenant
+from .base import (
+    BaseDAO,
+    compute_contact_hash,
+    contact_document,
+    contact_fields,
+    dird_unaccent,
+    new_contact_candidate_filter,
+)
+from .. import Contact, Phonebook, Tenant
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMPORT_BATCH_SIZE = 1000
 
 
 class PhonebookContactSearchEngine(BaseDAO):
@@ -31,13 +57,12 @@ class PhonebookContactSearchEngine(BaseDAO):
         self._phonebook_id = phonebook_id
 
     def find_contacts(self, term):
-        pattern = '%{}%'.format(term)
-        filter_ = self._new_search_filter(pattern, self._searched_columns)
+        filter_ = self._new_search_filter(term, self._searched_columns)
         with self.new_session() as s:
             return self._find_contacts_with_filter(s, filter_)
 
     def find_first_contact(self, term):
-        filter_ = self._new_search_filter(term, self._first_match_columns)
+        filter_ = self._new_strict_filter(term, self._first_match_columns)
         with self.new_session() as s:
             for contact in self._find_contacts_with_filter(s, filter_, limit=1):
                 return contact
@@ -49,8 +74,8 @@ class PhonebookContactSearchEngine(BaseDAO):
 
     def _find_contacts_with_filter(self, s, filter_, limit=None):
         query = (
-            s.query(distinct(ContactFields.contact_uuid))
-            .join(Contact)
+            s.query(contact_document())
+            .select_from(Contact)
             .join(Phonebook)
             .filter(
                 and_(
@@ -64,28 +89,35 @@ class PhonebookContactSearchEngine(BaseDAO):
         if limit:
             query = query.limit(limit)
 
-        uuids = [uuid for (uuid,) in query.all()]
-
-        return list_contacts_by_uuid(s, uuids)
+        return [contact for (contact,) in query.all()]
 
     def _new_list_filter(self, contact_uuids):
         if not contact_uuids:
             return False
 
-        return ContactFields.contact_uuid.in_(contact_uuids)
+        return Contact.uuid.in_(contact_uuids)
 
-    def _new_search_filter(self, pattern, columns):
+    def _new_search_filter(self, term, columns):
+        return self._new_columns_filter(term, '%{}%'.format(term), columns)
+
+    def _new_strict_filter(self, term, columns):
+        return self._new_columns_filter(term, term, columns)
+
+    def _new_columns_filter(self, term, pattern, columns):
         if not columns:
             return False
 
-        return and_(ContactFields.value.ilike(pattern), ContactFields.name.in_(columns))
+        return and_(
+            new_contact_candidate_filter(term),
+            or_(*[Contact.fields[column].astext.ilike(pattern) for column in columns]),
+        )
 
 
 class PhonebookContactCRUD(BaseDAO):
     def count(self, tenant_uuid, phonebook_id, search=None):
         with self.new_session() as s:
             phonebook = self._get_phonebook(s, tenant_uuid, phonebook_id)
-            query = func.count(distinct(ContactFields.contact_uuid))
+            query = func.count(Contact.uuid)
             return self._list_contacts(s, query, phonebook.id, search).scalar()
 
     def create(self, tenant_uuid, phonebook_id, contact_body):
@@ -93,25 +125,94 @@ class PhonebookContactCRUD(BaseDAO):
             phonebook = self._get_phonebook(s, tenant_uuid, phonebook_id)
             return self._create_one(s, phonebook.id, contact_body)
 
-    def create_many(self, tenant_uuid, phonebook_id, body):
-        created = []
-        errors = []
+    def create_many(
+        self, tenant_uuid, phonebook_id, body, batch_size=DEFAULT_IMPORT_BATCH_SIZE
+    ):
+        """Creates the contacts of `body`, returns the created and the failed ones
+
+        A contact fails when it duplicates a contact of the phonebook or a
+        previous contact of `body`. Contacts are inserted `batch_size` at a time,
+        each batch in its own transaction, with a single multi-row INSERT.
+        """
         with self.new_session() as s:
-            phonebook = self._get_phonebook(s, tenant_uuid, phonebook_id)
-            for contact_body in body:
-                try:
-                    contact = self._create_one(s, phonebook.id, contact_body)
-                    created.append(contact)
-                except Exception:
-                    errors.append(contact_body)
+            phonebook_id = self._get_phonebook(s, tenant_uuid, phonebook_id).id
+
+        created, errors = [], []
+        hashes = set()
+        batch = []
+        for contact_body in body:
+            hash_ = compute_contact_hash(contact_body)
+            if hash_ in hashes:
+                errors.append(contact_body)
+                continue
+
+            hashes.add(hash_)
+            batch.append((hash_, contact_body))
+            if len(batch) >= batch_size:
+                self._create_batch(phonebook_id, batch, created, errors)
+                batch = []
+
+        if batch:
+            self._create_batch(phonebook_id, batch, created, errors)
         return created, errors
 
+    def _create_batch(self, phonebook_id, batch, created, errors):
+        try:
+            with self.new_session() as s:
+                uuids = self._insert_new_contacts(s, phonebook_id, batch)
+        except exc.DBAPIError:
+            if len(batch) == 1:
+                logger.info('failed to import a contact', exc_info=True)
+                errors.append(batch[0][1])
+                return
+            # An invalid contact fails the whole batch, the contacts are retried one by one
+            for contact in batch:
+                self._create_batch(phonebook_id, [contact], created, errors)
+            return
+
+        for hash_, contact_body in batch:
+            if hash_ in uuids:
+                contact_body['id'] = uuids[hash_]
+                created.append(contact_body)
+            else:
+                errors.append(contact_body)
+
+    def _insert_new_contacts(self, s, phonebook_id, batch):
+        existing_hashes = s.query(Contact.hash).filter(
+            and_(
+                Contact.phonebook_id == phonebook_id,
+                Contact.hash.in_([hash_ for hash_, _ in batch]),
+            )
+        )
+        existing_hashes = {hash_ for (hash_,) in existing_hashes.all()}
+        rows = [
+            {
+                'phonebook_id': phonebook_id,
+                'hash': hash_,
+                'fields': contact_fields(contact_body),
+            }
+            for hash_, contact_body in batch
+            if hash_ not in existing_hashes
+        ]
+        if not rows:
+            return {}
+
+        query = (
+            insert(Contact.__table__)
+            .values(rows)
+            .on_conflict_do_nothing()
+            .returning(Contact.hash, Contact.uuid)
+        )
+        return {hash_: uuid for hash_, uuid in s.execute(query).fetchall()}
+
     def _create_one(self, session, phonebook_id, contact_body):
         hash_ = compute_contact_hash(contact_body)
-        contact = Contact(phonebook_id=phonebook_id, hash=hash_)
+        contact = Contact(
+            phonebook_id=phonebook_id, hash=hash_, fields=contact_fields(contact_body)
+        )
         session.add(contact)
         self.flush_or_raise(session, DuplicatedContactException)
-        self._add_field_to_contact(session, contact.uuid, contact_body)
+        contact_body['id'] = contact.uuid
         return contact_body
 
     def delete(self, tenant_uuid, phonebook_id, contact_id):
@@ -126,11 +227,9 @@ class PhonebookContactCRUD(BaseDAO):
             phonebook = self._get_phonebook(s, tenant_uuid, phonebook_id)
             contact = self._get_contact(s, tenant_uuid, phonebook.id, contact_uuid)
             contact.hash = hash_
+            contact.fields = contact_fields(contact_body)
             self.flush_or_raise(s, DuplicatedContactException)
-            s.query(ContactFields).filter(
-                ContactFields.contact_uuid == contact_uuid
-            ).delete()
-            self._add_field_to_contact(s, contact.uuid, contact_body)
+            contact_body['id'] = contact.uuid
 
         return contact_body
 
@@ -138,35 +237,56 @@ class PhonebookContactCRUD(BaseDAO):
         with self.new_session() as s:
             phonebook = self._get_phonebook(s, tenant_uuid, phonebook_id)
             filter_ = self._new_contact_filter(tenant_uuid, phonebook.id, contact_id)
-            fields = s.query(ContactFields).join(Contact).filter(filter_).all()
-            if not fields:
-                raise NoSuchContact(contact_id)
+            contact = (
+                s.query(contact_document())
+                .select_from(Contact)
+                .join(Phonebook)
+                .filter(filter_)
+                .scalar()
+            )
 
-            return {field.name: field.value for field in fields}
+        if not contact:
+            raise NoSuchContact(contact_id)
+        return contact
 
-    def list(self, tenant_uuid, phonebook_id, search=None):
+    def list(self, tenant_uuid, phonebook_id, search=None, **list_params):
+        with self.new_session() as s:
+            phonebook = self._get_phonebook(s, tenant_uuid, phonebook_id)
+            query = self._list_contacts(s, contact_document(), phonebook.id, search)
+            query = self._paginate(query, **list_params)
+            contacts = [contact for (contact,) in query.all()]
+            if not contacts:
+                self._check_cursor(s, phonebook.id, list_params.get('after'))
+            return contacts
+
+    def list_and_count(self, tenant_uuid, phonebook_id, search=None, **list_params):
+        """The requested page of contacts and the number of contacts matching `search`
+
+        The number of contacts is a sub-query of the page, both are fetched in
+        the same round trip unless the page is empty.
+        """
         with self.new_session() as s:
             phonebook = self._get_phonebook(s, tenant_uuid, phonebook_id)
-            query = distinct(ContactFields.contact_uuid)
-            matching_uuids = self._list_contacts(s, query, phonebook.id, search).all()
-            if not matching_uuids:
-                return []
-
-            fields = (
-                s.query(ContactFields)
-                .filter(ContactFields.contact_uuid.in_(matching_uuids))
-                .all()
+            count = self._list_contacts(
+                s, func.count(Contact.uuid), phonebook.id, search
             )
-            result = defaultdict(dict)
-            for field in fields:
-                result[field.contact_uuid][field.name] = field.value
+            query = self._list_contacts(s, contact_document(), phonebook.id, search)
+            query = query.add_columns(count.statement.correlate(None).as_scalar())
+            rows = self._paginate(query, **list_params).all()
+            if not rows:
+                self._check_cursor(s, phonebook.id, list_params.get('after'))
+                return [], count.scalar()
 
-        return list(result.values())
+            return [contact for contact, _ in rows], rows[0][1]
 
-    def _add_field_to_contact(self, s, contact_uuid, contact_body):
-        contact_body['id'] = contact_uuid
-        for name, value in contact_body.items():
-            s.add(ContactFields(name=name, value=value, contact_uuid=contact_uuid))
+    def _check_cursor(self, s, phonebook_id, after):
+        # the page after an unknown contact is empty instead of failing
+        if not after:
+            return
+
+        filter_ = and_(Contact.uuid == after, Contact.phonebook_id == phonebook_id)
+        if not s.query(exists().where(filter_)).scalar():
+            raise InvalidArgumentError('after should be a contact of the phonebook')
 
     def _get_contact(self, s, tenant_uuid, phonebook_id, contact_uuid):
         filter_ = self._new_contact_filter(tenant_uuid, phonebook_id, contact_uuid)
@@ -187,9 +307,46 @@ class PhonebookContactCRUD(BaseDAO):
     def _list_contacts(self, s, query, phonebook_id, search):
         filter_ = and_(
             Contact.phonebook_id == phonebook_id,
-            ContactFields.value.ilike('%{}%'.format(search)) if search else True,
+            self._new_any_value_filter(search) if search else True,
+        )
+        return s.query(query).select_from(Contact).filter(filter_)
+
+    def _paginate(
+        self, query, order=None, direction=None, limit=None, offset=None, after=None
+    ):
+        keys = [Contact.uuid]
+        if order:
+            keys.insert(0, self._sort_key(Contact, order))
+
+        if after:
+            cursor = aliased(Contact)
+            cursor_keys = [cursor.uuid]
+            if order:
+                cursor_keys.insert(0, self._sort_key(cursor, order))
+            position = select(cursor_keys).where(cursor.uuid == after).as_scalar()
+            if direction == 'desc':
+                query = query.filter(tuple_(*keys) < position)
+            else:
+                query = query.filter(tuple_(*keys) > position)
+
+        if direction == 'desc':
+            keys = [key.desc() for key in keys]
+        return query.order_by(*keys).limit(limit).offset(offset)
+
+    @staticmethod
+    def _sort_key(contact, order):
+        value = dird_unaccent(contact.fields[order].astext)
+        return func.coalesce(value, '').collate('C')
+
+    @staticmethod
+    def _new_any_value_filter(search):
+        values = func.jsonb_each_text(Contact.fields).alias('contact_field')
+        matching_value = (
+            select([text('1')])
+            .select_from(values)
+            .where(column('value', Text).ilike('%{}%'.format(search)))
         )
-        return s.query(query).join(Contact).join(Phonebook).filter(filter_)
+        return and_(new_contact_candidate_filter(search), exists(matching_value))
 
     def _new_contact_filter(self, tenant_uuid, phonebook_id, contact_uuid):
         return and_(
@@ -30,6 +30,12 @@ class NoSuchFavorite(ValueError):
         super().__init__(message)
 
 
+class NoSuchImportJob(ValueError):
+    def __init__(self, job_uuid):
+        message = 'No such import job: {}'.format(job_uuid)
+        super().__init__(message)
+
+
 class NoSuchPhonebook(ValueError):
     def __init__(self, phonebook_id):
         message = 'No such phonebook: {}'.format(phonebook_id)
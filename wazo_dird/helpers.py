@@ -2,15 +2,20 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import logging
+import re
 
 from collections import namedtuple
+from functools import lru_cache
+from string import Formatter
 from flask import request
+from unidecode import unidecode
 from xivo.tenant_flask_helpers import Tenant
 from wazo_dird import BaseViewPlugin
 from wazo_dird.rest_api import AuthResource
 
 logger = logging.getLogger()
 
+NORMALIZED_CACHE_SIZE = 65536
 
 DisplayColumn = namedtuple('DisplayColumn', ['title', 'type', 'default', 'field'])
 
@@ -37,6 +42,36 @@ class DisplayAwareResource:
         ]
 
 
+def normalize(value):
+    """Return `value` lowercased and transliterated to ASCII
+
+    Normalized values are cached, searching the same entries again does not
+    transliterate them again.
+    """
+    if value is None:
+        return ''
+    return _normalize(str(value))
+
+
+@lru_cache(maxsize=NORMALIZED_CACHE_SIZE)
+def _normalize(value):
+    return unidecode(value.lower())
+
+
+def used_fields(searched_columns, first_matched_columns, format_columns):
+    """Return the names of the contact fields used by a source configuration"""
+    fields = set(searched_columns) | set(first_matched_columns)
+    for format_string in format_columns.values():
+        try:
+            parsed = list(Formatter().parse(format_string))
+        except ValueError:
+            continue
+        for _, field_name, _, _ in parsed:
+            if field_name:
+                fields.add(re.split(r'[.\[]', field_name, 1)[0])
+    return fields
+
+
 class RaiseStopper:
     def __init__(self, return_on_raise):
         self.return_on_raise = return_on_raise
@@ -0,0 +1,49 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import logging
+import threading
+import weakref
+
+logger = logging.getLogger(__name__)
+
+
+class BusEventRegistry:
+    """Dispatch the bus events received by the bus_event service to the sources
+
+    Sources are loaded after the bus consumer is started, so they cannot add their
+    own consumers. Callbacks must be bound methods, they are weakly referenced
+    because a source is not always unloaded before being dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callbacks = {}
+
+    def subscribe(self, event_name, callback):
+        with self._lock:
+            callbacks = self._callbacks.setdefault(event_name, [])
+            callbacks.append(weakref.WeakMethod(callback))
+
+    def unsubscribe(self, event_name, callback):
+        with self._lock:
+            callbacks = self._callbacks.get(event_name, [])
+            self._callbacks[event_name] = [
+                ref for ref in callbacks if ref() not in (None, callback)
+            ]
+
+    def dispatch(self, event_name, body):
+        with self._lock:
+            refs = list(self._callbacks.get(event_name, []))
+
+        for ref in refs:
+            callback = ref()
+            if callback is None:
+                continue
+            try:
+                callback(body)
+            except Exception:
+                logger.exception('Error while handling the bus event %s', event_name)
+
+
+registry = BusEventRegistry()
@@ -0,0 +1,106 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import logging
+import threading
+import time
+
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from .bus_event_registry import registry as bus_events
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300.0
+DEFAULT_RENEW_MARGIN = 60.0
+EVENTS = [
+    'auth_user_external_auth_added',
+    'auth_user_external_auth_authorized',
+    'auth_user_external_auth_deleted',
+]
+
+CachedToken = namedtuple('CachedToken', ['token', 'renew_at'])
+
+
+class ExternalTokenCache:
+    """The external auth tokens of the users, as returned by wazo-auth
+
+    A token is renewed `renew_margin` seconds before its `expires_at`, or after
+    `default_ttl` seconds when wazo-auth does not tell when it expires. Tokens
+    are dropped when wazo-auth sends an event about the external auth of their
+    user.
+    """
+
+    def __init__(
+        self,
+        default_ttl=DEFAULT_TTL,
+        renew_margin=DEFAULT_RENEW_MARGIN,
+        clock=time.time,
+    ):
+        self._default_ttl = default_ttl
+        self._renew_margin = renew_margin
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = {}
+
+    def get(self, provider, user_uuid, fetch):
+        key = (provider, user_uuid)
+        now = self._clock()
+        with self._lock:
+            cached = self._tokens.get(key)
+        if cached and now < cached.renew_at:
+            return cached.token
+
+        token = fetch()
+        renew_at = self._expires_at(token, now) - self._renew_margin
+        if renew_at > now:
+            with self._lock:
+                self._tokens[key] = CachedToken(token, renew_at)
+        return token
+
+    def drop(self, provider, user_uuid):
+        with self._lock:
+            self._tokens.pop((provider, user_uuid), None)
+
+    def on_event(self, body):
+        data = body.get('data') or {}
+        provider, user_uuid = data.get('external_auth_name'), data.get('user_uuid')
+        logger.debug(
+            '%s: dropping the %s token of %s', body['name'], provider, user_uuid
+        )
+        self.drop(provider, user_uuid)
+
+    def _expires_at(self, token, now):
+        # wazo-auth expiration dates without a timezone are in its local time
+        utc_expires_at = self._timestamp(token.get('utc_expires_at'), timezone.utc)
+        if utc_expires_at is not None:
+            return utc_expires_at
+
+        expires_at = token.get('expires_at') or token.get('token_expiration')
+        local_expires_at = self._timestamp(expires_at, None)
+        if local_expires_at is not None:
+            return local_expires_at
+        return now + self._default_ttl
+
+    @staticmethod
+    def _timestamp(expires_at, naive_tz):
+        if isinstance(expires_at, (int, float)):
+            return float(expires_at)
+
+        try:
+            parsed = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
+        except (AttributeError, TypeError, ValueError):
+            return None
+
+        if parsed.tzinfo is None:
+            if naive_tz is None:
+                parsed = parsed.astimezone()
+            else:
+                parsed = parsed.replace(tzinfo=naive_tz)
+        return parsed.timestamp()
+
+
+token_cache = ExternalTokenCache()
+for event_name in EVENTS:
+    bus_events.subscribe(event_name, token_cache.on_event)
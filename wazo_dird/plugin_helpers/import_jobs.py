@@ -0,0 +1,150 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import csv
+import io
+import logging
+import shutil
+import tempfile
+import threading
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+from wazo_dird.exception import NoSuchImportJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 1
+DEFAULT_MAX_FINISHED_JOBS = 100
+MAX_ERRORS = 1000
+CHUNK_SIZE = 64 * 1024
+
+
+class InvalidImportDocument(ValueError):
+    pass
+
+
+class ImportJob:
+    """The progress of an import running in the background
+
+    Only the first MAX_ERRORS errors are kept, `failed` counts all of them.
+    """
+
+    def __init__(self, owner):
+        self.uuid = str(uuid4())
+        self.owner = owner
+        self.status = 'pending'
+        self.reason = None
+        self.lines = 0
+        self.created = 0
+        self.failed = 0
+        self._errors = []
+
+    @property
+    def done(self):
+        return self.status in ('finished', 'failed')
+
+    def add_error(self, line, *errors):
+        self.failed += 1
+        if len(self._errors) < MAX_ERRORS:
+            self._errors.append({'line': line, 'errors': list(errors)})
+
+    def to_dict(self):
+        return {
+            'uuid': self.uuid,
+            'status': self.status,
+            'reason': self.reason,
+            'lines': self.lines,
+            'created': self.created,
+            'failed': self.failed,
+            'errors': list(self._errors),
+        }
+
+
+class ImportJobs:
+    """Imports run by `max_workers` background threads
+
+    `run(job, document, *args)` imports the uploaded `document` and updates the
+    counters of `job`. The document is closed when the job is done. Only the
+    last `max_finished_jobs` finished jobs are kept.
+    """
+
+    def __init__(
+        self,
+        max_workers=DEFAULT_MAX_WORKERS,
+        max_finished_jobs=DEFAULT_MAX_FINISHED_JOBS,
+    ):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._max_finished_jobs = max_finished_jobs
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def stop(self):
+        self._executor.shutdown(wait=False)
+
+    def submit(self, owner, run, document, *args):
+        job = ImportJob(owner)
+        with self._lock:
+            self._jobs[job.uuid] = job
+            self._forget_finished_jobs()
+        self._executor.submit(self._run, job, run, document, *args)
+        return job
+
+    def get(self, owner, job_uuid):
+        with self._lock:
+            job = self._jobs.get(job_uuid)
+        if not job or job.owner != owner:
+            raise NoSuchImportJob(job_uuid)
+        return job
+
+    def _forget_finished_jobs(self):
+        finished = [uuid for uuid, job in self._jobs.items() if job.done]
+        for uuid in finished[: max(len(finished) - self._max_finished_jobs, 0)]:
+            del self._jobs[uuid]
+
+    @staticmethod
+    def _run(job, run, document, *args):
+        job.status = 'running'
+        try:
+            run(job, document, *args)
+        except (InvalidImportDocument, UnicodeDecodeError) as e:
+            logger.info('import %s failed: %s', job.uuid, e)
+            job.reason = str(e)
+            job.status = 'failed'
+        except Exception as e:
+            logger.exception('import %s failed', job.uuid)
+            job.reason = str(e)
+            job.status = 'failed'
+        else:
+            job.status = 'finished'
+        finally:
+            document.close()
+
+
+def spool_upload(stream):
+    """Copies an uploaded document to a temporary file, without keeping it in memory"""
+    document = tempfile.TemporaryFile()
+    shutil.copyfileobj(stream, document, CHUNK_SIZE)
+    document.seek(0)
+    return document
+
+
+def read_csv_batches(document, charset, batch_size):
+    """Yields the rows of a CSV document, `batch_size` (line number, row) at a time"""
+    text = io.TextIOWrapper(document, encoding=charset, newline='')
+    reader = csv.DictReader(text)
+    fieldnames = reader.fieldnames or []
+    duplicates = sorted(set(f for f in fieldnames if fieldnames.count(f) > 1))
+    if duplicates:
+        raise InvalidImportDocument('duplicate columns: {}'.format(duplicates))
+
+    batch = []
+    for row in reader:
+        batch.append((reader.line_num, row))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,57 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 0
+DEFAULT_RETRY_BACKOFF = 0.1
+
+
+class PooledSession(requests.Session):
+    """A requests session reusing up to `pool_size` connections per host
+
+    Idempotent requests failing to connect or to read a response are retried
+    `max_retries` times. Without `keep_alive`, each connection is closed after
+    its request.
+    """
+
+    def __init__(
+        self,
+        pool_size=DEFAULT_POOL_SIZE,
+        max_retries=DEFAULT_MAX_RETRIES,
+        keep_alive=True,
+        retry_backoff=DEFAULT_RETRY_BACKOFF,
+    ):
+        super().__init__()
+        retry = Retry(
+            total=max_retries,
+            status=0,
+            backoff_factor=retry_backoff,
+            raise_on_status=False,
+        )
+        self._adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+        self.mount('http://', self._adapter)
+        self.mount('https://', self._adapter)
+        if not keep_alive:
+            self.headers['Connection'] = 'close'
+
+    def connection_stats(self):
+        requests_count = connections_count = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            try:
+                pool = pools[key]
+            except KeyError:
+                continue
+            requests_count += pool.num_requests
+            connections_count += pool.num_connections
+
+        return {
+            'requests': requests_count,
+            'connections': connections_count,
+            'reused_connections': max(requests_count - connections_count, 0),
+        }
@@ -0,0 +1,54 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+from hamcrest import assert_that, contains, empty
+
+from ..bus_event_registry import BusEventRegistry
+
+
+class _Subscriber:
+    def __init__(self):
+        self.received = []
+
+    def on_event(self, body):
+        self.received.append(body)
+
+    def on_error(self, body):
+        raise Exception('Unexpected')
+
+
+class TestBusEventRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = BusEventRegistry()
+        self.subscriber = _Subscriber()
+
+    def test_that_events_are_dispatched_by_name(self):
+        self.registry.subscribe('user_created', self.subscriber.on_event)
+
+        self.registry.dispatch('user_created', {'name': 'user_created'})
+        self.registry.dispatch('user_deleted', {'name': 'user_deleted'})
+
+        assert_that(self.subscriber.received, contains({'name': 'user_created'}))
+
+    def test_that_unsubscribed_callbacks_are_not_called(self):
+        self.registry.subscribe('user_created', self.subscriber.on_event)
+        self.registry.unsubscribe('user_created', self.subscriber.on_event)
+
+        self.registry.dispatch('user_created', {'name': 'user_created'})
+
+        assert_that(self.subscriber.received, empty())
+
+    def test_that_dropped_subscribers_are_ignored(self):
+        self.registry.subscribe('user_created', _Subscriber().on_event)
+
+        self.registry.dispatch('user_created', {'name': 'user_created'})
+
+    def test_that_an_error_does_not_stop_the_dispatch(self):
+        self.registry.subscribe('user_created', self.subscriber.on_error)
+        self.registry.subscribe('user_created', self.subscriber.on_event)
+
+        self.registry.dispatch('user_created', {'name': 'user_created'})
+
+        assert_that(self.subscriber.received, contains({'name': 'user_created'}))
@@ -0,0 +1,130 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import time
+import unittest
+
+from hamcrest import assert_that, equal_to
+from mock import Mock
+
+from ..external_token_cache import ExternalTokenCache
+
+USER_UUID = 'a1b2c3'
+
+
+class TestExternalTokenCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.cache = ExternalTokenCache(
+            default_ttl=300, renew_margin=60, clock=lambda: self.now
+        )
+        self.fetch = Mock(return_value={'access_token': 'a', 'expires_at': 1600})
+
+    def test_that_tokens_are_kept_until_the_renew_margin(self):
+        self.cache.get('google', USER_UUID, self.fetch)
+        self.now = 1539
+
+        token = self.cache.get('google', USER_UUID, self.fetch)
+
+        assert_that(token, equal_to({'access_token': 'a', 'expires_at': 1600}))
+        self.fetch.assert_called_once_with()
+
+    def test_that_tokens_are_renewed_before_they_expire(self):
+        self.cache.get('google', USER_UUID, self.fetch)
+        self.now = 1540
+
+        self.cache.get('google', USER_UUID, self.fetch)
+
+        assert_that(self.fetch.call_count, equal_to(2))
+
+    def test_that_iso_expiration_dates_are_understood(self):
+        self.fetch.return_value = {
+            'access_token': 'a',
+            'expires_at': '1970-01-01T00:26:40Z',
+        }
+        self.cache.get('google', USER_UUID, self.fetch)
+        self.now = 1539
+
+        self.cache.get('google', USER_UUID, self.fetch)
+
+        self.fetch.assert_called_once_with()
+
+    def test_that_naive_expiration_dates_are_in_local_time(self):
+        self._set_timezone('Etc/GMT-2')  # UTC+2
+        self.fetch.return_value = {
+            'access_token': 'a',
+            'token_expiration': '1970-01-01T02:26:40',
+        }
+        self.cache.get('google', USER_UUID, self.fetch)
+        self.now = 1539
+
+        self.cache.get('google', USER_UUID, self.fetch)
+        self.fetch.assert_called_once_with()
+
+        self.now = 1540
+        self.cache.get('google', USER_UUID, self.fetch)
+        assert_that(self.fetch.call_count, equal_to(2))
+
+    def test_that_utc_expiration_dates_are_preferred(self):
+        self._set_timezone('Etc/GMT+5')  # UTC-5
+        self.fetch.return_value = {
+            'access_token': 'a',
+            'token_expiration': '1969-12-31T19:06:40',
+            'utc_expires_at': '1970-01-01T00:26:40',
+        }
+        self.cache.get('google', USER_UUID, self.fetch)
+        self.now = 1539
+
+        self.cache.get('google', USER_UUID, self.fetch)
+        self.fetch.assert_called_once_with()
+
+        self.now = 1540
+        self.cache.get('google', USER_UUID, self.fetch)
+        assert_that(self.fetch.call_count, equal_to(2))
+
+    def test_that_the_default_ttl_is_used_without_expiration(self):
+        self.fetch.return_value = {'access_token': 'a'}
+        self.cache.get('google', USER_UUID, self.fetch)
+        self.now = 1239
+
+        self.cache.get('google', USER_UUID, self.fetch)
+        self.fetch.assert_called_once_with()
+
+        self.now = 1240
+        self.cache.get('google', USER_UUID, self.fetch)
+        assert_that(self.fetch.call_count, equal_to(2))
+
+    def test_that_providers_are_cached_separately(self):
+        self.cache.get('google', USER_UUID, self.fetch)
+
+        self.cache.get('microsoft', USER_UUID, self.fetch)
+
+        assert_that(self.fetch.call_count, equal_to(2))
+
+    def test_that_tokens_are_dropped_on_external_auth_events(self):
+        self.cache.get('google', USER_UUID, self.fetch)
+
+        self.cache.on_event(
+            {
+                'name': 'auth_user_external_auth_deleted',
+                'data': {'user_uuid': USER_UUID, 'external_auth_name': 'google'},
+            }
+        )
+        self.cache.get('google', USER_UUID, self.fetch)
+
+        assert_that(self.fetch.call_count, equal_to(2))
+
+    def _set_timezone(self, name):
+        previous = os.environ.get('TZ')
+
+        def restore():
+            if previous is None:
+                os.environ.pop('TZ', None)
+            else:
+                os.environ['TZ'] = previous
+            time.tzset()
+
+        self.addCleanup(restore)
+        os.environ['TZ'] = name
+        time.tzset()
@@ -0,0 +1,133 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import io
+import time
+import unittest
+
+from hamcrest import (
+    assert_that,
+    calling,
+    contains,
+    equal_to,
+    has_entries,
+    raises,
+)
+from mock import Mock
+
+from wazo_dird.exception import NoSuchImportJob
+
+from ..import_jobs import (
+    ImportJob,
+    ImportJobs,
+    InvalidImportDocument,
+    MAX_ERRORS,
+    read_csv_batches,
+    spool_upload,
+)
+
+
+def _wait(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not job.done:
+        if time.monotonic() > deadline:
+            raise AssertionError('import {} did not finish'.format(job.uuid))
+        time.sleep(0.01)
+
+
+class TestImportJob(unittest.TestCase):
+    def test_that_only_the_first_errors_are_kept(self):
+        job = ImportJob('owner')
+
+        for line in range(MAX_ERRORS + 10):
+            job.add_error(line, 'invalid')
+
+        result = job.to_dict()
+        assert_that(result['failed'], equal_to(MAX_ERRORS + 10))
+        assert_that(len(result['errors']), equal_to(MAX_ERRORS))
+        assert_that(result['errors'][0], equal_to({'line': 0, 'errors': ['invalid']}))
+
+
+class TestImportJobs(unittest.TestCase):
+    def setUp(self):
+        self.jobs = ImportJobs(max_finished_jobs=2)
+        self.document = Mock()
+
+    def tearDown(self):
+        self.jobs.stop()
+
+    def test_that_the_job_is_run_in_the_background(self):
+        def run(job, document, created):
+            job.created = created
+
+        job = self.jobs.submit('owner', run, self.document, 42)
+        _wait(job)
+
+        assert_that(
+            self.jobs.get('owner', job.uuid).to_dict(),
+            has_entries(status='finished', created=42),
+        )
+        self.document.close.assert_called_once_with()
+
+    def test_that_a_failing_job_is_failed(self):
+        def run(job, document):
+            raise InvalidImportDocument('duplicate columns')
+
+        job = self.jobs.submit('owner', run, self.document)
+        _wait(job)
+
+        assert_that(
+            job.to_dict(), has_entries(status='failed', reason='duplicate columns')
+        )
+        self.document.close.assert_called_once_with()
+
+    def test_that_the_job_of_another_owner_cannot_be_read(self):
+        job = self.jobs.submit('owner', Mock(), self.document)
+
+        assert_that(
+            calling(self.jobs.get).with_args('other', job.uuid),
+            raises(NoSuchImportJob),
+        )
+        assert_that(
+            calling(self.jobs.get).with_args('owner', 'unknown'),
+            raises(NoSuchImportJob),
+        )
+
+    def test_that_old_finished_jobs_are_forgotten(self):
+        jobs = [self.jobs.submit('owner', Mock(), Mock()) for _ in range(3)]
+        for job in jobs:
+            _wait(job)
+
+        self.jobs.submit('owner', Mock(), self.document)
+
+        assert_that(
+            calling(self.jobs.get).with_args('owner', jobs[0].uuid),
+            raises(NoSuchImportJob),
+        )
+        self.jobs.get('owner', jobs[2].uuid)
+
+
+class TestReadCSVBatches(unittest.TestCase):
+    def test_that_rows_are_read_by_batches_with_their_line(self):
+        document = spool_upload(io.BytesIO('a,b\n1,é\n2,"x\ny"\n3,z\n'.encode('utf-8')))
+
+        batches = list(read_csv_batches(document, 'utf-8', 2))
+
+        assert_that(
+            batches,
+            contains(
+                contains(
+                    (2, {'a': '1', 'b': 'é'}),
+                    (4, {'a': '2', 'b': 'x\ny'}),
+                ),
+                contains((5, {'a': '3', 'b': 'z'})),
+            ),
+        )
+
+    def test_that_duplicate_columns_are_refused(self):
+        document = io.BytesIO(b'a,b,a\n1,2,3\n')
+
+        assert_that(
+            calling(list).with_args(read_csv_batches(document, 'utf-8', 10)),
+            raises(InvalidImportDocument),
+        )
@@ -0,0 +1,42 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+from hamcrest import assert_that, equal_to, has_entries, is_not
+from mock import Mock
+
+from ..pooled_session import PooledSession
+
+
+class TestPooledSession(unittest.TestCase):
+    def test_that_the_adapter_is_shared_by_http_and_https(self):
+        session = PooledSession(pool_size=3, max_retries=2)
+
+        adapter = session.get_adapter('https://example.com')
+
+        assert_that(session.get_adapter('http://example.com'), equal_to(adapter))
+        assert_that(adapter._pool_maxsize, equal_to(3))
+        assert_that(adapter.max_retries.total, equal_to(2))
+
+    def test_that_keep_alive_can_be_disabled(self):
+        session = PooledSession(keep_alive=False)
+
+        assert_that(session.headers, has_entries(Connection='close'))
+
+    def test_that_keep_alive_is_the_default(self):
+        session = PooledSession()
+
+        assert_that(session.headers, is_not(has_entries(Connection='close')))
+
+    def test_connection_stats(self):
+        session = PooledSession()
+        pools = session.get_adapter('http://example.com').poolmanager.pools
+        pools['a'] = Mock(num_requests=5, num_connections=2)
+        pools['b'] = Mock(num_requests=1, num_connections=1)
+
+        result = session.connection_stats()
+
+        assert_that(
+            result, has_entries(requests=6, connections=3, reused_connections=3)
+        )
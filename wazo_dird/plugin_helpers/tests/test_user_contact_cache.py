@@ -0,0 +1,146 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+from hamcrest import assert_that, contains, equal_to, has_entries, none, same_instance
+from mock import Mock
+
+from ..user_contact_cache import SyncStateExpired, UserContactCache
+
+USER_UUID = 'a1b2c3'
+ALICE = {'id': '1', 'name': 'Alice', 'numbers': ['1234']}
+BOB = {'id': '2', 'name': 'Bob', 'numbers': ['5678']}
+
+
+class TestUserContactCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.sync = Mock(return_value=([ALICE, BOB], [], 'state-1'))
+        self.cache = UserContactCache(
+            self.sync,
+            lambda contact: contact['numbers'],
+            provider='google',
+            sync_interval=60,
+            full_sync_interval=3600,
+            max_users=2,
+            clock=lambda: self.now,
+        )
+
+    def test_that_contacts_are_indexed(self):
+        contacts = self.cache.get(USER_UUID, 'token')
+
+        assert_that(list(contacts.contacts), contains('1', '2'))
+        assert_that(contacts.first_matched, has_entries({'1234': '1', '5678': '2'}))
+        self.sync.assert_called_once_with('token', None)
+
+    def test_that_contacts_are_not_synced_before_the_interval(self):
+        contacts = self.cache.get(USER_UUID, 'token')
+        self.now = 59
+
+        assert_that(self.cache.get(USER_UUID, 'token'), same_instance(contacts))
+        self.sync.assert_called_once_with('token', None)
+
+    def test_that_changes_are_applied_incrementally(self):
+        self.cache.get(USER_UUID, 'token')
+        self.now = 60
+        modified_bob = dict(BOB, numbers=['9999'])
+        self.sync.return_value = ([modified_bob], ['1'], 'state-2')
+
+        contacts = self.cache.get(USER_UUID, 'token')
+
+        self.sync.assert_called_with('token', 'state-1')
+        assert_that(contacts.contacts, equal_to({'2': modified_bob}))
+        assert_that(contacts.first_matched, equal_to({'9999': '2'}))
+        assert_that(contacts.sync_state, equal_to('state-2'))
+
+    def test_that_a_full_sync_is_done_after_the_full_sync_interval(self):
+        self.cache.get(USER_UUID, 'token')
+        self.now = 3600
+
+        self.cache.get(USER_UUID, 'token')
+
+        self.sync.assert_called_with('token', None)
+
+    def test_that_the_last_contacts_are_kept_when_the_sync_fails(self):
+        contacts = self.cache.get(USER_UUID, 'token')
+        self.now = 60
+        self.sync.return_value = None
+
+        assert_that(self.cache.get(USER_UUID, 'token'), same_instance(contacts))
+
+    def test_that_nothing_is_returned_when_the_first_sync_fails(self):
+        self.sync.return_value = None
+
+        assert_that(self.cache.get(USER_UUID, 'token'), none())
+
+    def test_that_the_least_recently_used_user_is_dropped(self):
+        self.cache.get('user-1', 'token')
+        self.cache.get('user-2', 'token')
+        self.cache.get('user-1', 'token')
+        self.cache.get('user-3', 'token')
+
+        self.cache.get('user-1', 'token')
+        self.cache.get('user-2', 'token')
+
+        assert_that(self.sync.call_count, equal_to(4))
+
+    def test_that_an_expired_sync_state_triggers_a_full_sync(self):
+        self.cache.get(USER_UUID, 'token')
+        self.now = 60
+        self.sync.side_effect = [SyncStateExpired(), ([BOB], [], 'state-2')]
+
+        contacts = self.cache.get(USER_UUID, 'token')
+
+        self.sync.assert_called_with('token', None)
+        assert_that(contacts.contacts, equal_to({'2': BOB}))
+
+    def test_that_a_full_sync_is_done_without_a_sync_state(self):
+        self.sync.return_value = ([ALICE], [], None)
+        self.cache.get(USER_UUID, 'token')
+        self.now = 60
+        self.sync.return_value = ([BOB], [], None)
+
+        contacts = self.cache.get(USER_UUID, 'token')
+
+        assert_that(contacts.contacts, equal_to({'2': BOB}))
+
+    def test_that_the_contacts_are_dropped_on_an_external_auth_event(self):
+        self.cache.get(USER_UUID, 'token')
+
+        self.cache.on_event(
+            {
+                'name': 'auth_user_external_auth_added',
+                'data': {'external_auth_name': 'google', 'user_uuid': USER_UUID},
+            }
+        )
+        self.cache.get(USER_UUID, 'token')
+
+        assert_that(self.sync.call_count, equal_to(2))
+        self.sync.assert_called_with('token', None)
+
+    def test_that_the_events_of_other_providers_are_ignored(self):
+        self.cache.get(USER_UUID, 'token')
+
+        self.cache.on_event(
+            {
+                'name': 'auth_user_external_auth_deleted',
+                'data': {'external_auth_name': 'microsoft', 'user_uuid': USER_UUID},
+            }
+        )
+        self.cache.get(USER_UUID, 'token')
+
+        self.sync.assert_called_once_with('token', None)
+
+    def test_that_contacts_synced_before_a_drop_are_not_kept(self):
+        def sync(token, sync_state):
+            self.cache.drop(USER_UUID)
+            return [ALICE], [], 'state-1'
+
+        self.sync.side_effect = sync
+        contacts = self.cache.get(USER_UUID, 'token')
+        self.sync.side_effect = None
+
+        assert_that(contacts.contacts, equal_to({'1': ALICE}))
+        self.cache.get(USER_UUID, 'token')
+        assert_that(self.sync.call_count, equal_to(2))
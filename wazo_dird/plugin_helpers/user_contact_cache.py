@@ -0,0 +1,152 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import logging
+import threading
+import time
+
+from collections import OrderedDict, namedtuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYNC_INTERVAL = 60.0
+DEFAULT_FULL_SYNC_INTERVAL = 86400.0
+DEFAULT_MAX_USERS = 1000
+EVENTS = [
+    'auth_user_external_auth_added',
+    'auth_user_external_auth_deleted',
+]
+
+
+class SyncStateExpired(Exception):
+    pass
+
+
+UserContacts = namedtuple(
+    'UserContacts',
+    ['contacts', 'first_matched', 'sync_state', 'synced_at', 'full_synced_at'],
+)
+
+
+class UserContactCache:
+    """The contacts of each user of an external source, kept in sync incrementally
+
+    `sync(provider_token, sync_state)` returns the contacts modified since
+    `sync_state`, the ids of the deleted contacts and the next sync state, or
+    None when the contacts cannot be fetched. A None `sync_state` asks for all
+    the contacts, and `sync` raises SyncStateExpired when the provider cannot
+    answer from `sync_state` anymore.
+
+    `first_match_values(contact)` returns the lowercased values indexed for
+    first_match and match_all.
+
+    The contacts of a user are dropped when wazo-auth sends an event about the
+    `provider` external auth of this user.
+    """
+
+    def __init__(
+        self,
+        sync,
+        first_match_values,
+        unique_column='id',
+        provider=None,
+        sync_interval=DEFAULT_SYNC_INTERVAL,
+        full_sync_interval=DEFAULT_FULL_SYNC_INTERVAL,
+        max_users=DEFAULT_MAX_USERS,
+        clock=time.monotonic,
+    ):
+        self._sync = sync
+        self._first_match_values = first_match_values
+        self._unique_column = unique_column
+        self._provider = provider
+        self._sync_interval = sync_interval
+        self._full_sync_interval = full_sync_interval
+        self._max_users = max_users
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+        self._drops = 0
+
+    def get(self, user_uuid, provider_token):
+        with self._lock:
+            drops = self._drops
+            previous = self._users.get(user_uuid)
+            if previous:
+                self._users.move_to_end(user_uuid)
+
+        now = self._clock()
+        if previous and now < previous.synced_at + self._sync_interval:
+            return previous
+
+        contacts = self._synced(provider_token, previous, now)
+        if contacts is None:
+            return previous
+
+        with self._lock:
+            if drops != self._drops:
+                # the user was dropped during the sync, it may be from the old account
+                return contacts
+            self._users[user_uuid] = contacts
+            self._users.move_to_end(user_uuid)
+            while len(self._users) > self._max_users:
+                self._users.popitem(last=False)
+        return contacts
+
+    def drop(self, user_uuid):
+        with self._lock:
+            self._users.pop(user_uuid, None)
+            self._drops += 1
+
+    def on_event(self, body):
+        data = body.get('data') or {}
+        if data.get('external_auth_name') != self._provider:
+            return
+
+        user_uuid = data.get('user_uuid')
+        logger.debug(
+            '%s: dropping the %s contacts of %s',
+            body['name'],
+            self._provider,
+            user_uuid,
+        )
+        self.drop(user_uuid)
+
+    def _synced(self, provider_token, previous, now):
+        full = (
+            previous is None
+            or previous.sync_state is None
+            or now >= previous.full_synced_at + self._full_sync_interval
+        )
+        if full:
+            changes = self._sync(provider_token, None)
+        else:
+            try:
+                changes = self._sync(provider_token, previous.sync_state)
+            except SyncStateExpired:
+                full = True
+                changes = self._sync(provider_token, None)
+        if changes is None:
+            return None
+
+        modified, deleted, sync_state = changes
+        full_synced_at = now if full else previous.full_synced_at
+        if not full and not modified and not deleted:
+            return previous._replace(
+                sync_state=sync_state, synced_at=now, full_synced_at=full_synced_at
+            )
+
+        contacts = OrderedDict() if full else OrderedDict(previous.contacts)
+        for unique_id in deleted:
+            contacts.pop(unique_id, None)
+        for contact in modified:
+            contacts[contact[self._unique_column]] = contact
+
+        first_matched = {}
+        for unique_id, contact in contacts.items():
+            for value in self._first_match_values(contact):
+                first_matched.setdefault(value, unique_id)
+
+        logger.debug(
+            'synced %s modified and %s deleted contacts', len(modified), len(deleted)
+        )
+        return UserContacts(contacts, first_matched, sync_state, now, full_synced_at)
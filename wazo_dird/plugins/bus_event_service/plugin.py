@@ -0,0 +1,58 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import logging
+
+import kombu
+
+from wazo_dird import BaseServicePlugin
+from wazo_dird.plugin_helpers.bus_event_registry import registry
+
+logger = logging.getLogger(__name__)
+
+
+class BusEventServicePlugin(BaseServicePlugin):
+    def __init__(self):
+        self._service = None
+
+    def load(self, dependencies):
+        bus = dependencies['bus']
+
+        self._service = _BusEventService(bus, registry)
+
+
+class _BusEventService:
+
+    _exchange = kombu.Exchange('xivo', type='topic')
+    _routing_keys = [
+        'config.user.*',
+        'config.users.*.lines.*.*',
+        'config.users.*.voicemails.*',
+        'config.line.*',
+        'config.line_extension_associated.*',
+        'config.extension.*',
+        'config.voicemail.*',
+        'config.conferences.*',
+        'config.conferences.extensions.*',
+        'config.incalls.*',
+        'config.incalls.extensions.*',
+        'auth.users.*.external.*.*',
+    ]
+
+    def __init__(self, bus, registry):
+        self._registry = registry
+        for routing_key in self._routing_keys:
+            queue = kombu.Queue(
+                exchange=self._exchange, routing_key=routing_key, exclusive=True
+            )
+            bus.add_consumer(queue, self._on_event)
+
+    # executed in the consumer thread
+    def _on_event(self, body, message):
+        try:
+            event_name = body['name']
+        except (KeyError, TypeError):
+            logger.info('Ignoring the following malformed bus message: %s', body)
+            return
+
+        self._registry.dispatch(event_name, body)
@@ -0,0 +1,34 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+from hamcrest import assert_that, equal_to
+from mock import Mock
+
+from ..plugin import _BusEventService
+
+
+class TestBusEventService(unittest.TestCase):
+    def setUp(self):
+        self.bus = Mock()
+        self.registry = Mock()
+        self.service = _BusEventService(self.bus, self.registry)
+
+    def test_that_a_consumer_is_added_for_each_routing_key(self):
+        assert_that(
+            self.bus.add_consumer.call_count,
+            equal_to(len(_BusEventService._routing_keys)),
+        )
+
+    def test_that_events_are_dispatched_by_name(self):
+        body = {'name': 'user_edited', 'origin_uuid': 'uuid', 'data': {}}
+
+        self.service._on_event(body, Mock())
+
+        self.registry.dispatch.assert_called_once_with('user_edited', body)
+
+    def test_that_malformed_events_are_ignored(self):
+        self.service._on_event({'data': {}}, Mock())
+
+        self.registry.dispatch.assert_not_called()
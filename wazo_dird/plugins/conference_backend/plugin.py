@@ -2,18 +2,28 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import logging
+import threading
+import time
 
-from unidecode import unidecode
-from requests import HTTPError
+from collections import namedtuple
+from requests import RequestException
 
 from wazo_dird import BaseSourcePlugin, make_result_class
-from wazo_dird.helpers import BaseBackendView
+from wazo_dird.helpers import BaseBackendView, normalize
+from wazo_dird.plugin_helpers.bus_event_registry import registry as bus_events
 from wazo_dird.plugin_helpers.confd_client_registry import registry
 
 from . import http
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CACHE_TTL = 300.0
+
+# The indexes hold positions in `contacts`, a new result is built for each lookup
+_Conferences = namedtuple(
+    '_Conferences', ['contacts', 'searched', 'first_matched', 'unique']
+)
+
 
 class ConferenceViewPlugin(BaseBackendView):
 
@@ -38,9 +48,29 @@ class ConferenceViewPlugin(BaseBackendView):
 
 
 class ConferencePlugin(BaseSourcePlugin):
+
+    EVENTS = [
+        'conference_created',
+        'conference_edited',
+        'conference_deleted',
+        'conference_extension_associated',
+        'conference_extension_dissociated',
+        'incall_edited',
+        'incall_deleted',
+        'incall_extension_associated',
+        'incall_extension_dissociated',
+        'extension_edited',
+    ]
+
     def __init__(self):
         self._client = None
         self._uuid = None
+        self._cache_ttl = DEFAULT_CACHE_TTL
+        self._conferences = None
+        self._expires_at = 0
+        # Incremented by each event, a fetch overlapping an event is not kept fresh
+        self._generation = 0
+        self._lock = threading.Lock()
 
     def load(self, dependencies):
         config = dependencies['config']
@@ -48,6 +78,7 @@ class ConferencePlugin(BaseSourcePlugin):
         self._first_matched_columns = config.get(self.FIRST_MATCHED_COLUMNS, [])
         self.name = config['name']
         self._client = registry.get(config)
+        self._cache_ttl = config.get('cache_ttl', DEFAULT_CACHE_TTL)
 
         self._SourceResult = make_result_class(
             'conference',
@@ -55,90 +86,122 @@ class ConferencePlugin(BaseSourcePlugin):
             'id',
             format_columns=config.get(self.FORMAT_COLUMNS),
         )
+        for event_name in self.EVENTS:
+            bus_events.subscribe(event_name, self.on_event)
         logger.info('Wazo %s successfully loaded', config['name'])
 
     def unload(self):
+        for event_name in self.EVENTS:
+            bus_events.unsubscribe(event_name, self.on_event)
         registry.unregister_all()
 
+    def on_event(self, body):
+        logger.debug('%s: %s received, expiring conferences', self.name, body['name'])
+        self._generation += 1
+        self._expires_at = 0
+
     def list(self, unique_ids, args=None):
         logger.debug('Listing all conferences')
-        contacts = self._fetch_contacts()
-        matching_contacts = (c for c in contacts if str(c['id']) in unique_ids)
-        results = [self._SourceResult(c) for c in matching_contacts]
+        conferences = self._get_conferences()
+        results = [
+            self._SourceResult(conferences.contacts[conferences.unique[unique_id]])
+            for unique_id in dict.fromkeys(unique_ids)
+            if unique_id in conferences.unique
+        ]
         logger.debug('Found %s conferences', len(results))
         return results
 
     def search(self, term, profile=None, args=None):
         logger.debug('Looking for all conferences matching "%s"', term)
-        clean_term = unidecode(term.lower())
-        contacts = self._fetch_contacts()
-        matching_contacts = (c for c in contacts if self._search_filter(clean_term, c))
-        results = [self._SourceResult(c) for c in matching_contacts]
+        clean_term = normalize(term)
+        conferences = self._get_conferences()
+        results = [
+            self._SourceResult(contact)
+            for contact, values in zip(conferences.contacts, conferences.searched)
+            if any(clean_term in value for value in values)
+        ]
         logger.debug('Found %s conferences', len(results))
         return results
 
     def first_match(self, term, args=None):
         logger.debug('Looking for first conference matching "%s"', term)
-        lowered_term = term.lower()
-        for contact in self._fetch_contacts():
-            if self._first_match_filter(lowered_term, contact):
-                logger.debug('Found one conference')
-                return self._SourceResult(contact)
-        logger.debug('Found no conference')
+        conferences = self._get_conferences()
+        position = conferences.first_matched.get(term.lower())
+        if position is None:
+            logger.debug('Found no conference')
+            return None
+
+        logger.debug('Found one conference')
+        return self._SourceResult(conferences.contacts[position])
 
     def match_all(self, terms, args=None):
         logger.debug('Looking for conference matching "%s"', terms)
+        conferences = self._get_conferences()
         results = {}
-        for contact in self._fetch_contacts():
-            for term in terms:
-                lowered_term = term.lower()
-                if self._first_match_filter(lowered_term, contact):
-                    results[term] = self._SourceResult(contact)
-                    logger.debug('Found one conference match to "%s"', term)
+        for term in terms:
+            position = conferences.first_matched.get(term.lower())
+            if position is not None:
+                results[term] = self._SourceResult(conferences.contacts[position])
+                logger.debug('Found one conference match to "%s"', term)
 
         if not results:
             logger.debug('Found no conference')
         return results
 
-    def _first_match_filter(self, lowered_term, contact):
-        for column in self._first_matched_columns:
-            column_value = contact.get(column) or ''
-            if isinstance(column_value, str):
-                if lowered_term == column_value.lower():
-                    return True
-            elif isinstance(column_value, list):
-                for item in column_value:
-                    if lowered_term == item.lower():
-                        return True
-
-        return False
-
-    def _search_filter(self, clean_term, contact):
-        for column in self._searched_columns:
-            column_value = contact.get(column) or ''
-            if isinstance(column_value, str):
-                clean_column_value = unidecode(column_value.lower())
-                if clean_term in clean_column_value:
-                    return True
-            elif isinstance(column_value, list):
-                for item in column_value:
-                    clean_item = unidecode(item.lower())
-                    if clean_term in clean_item:
-                        return True
-
-        return False
+    def _get_conferences(self):
+        with self._lock:
+            if self._conferences is None or time.monotonic() >= self._expires_at:
+                generation = self._generation
+                contacts = self._fetch_contacts()
+                if contacts is not None:
+                    self._conferences = self._index(contacts)
+                    if self._generation == generation:
+                        self._expires_at = time.monotonic() + self._cache_ttl
+                    else:
+                        self._expires_at = 0
+                elif self._conferences is None:
+                    return self._index([])
+                else:
+                    logger.info('%s: using the last fetched conferences', self.name)
+            return self._conferences
+
+    def _index(self, contacts):
+        searched, first_matched, unique = [], {}, {}
+        for position, contact in enumerate(contacts):
+            searched.append(
+                [
+                    normalize(value)
+                    for column in self._searched_columns
+                    for value in self._column_values(contact, column)
+                ]
+            )
+            for column in self._first_matched_columns:
+                for value in self._column_values(contact, column):
+                    first_matched.setdefault(value.lower(), position)
+            unique.setdefault(str(contact['id']), position)
+        return _Conferences(contacts, searched, first_matched, unique)
+
+    @staticmethod
+    def _column_values(contact, column):
+        value = contact.get(column) or ''
+        if isinstance(value, str):
+            return [value]
+        elif isinstance(value, list):
+            return value
+        return []
 
     def _fetch_contacts(self):
         if not self._client:
             logger.info('conference source not initialized properly %s', self.name)
-            return
+            return None
 
         try:
             response = self._client.conferences.list()
-        except HTTPError as e:
+        except RequestException as e:
             logger.info('failed to fetch conferences %s', e)
-            return
+            return None
 
+        contacts = []
         for conference in response['items']:
             extensions = []
             for extension in conference['extensions']:
@@ -148,9 +211,12 @@ class ConferencePlugin(BaseSourcePlugin):
                 for extension in incall['extensions']:
                     incalls.append(extension['exten'])
 
-            yield {
-                'id': conference['id'],
-                'name': conference['name'],
-                'extensions': extensions,
-                'incalls': incalls,
-            }
+            contacts.append(
+                {
+                    'id': conference['id'],
+                    'name': conference['name'],
+                    'extensions': extensions,
+                    'incalls': incalls,
+                }
+            )
+        return contacts
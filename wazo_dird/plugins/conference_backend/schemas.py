@@ -4,6 +4,7 @@
 from marshmallow import EXCLUDE, pre_dump
 
 from xivo.mallow import fields
+from xivo.mallow.validate import Range
 from xivo.mallow_helpers import ListSchema as _ListSchema
 from wazo_dird.schemas import (
     AuthConfigSchema,
@@ -66,6 +67,7 @@ class SourceSchema(BaseSourceSchema):
     confd = fields.Nested(
         ConfdConfigSchema, missing=lambda: ConfdConfigSchema().load({}), unknown=EXCLUDE
     )
+    cache_ttl = fields.Float(validate=Range(min=0), missing=300.0)
 
 
 contact_list_schema = ContactSchema(many=True)
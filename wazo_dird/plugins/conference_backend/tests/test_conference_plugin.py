@@ -0,0 +1,136 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+from hamcrest import assert_that, contains, equal_to, has_key, is_not, none
+from mock import Mock
+from requests import ConnectionError, HTTPError
+
+from wazo_dird import make_result_class
+from ..plugin import ConferencePlugin
+
+SourceResult = make_result_class('conference', 'confs', 'id')
+
+CONFERENCE_1 = {
+    'id': 1,
+    'name': 'Conférence Ventes',
+    'extensions': [{'context': 'default', 'exten': '4001'}],
+    'incalls': [{'extensions': [{'context': 'from-extern', 'exten': '5551234'}]}],
+}
+CONFERENCE_2 = {
+    'id': 2,
+    'name': 'Support',
+    'extensions': [{'context': 'default', 'exten': '4002'}],
+    'incalls': [],
+}
+
+CONTACT_1 = {
+    'id': 1,
+    'name': 'Conférence Ventes',
+    'extensions': ['4001'],
+    'incalls': ['5551234'],
+}
+CONTACT_2 = {'id': 2, 'name': 'Support', 'extensions': ['4002'], 'incalls': []}
+
+
+class TestConferencePlugin(unittest.TestCase):
+    def setUp(self):
+        self.client = Mock()
+        self.client.conferences.list.return_value = {
+            'items': [CONFERENCE_1, CONFERENCE_2],
+            'total': 2,
+        }
+        self.source = ConferencePlugin()
+        self.source.name = 'confs'
+        self.source._client = self.client
+        self.source._SourceResult = SourceResult
+        self.source._searched_columns = ['name']
+        self.source._first_matched_columns = ['extensions', 'incalls']
+
+    def test_search(self):
+        result = self.source.search('conference')
+
+        assert_that(result, contains(SourceResult(CONTACT_1)))
+
+    def test_first_match(self):
+        assert_that(
+            self.source.first_match('5551234'), equal_to(SourceResult(CONTACT_1))
+        )
+        assert_that(self.source.first_match('4003'), none())
+
+    def test_match_all(self):
+        result = self.source.match_all(['4001', '4002', '4003'])
+
+        assert_that(
+            result,
+            equal_to(
+                {'4001': SourceResult(CONTACT_1), '4002': SourceResult(CONTACT_2)}
+            ),
+        )
+
+    def test_list(self):
+        result = self.source.list(['2', '3'])
+
+        assert_that(result, contains(SourceResult(CONTACT_2)))
+
+    def test_that_conferences_are_fetched_once(self):
+        self.source.search('conference')
+        self.source.first_match('4001')
+        self.source.list(['1'])
+
+        self.client.conferences.list.assert_called_once_with()
+
+    def test_that_conferences_are_fetched_again_after_an_event(self):
+        self.source.search('conference')
+
+        self.source.on_event({'name': 'conference_edited'})
+        self.source.search('conference')
+
+        assert_that(self.client.conferences.list.call_count, equal_to(2))
+
+    def test_that_conferences_are_fetched_again_when_the_cache_expires(self):
+        self.source._cache_ttl = 0
+        self.source.search('conference')
+
+        self.source.search('conference')
+
+        assert_that(self.client.conferences.list.call_count, equal_to(2))
+
+    def test_that_the_last_conferences_are_used_when_confd_fails(self):
+        self.source.search('conference')
+        self.source.on_event({'name': 'conference_edited'})
+        self.client.conferences.list.side_effect = HTTPError()
+
+        result = self.source.list(['1'])
+
+        assert_that(result, contains(SourceResult(CONTACT_1)))
+
+    def test_that_results_are_not_shared(self):
+        result = self.source.first_match('4001')
+        result.fields['favorite'] = True
+
+        assert_that(self.source.first_match('4001').fields, is_not(has_key('favorite')))
+
+    def test_that_the_last_conferences_are_used_when_confd_is_unreachable(self):
+        self.source.search('conference')
+        self.source.on_event({'name': 'conference_edited'})
+        self.client.conferences.list.side_effect = ConnectionError()
+
+        result = self.source.list(['1'])
+
+        assert_that(result, contains(SourceResult(CONTACT_1)))
+
+    def test_that_an_event_during_a_fetch_is_not_lost(self):
+        def list_during_an_event():
+            self.source.on_event({'name': 'conference_edited'})
+            return {'items': [CONFERENCE_1], 'total': 1}
+
+        self.client.conferences.list.side_effect = list_during_an_event
+        self.source.search('conference')
+        self.client.conferences.list.side_effect = None
+
+        result = self.source.list(['2'])
+
+        assert_that(result, contains(SourceResult(CONTACT_2)))
+        assert_that(self.client.conferences.list.call_count, equal_to(2))
@@ -2,17 +2,27 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import csv
+import io
+import locale
 import logging
+import mmap
+import os
+import sys
+import threading
+import weakref
 
-from functools import partial
+from array import array
+from collections import defaultdict, namedtuple
 from wazo_dird import BaseSourcePlugin
 from wazo_dird import make_result_class
-from wazo_dird.helpers import BaseBackendView
+from wazo_dird.helpers import BaseBackendView, normalize
 
 from . import http
 
 logger = logging.getLogger(__name__)
 
+_LoadedFile = namedtuple('_LoadedFile', ['file', 'index'])
+
 
 class CSVView(BaseBackendView):
 
@@ -32,6 +42,14 @@ class CSVPlugin(BaseSourcePlugin):
 
     The `file` is the file that should be read by the plugin
     The `searched_columns` are the columns used to search for a term
+
+    When `reload_interval` is set, the file is checked for modifications every
+    `reload_interval` seconds and reloaded in the background when it changed.
+
+    When `memory_mapped` is true, only the position of each entry is kept in
+    memory and entries are read from the mapped file when they are returned.
+
+    Sources reading the same file share its loaded content.
     """
 
     def load(self, args):
@@ -40,7 +58,8 @@ class CSVPlugin(BaseSourcePlugin):
 
         self._config = args.get('config', {})
         self._name = self._config.get('name', '')
-        self._content = []
+        self._loaded = _LoadedFile(_CSVFile.empty(), _CSVIndex.empty())
+        self._watcher = None
         self._has_unique_id = self._config.get(self.UNIQUE_COLUMN, None) is not None
         self._load_file()
         backend = self._config.get('backend', '')
@@ -51,6 +70,15 @@ class CSVPlugin(BaseSourcePlugin):
             self._config.get(self.FORMAT_COLUMNS, {}),
         )
 
+        reload_interval = self._config.get('reload_interval')
+        if reload_interval and 'file' in self._config:
+            self._watcher = _FileWatcher(self, self._name, reload_interval)
+            self._watcher.start()
+
+    def unload(self):
+        if self._watcher:
+            self._watcher.stop()
+
     def name(self):
         return self._name
 
@@ -58,12 +86,8 @@ class CSVPlugin(BaseSourcePlugin):
         if self.SEARCHED_COLUMNS not in self._config:
             return []
 
-        fn = partial(
-            self._low_case_match_entry,
-            term.lower(),
-            self._config[self.SEARCHED_COLUMNS],
-        )
-        return self._list_from_predicate(fn)
+        loaded = self._loaded
+        return self._list_from_indexes(loaded.file, loaded.index.search(term))
 
     def first_match(self, term, args=None):
         logger.debug('Looking for the first CSV entry matching "%s"', term)
@@ -71,21 +95,31 @@ class CSVPlugin(BaseSourcePlugin):
             logger.debug('No column configured for first match. Stopping.')
             return None
 
-        for entry in self._content:
-            if self._exact_match_entry(
-                term, self._config[self.FIRST_MATCHED_COLUMNS], entry
-            ):
-                logger.debug('Found one CSV entry matching "%s"', term)
-                return self._SourceResult(entry)
-        logger.debug('Found no CSV entry matching "%s"', term)
-        return None
+        loaded = self._loaded
+        index = loaded.index.first_match(term)
+        if index is None:
+            logger.debug('Found no CSV entry matching "%s"', term)
+            return None
+
+        logger.debug('Found one CSV entry matching "%s"', term)
+        return self._SourceResult(
+            self._row_to_dict(loaded.file.keys, loaded.file.rows[index])
+        )
 
     def list(self, unique_ids, args=None):
         if not self._has_unique_id:
             return []
 
-        fn = partial(self._is_in_unique_ids, unique_ids)
-        return self._list_from_predicate(fn)
+        loaded = self._loaded
+        return self._list_from_indexes(loaded.file, loaded.index.list(unique_ids))
+
+    def _reload_if_modified(self):
+        version = _file_version(self._config['file'])
+        if version is None or version == self._loaded.file.version:
+            return
+
+        logger.info('CSV file of source "%s" has been modified', self._name)
+        self._load_file()
 
     def _load_file(self):
         if 'file' not in self._config:
@@ -94,56 +128,312 @@ class CSVPlugin(BaseSourcePlugin):
 
         filename = self._config['file']
         delimiter = str(self._config.get('separator', ','))
+        memory_mapped = self._config.get('memory_mapped', False)
 
         try:
-            logger.debug('Reading %s with delimiter %r', filename, delimiter)
-            with open(filename, 'r') as f:
-                csvreader = csv.reader(f, delimiter=delimiter)
-                keys = [key for key in next(csvreader)]
-                self._content = [self._row_to_dict(keys, row) for row in csvreader]
-                logger.debug('Loaded with %s', self._content)
+            csv_file = _files.get(filename, delimiter, memory_mapped)
         except IOError:
             logger.exception('Could not load CSV file content')
+            return
 
-    def _list_from_predicate(self, predicate):
-        return list(map(self._SourceResult, filter(predicate, self._content)))
-
-    def _is_in_unique_ids(self, unique_ids, entry):
-        return self._make_unique(entry) in unique_ids
+        if csv_file.version is None and self._loaded.file.rows:
+            # The file is read again on the next check, until it is stable
+            return
 
-    def _low_case_match_entry(self, term, columns, entry):
-        logger.debug('Looking for %r in %s %s', term, entry, columns)
-        lowered_values = [value.lower() for value in self._entry_values(columns, entry)]
-        for value in lowered_values:
-            if term in value:
-                return True
-        return False
+        index = csv_file.index(
+            self._config.get(self.SEARCHED_COLUMNS),
+            self._config.get(self.FIRST_MATCHED_COLUMNS),
+            self._config.get(self.UNIQUE_COLUMN),
+        )
+        self._loaded = _LoadedFile(csv_file, index)
 
-    def _exact_match_entry(self, term, columns, entry):
-        for value in self._entry_values(columns, entry):
-            if term == value:
-                return True
-        return False
+    def _list_from_indexes(self, csv_file, indexes):
+        return [
+            self._SourceResult(self._row_to_dict(csv_file.keys, csv_file.rows[index]))
+            for index in indexes
+        ]
 
     @staticmethod
-    def _entry_values(column_names, entry):
-        values = []
-        for column_name in column_names:
-            if not column_name:
-                continue
+    def _row_to_dict(keys, values):
+        return dict(zip(keys, values))
+
+
+class _FileWatcher:
+    """Reloads the file of a CSV source when it is modified
+
+    Only a weak reference to the source is kept, the watcher stops by itself
+    when the source is discarded.
+    """
+
+    def __init__(self, source, name, interval):
+        self._source = weakref.ref(source)
+        self._name = name
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name='csv-watcher-{}'.format(name)
+        )
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            source = self._source()
+            if source is None:
+                return
+
             try:
-                values.append(entry[column_name])
-            except KeyError:
-                logger.info(
-                    'plugin misconfigured "%s" is not in the CSV file',
-                    column_name,
-                )
-        return values
+                source._reload_if_modified()
+            except Exception:
+                logger.exception('Failed to reload the CSV source %s', self._name)
+            del source
+
+
+def _file_version(filename):
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class _CSVFileRegistry:
+    """Loaded CSV files, shared by all the sources reading the same file"""
+
+    def __init__(self):
+        self._files = weakref.WeakValueDictionary()
+        self._locks = defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+
+    def get(self, filename, delimiter, memory_mapped):
+        key = (os.path.realpath(filename), delimiter, bool(memory_mapped))
+        with self._lock:
+            file_lock = self._locks[key]
+
+        with file_lock:
+            csv_file = self._files.get(key)
+            version = _file_version(filename)
+            if csv_file and csv_file.version and csv_file.version == version:
+                logger.debug('Reusing the loaded content of %s', filename)
+                return csv_file
+
+            csv_file = _CSVFile.load(filename, delimiter, memory_mapped)
+            self._files[key] = csv_file
+            return csv_file
+
+
+class _CSVFile:
+    """The header and rows of a CSV file
+
+    Rows are tuples of interned values sharing the same header. When the file
+    is memory mapped, rows are parsed from the mapping when they are accessed.
+
+    The version is None when the file was modified while it was read.
+    """
+
+    def __init__(self, version, keys, rows):
+        self.version = version
+        self.keys = keys
+        self.rows = rows
+        self._indexes = {}
+        self._indexes_lock = threading.Lock()
+
+    @classmethod
+    def empty(cls):
+        return cls(None, (), [])
+
+    @classmethod
+    def load(cls, filename, delimiter, memory_mapped=False):
+        version = _file_version(filename)
+        logger.debug('Reading %s with delimiter %r', filename, delimiter)
+        if memory_mapped:
+            keys, rows = _MappedRows.load(filename, delimiter)
+        else:
+            keys, rows = cls._read(filename, delimiter)
+
+        if _file_version(filename) != version:
+            logger.info('%s has been modified while it was read', filename)
+            version = None
+
+        logger.debug('Loaded %s entries from %s', len(rows), filename)
+        return cls(version, keys, rows)
 
     @staticmethod
-    def _row_to_dict(keys, values):
-        return dict(zip(keys, values))
+    def _read(filename, delimiter):
+        intern = sys.intern
+        with open(filename, 'r') as f:
+            csvreader = csv.reader(f, delimiter=delimiter)
+            keys = tuple(intern(key) for key in next(csvreader, []))
+            rows = [tuple(intern(value) for value in row) for row in csvreader]
+        return keys, rows
+
+    def index(self, searched_columns, first_matched_columns, unique_column):
+        key = (
+            tuple(searched_columns or []),
+            tuple(first_matched_columns or []),
+            unique_column,
+        )
+        with self._indexes_lock:
+            if key not in self._indexes:
+                self._indexes[key] = _CSVIndex(self, *key)
+            return self._indexes[key]
+
+
+class _MappedRows:
+    """Rows of a memory mapped CSV file, parsed when they are accessed
+
+    Only the offset of each row is kept in memory. The file must be replaced
+    rather than rewritten in place while it is mapped.
+    """
+
+    def __init__(self, mapping, delimiter, encoding, offsets):
+        self._mapping = mapping
+        self._delimiter = delimiter
+        self._encoding = encoding
+        self._offsets = offsets
+
+    @classmethod
+    def load(cls, filename, delimiter):
+        encoding = locale.getpreferredencoding(False)
+        with open(filename, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                return (), []
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        position = 0
+
+        def lines():
+            nonlocal position
+            for line in iter(mapping.readline, b''):
+                position += len(line)
+                yield line.decode(encoding)
+
+        csvreader = csv.reader(lines(), delimiter=delimiter)
+        keys = tuple(sys.intern(key) for key in next(csvreader, []))
+        offsets = array('Q')
+        start = position
+        for _ in csvreader:
+            offsets.append(start)
+            start = position
+        offsets.append(start)
+
+        return keys, cls(mapping, delimiter, encoding, offsets)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        raw = self._mapping[self._offsets[i] : self._offsets[i + 1]]
+        text = io.StringIO(raw.decode(self._encoding), newline='')
+        return tuple(next(csv.reader(text, delimiter=self._delimiter), ()))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class _CSVIndex:
+    """Lookup structures computed once for the content of a CSV file
+
+    * every row's searched values are normalized and kept in a column store
+    * each n-gram of the searched values maps to the rows containing it
+    * each value of the first matched columns maps to the first row containing it
+    * each value of the unique column maps to the rows containing it
+    """
+
+    NGRAM_SIZE = 3
+    _SEPARATOR = '\0'
+
+    def __init__(self, csv_file, searched_columns, first_matched_columns, unique):
+        positions = {key: i for i, key in enumerate(csv_file.keys)}
+        searched = self._positions(positions, searched_columns)
+        first_matched = self._positions(positions, first_matched_columns)
+        unique = positions.get(unique)
+
+        self._normalized = []
+        self._exact = {}
+        self._unique = defaultdict(list)
+        ngrams = defaultdict(list)
+
+        for i, row in enumerate(csv_file.rows):
+            length = len(row)
+            values = [normalize(row[p]) for p in searched if p < length]
+            for ngram in self._ngrams_of(*values):
+                ngrams[ngram].append(i)
+            # A row without any searched value never matches, not even an empty term
+            self._normalized.append(self._SEPARATOR.join(values) if values else None)
+
+            for position in first_matched:
+                if position < length:
+                    self._exact.setdefault(row[position], i)
+            if unique is not None and unique < length:
+                self._unique[row[unique]].append(i)
+
+        self._ngrams = {ngram: array('I', rows) for ngram, rows in ngrams.items()}
+        self._unique = dict(self._unique)
+
+    @classmethod
+    def empty(cls):
+        return cls(_CSVFile.empty(), (), (), None)
+
+    def search(self, term):
+        term = normalize(term)
+        if len(term) < self.NGRAM_SIZE:
+            candidates = range(len(self._normalized))
+        else:
+            candidates = self._smallest_posting(term)
+
+        normalized = self._normalized
+        return [
+            i for i in candidates if normalized[i] is not None and term in normalized[i]
+        ]
+
+    def first_match(self, term):
+        return self._exact.get(term)
+
+    def list(self, unique_ids):
+        indexes = []
+        for unique_id in set(unique_ids):
+            indexes.extend(self._unique.get(unique_id, []))
+        return sorted(indexes)
+
+    def _smallest_posting(self, term):
+        smallest = None
+        for ngram in self._ngrams_of(term):
+            posting = self._ngrams.get(ngram)
+            if not posting:
+                return []
+            if smallest is None or len(posting) < len(smallest):
+                smallest = posting
+        return smallest
+
+    @classmethod
+    def _ngrams_of(cls, *values):
+        size = cls.NGRAM_SIZE
+        return {
+            value[i : i + size]
+            for value in values
+            for i in range(len(value) - size + 1)
+        }
+
+    @staticmethod
+    def _positions(positions, columns):
+        result = []
+        for column in columns:
+            if not column:
+                continue
+            if column not in positions:
+                logger.info('plugin misconfigured "%s" is not in the CSV file', column)
+                continue
+            result.append(positions[column])
+        return result
+
 
-    def _make_unique(self, entry):
-        unique_column = self._config[self.UNIQUE_COLUMN]
-        return entry[unique_column]
+_files = _CSVFileRegistry()
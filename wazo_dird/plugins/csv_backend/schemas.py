@@ -2,7 +2,7 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from xivo.mallow import fields
-from xivo.mallow.validate import Length
+from xivo.mallow.validate import Length, Range
 from xivo.mallow_helpers import ListSchema as _ListSchema
 from wazo_dird.schemas import BaseSourceSchema
 
@@ -11,6 +11,8 @@ class SourceSchema(BaseSourceSchema):
     unique_column = fields.String(Length(min=1, max=128), allownone=True, missing=None)
     file = fields.String(Length(min=1), required=True)
     separator = fields.String(Length(min=1, max=1), missing=',')
+    reload_interval = fields.Float(validate=Range(min=0), missing=0)
+    memory_mapped = fields.Boolean(missing=False)
 
 
 class ListSchema(_ListSchema):
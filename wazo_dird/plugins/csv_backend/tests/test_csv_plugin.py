@@ -6,6 +6,7 @@ import os
 import random
 import string
 import tempfile
+import time
 
 from hamcrest import (
     assert_that,
@@ -13,13 +14,17 @@ from hamcrest import (
     contains,
     empty,
     equal_to,
+    has_entries,
     has_properties,
+    is_not,
     none,
+    same_instance,
 )
+from mock import Mock
 
 from wazo_dird import make_result_class
 
-from ..plugin import CSVPlugin
+from ..plugin import CSVPlugin, _FileWatcher
 
 comma_separated_content = '''\
 clientno,firstname,lastname,number,age
@@ -124,8 +129,36 @@ class TestCsvDirectorySource(BaseCSVTestDirectory):
 
         self.source.load({'config': config})
 
+        csv_file = self.source._loaded.file
+        content = [CSVPlugin._row_to_dict(csv_file.keys, row) for row in csv_file.rows]
+        assert_that(content, contains_inanyorder(alice, self.bob, self.charles))
+
+    def test_load_file_memory_mapped(self):
+        config = {'file': self.fname, 'name': self.name, 'memory_mapped': True}
+
+        self.source.load({'config': config})
+
+        csv_file = self.source._loaded.file
+        content = [CSVPlugin._row_to_dict(csv_file.keys, row) for row in csv_file.rows]
+        assert_that(content, contains(alice, self.bob, self.charles))
+
+    def test_that_sources_share_the_content_of_a_file(self):
+        config = {
+            'file': self.fname,
+            'searched_columns': ['firstname'],
+            'unique_column': 'clientno',
+            'name': self.name,
+        }
+        other_config = dict(config, name='other', first_matched_columns=['number'])
+        other_source = CSVPlugin()
+
+        self.source.load({'config': config})
+        other_source.load({'config': other_config})
+
+        assert_that(other_source._loaded.file, same_instance(self.source._loaded.file))
         assert_that(
-            self.source._content, contains_inanyorder(alice, self.bob, self.charles)
+            other_source._loaded.index,
+            is_not(same_instance(self.source._loaded.index)),
         )
 
     def test_search(self):
@@ -282,46 +315,117 @@ class TestCsvDirectorySource(BaseCSVTestDirectory):
 
         assert_that(result, equal_to({'one': 1, 'two': 2, 'three': 3}))
 
-    def test_is_in_unique_ids(self):
-        config = {'file': self.fname, 'unique_column': 'clientno', 'name': 'my_dir'}
+    def test_search_short_term(self):
+        config = {
+            'file': self.fname,
+            'searched_columns': ['firstname', 'lastname'],
+            'name': self.name,
+            'unique_column': 'clientno',
+        }
 
         self.source.load({'config': config})
 
-        result = self.source._is_in_unique_ids(
-            ['12'], {'firstname': 'Alice', 'lastname': 'AAA', 'clientno': '12'}
-        )
+        results = self.source.search('e')
 
-        assert_that(result, equal_to(True))
+        assert_that(results, contains(self.alice_result, self.charles_result))
 
-        result = self.source._is_in_unique_ids(
-            ['12'], {'firstname': 'Bob', 'lastname': 'BBB', 'clientno': '55'}
-        )
+    def test_search_is_case_and_accent_insensitive(self):
+        config = {
+            'file': self.fname,
+            'searched_columns': ['firstname'],
+            'name': self.name,
+            'unique_column': 'clientno',
+        }
 
-        assert_that(result, equal_to(False))
+        self.source.load({'config': config})
 
-    def test_low_case_match_entry(self):
-        config = {'file': self.fname, 'unique_column': 'clientno', 'name': 'my_dir'}
+        results = self.source.search('CHÂRL')
 
-        term = 'ice'
-        columns = ['firstname', 'lastname']
+        assert_that(results, contains(self.charles_result))
+
+    def test_search_with_a_broken_searched_columns_config(self):
+        config = {
+            'file': self.fname,
+            'searched_columns': [None, 'firstname', 'lastname'],
+            'name': self.name,
+            'unique_column': 'clientno',
+        }
 
         self.source.load({'config': config})
 
-        result = self.source._low_case_match_entry(term, columns, alice)
+        results = self.source.search('ice')
 
-        assert_that(result, equal_to(True))
+        assert_that(results, contains(self.alice_result))
 
-    def test_low_case_match_entry_broken_config(self):
-        config = {'file': self.fname, 'unique_column': 'clientno', 'name': 'my_dir'}
+    def test_first_match_multiple_columns(self):
+        config = {
+            'file': self.fname,
+            'unique_column': 'clientno',
+            'first_matched_columns': ['age', 'clientno'],
+            'name': self.name,
+        }
+
+        self.source.load({'config': config})
 
-        term = 'ice'
-        columns = [None, 'firstname', 'lastname']
+        result = self.source.first_match('3')
+
+        assert_that(result, equal_to(self.charles_result))
+
+    def test_match_all(self):
+        config = {
+            'file': self.fname,
+            'unique_column': 'clientno',
+            'first_matched_columns': ['number'],
+            'name': self.name,
+        }
 
         self.source.load({'config': config})
 
-        result = self.source._low_case_match_entry(term, columns, alice)
+        results = self.source.match_all(['5555556666', '5555555555', '42'])
 
-        assert_that(result, equal_to(True))
+        assert_that(
+            results,
+            equal_to(
+                {'5555556666': self.charles_result, '5555555555': self.alice_result}
+            ),
+        )
+
+    def test_list_keeps_the_file_order(self):
+        config = {'file': self.fname, 'unique_column': 'clientno', 'name': self.name}
+
+        self.source.load({'config': config})
+
+        results = self.source.list(['3', '1', '42'])
+
+        assert_that(results, contains(self.alice_result, self.charles_result))
+
+    def test_search_memory_mapped(self):
+        config = {
+            'file': self.fname,
+            'searched_columns': ['firstname', 'lastname'],
+            'first_matched_columns': ['number'],
+            'name': self.name,
+            'unique_column': 'clientno',
+            'memory_mapped': True,
+        }
+
+        self.source.load({'config': config})
+
+        assert_that(self.source.search('ice'), contains(self.alice_result))
+        assert_that(
+            self.source.first_match('5555556666'), equal_to(self.charles_result)
+        )
+        assert_that(
+            self.source.list(['3', '1']),
+            contains(self.alice_result, self.charles_result),
+        )
+
+    def test_that_no_watcher_is_started_without_reload_interval(self):
+        config = {'file': self.fname, 'name': self.name}
+
+        self.source.load({'config': config})
+
+        assert_that(self.source._watcher, none())
 
     def _generate_random_non_existent_filename(self):
         while True:
@@ -330,3 +434,78 @@ class TestCsvDirectorySource(BaseCSVTestDirectory):
             if os.path.exists(fullname):
                 continue
             return fullname
+
+
+class TestCSVDirectorySourceReload(BaseCSVTestDirectory):
+
+    content = comma_separated_content
+
+    def setUp(self):
+        self.source = CSVPlugin()
+        config = {
+            'file': self.fname,
+            'unique_column': 'clientno',
+            'searched_columns': ['firstname'],
+            'name': 'my_directory',
+        }
+        self.source.load({'config': config})
+
+    def tearDown(self):
+        with open(self.fname, 'w') as f:
+            f.write(self.content)
+
+    def test_that_an_unmodified_file_is_not_reloaded(self):
+        loaded = self.source._loaded
+
+        self.source._reload_if_modified()
+
+        assert_that(self.source._loaded, same_instance(loaded))
+
+    def test_that_a_modified_file_is_reloaded(self):
+        with open(self.fname, 'a') as f:
+            f.write('4,Alicia,DDD,5555550000,23\n')
+
+        self.source._reload_if_modified()
+
+        results = self.source.search('alic')
+        assert_that(
+            results,
+            contains(
+                SourceResult(alice),
+                has_properties(fields=has_entries(clientno='4', firstname='Alicia')),
+            ),
+        )
+
+    def test_that_a_removed_file_keeps_the_loaded_content(self):
+        os.rename(self.fname, self.fname + '.bak')
+        try:
+            self.source._reload_if_modified()
+        finally:
+            os.rename(self.fname + '.bak', self.fname)
+
+        results = self.source.search('ice')
+        assert_that(results, contains(SourceResult(alice)))
+
+
+class TestFileWatcher(unittest.TestCase):
+    def test_that_the_watcher_stops_with_its_source(self):
+        source = CSVPlugin()
+        watcher = _FileWatcher(source, 'my_directory', 0.01)
+        watcher.start()
+
+        del source
+
+        watcher._thread.join(timeout=1)
+        assert_that(watcher._thread.is_alive(), equal_to(False))
+
+    def test_that_the_watcher_checks_its_source(self):
+        source = Mock(CSVPlugin)
+        watcher = _FileWatcher(source, 'my_directory', 0.01)
+        watcher.start()
+
+        try:
+            time.sleep(0.05)
+        finally:
+            watcher.stop()
+
+        source._reload_if_modified.assert_called_with()
@@ -3,12 +3,17 @@
 
 import csv
 import logging
-import requests
+import threading
+import time
+import weakref
+
+from itertools import islice
 
 from requests import RequestException
 from wazo_dird import BaseSourcePlugin
 from wazo_dird import make_result_class
 from wazo_dird.helpers import BaseBackendView
+from wazo_dird.plugin_helpers.pooled_session import PooledSession
 
 from . import http
 
@@ -21,12 +26,24 @@ class CSVWSView(BaseBackendView):
     list_resource = http.CSVWSList
     item_resource = http.CSVWSItem
 
+    def load(self, dependencies):
+        super().load(dependencies)
+        dependencies['status_aggregator'].add_provider(provide_status)
+
+
+def provide_status(status):
+    for source in list(_sources):
+        status['csv_ws_sources'][source.uuid] = dict(
+            name=source._name, **source.connection_stats()
+        )
+
 
 class CSVWSPlugin(BaseSourcePlugin):
     def load(self, config):
         logger.debug('Loading with %s', config)
 
         self._name = config['config']['name']
+        self.uuid = config['config'].get('uuid', self._name)
         self._list_url = config['config'].get('list_url')
         self._lookup_url = config['config']['lookup_url']
         self._first_matched_columns = config['config'].get(
@@ -44,58 +61,38 @@ class CSVWSPlugin(BaseSourcePlugin):
         self._timeout = config['config'].get('timeout', 10)
         self._delimiter = config['config'].get('delimiter', ',')
         self._verify_certificate = config['config'].get('verify_certificate', True)
+        self._max_results = config['config'].get('max_results')
         self._reader = _CSVReader(self._delimiter)
+        self._list_cache = _ListCache(config['config'].get('list_cache_ttl', 0))
+        self._session = PooledSession(
+            pool_size=config['config'].get('pool_size', 10),
+            max_retries=config['config'].get('max_retries', 0),
+            keep_alive=config['config'].get('keep_alive', True),
+        )
+        _sources.add(self)
+
+    def unload(self):
+        _sources.discard(self)
+        self._session.close()
+
+    def connection_stats(self):
+        return self._session.connection_stats()
 
     def search(self, term, args=None):
         logger.debug('Searching CSV WS `%s` with `%s`', self._name, term)
-        url = self._lookup_url
         params = {column: term for column in self._searched_columns}
 
-        try:
-            response = requests.get(
-                url,
-                params=params,
-                timeout=self._timeout,
-                verify=self._verify_certificate,
-            )
-        except RequestException as e:
-            logger.error('Error connecting to %s: %s', url, e)
-            return []
-
-        if response.status_code != 200:
-            logger.debug('GET %s %s', url, response.status_code)
-            return []
-
-        return [
-            self._SourceResult(result)
-            for result in self._reader.from_text(response.text)
-            if result
-        ]
+        rows = self._fetch(self._lookup_url, params=params)
+        return [self._SourceResult(row) for row in islice(rows, self._max_results)]
 
     def first_match(self, term, args=None):
         logger.debug('First matching CSV WS `%s` with `%s`', self._name, term)
-        url = self._lookup_url
         params = {column: term for column in self._first_matched_columns}
 
-        try:
-            response = requests.get(
-                url,
-                params=params,
-                timeout=self._timeout,
-                verify=self._verify_certificate,
-            )
-        except RequestException as e:
-            logger.error('Error connecting to %s: %s', url, e)
-            return None
-
-        if response.status_code != 200:
-            logger.debug('GET %s %s', url, response.status_code)
-            return None
-
-        for result in self._reader.from_text(response.text):
+        for row in self._fetch(self._lookup_url, params=params):
             for column in self._first_matched_columns:
-                if term == result.get(column):
-                    return self._SourceResult(result)
+                if term == row.get(column):
+                    return self._SourceResult(row)
         return None
 
     def list(self, source_entry_ids, args=None):
@@ -105,36 +102,122 @@ class CSVWSPlugin(BaseSourcePlugin):
         if not (self._unique_column and self._list_url):
             return []
 
+        index = self._list_index()
+        return [
+            self._SourceResult(index[entry_id])
+            for entry_id in dict.fromkeys(source_entry_ids)
+            if entry_id in index
+        ]
+
+    def _list_index(self):
+        cache = self._list_cache
+        with cache.lock:
+            if cache.is_fresh():
+                return cache.index
+
+            url = self._list_url
+            response = self._get(url, headers=cache.conditional_headers())
+            if response is None:
+                return cache.index
+
+            with response:
+                if response.status_code == 304:
+                    cache.revalidated()
+                elif response.status_code == 200:
+                    try:
+                        index = self._index_by_unique_column(self._rows(response))
+                    except RequestException as e:
+                        logger.error('Error reading the response of %s: %s', url, e)
+                    else:
+                        cache.update(index, response.headers)
+                else:
+                    logger.debug('GET %s %s', url, response.status_code)
+
+            return cache.index
+
+    def _index_by_unique_column(self, rows):
+        index = {}
+        for row in rows:
+            index.setdefault(row.get(self._unique_column), row)
+        return index
+
+    def _fetch(self, url, **kwargs):
+        response = self._get(url, **kwargs)
+        if response is None:
+            return
+
+        with response:
+            if response.status_code != 200:
+                logger.debug('GET %s %s', url, response.status_code)
+                return
+
+            try:
+                yield from self._rows(response)
+            except RequestException as e:
+                logger.error('Error reading the response of %s: %s', url, e)
+
+    def _get(self, url, **kwargs):
         try:
-            response = requests.get(
-                self._list_url, timeout=self._timeout, verify=self._verify_certificate
+            return self._session.get(
+                url,
+                timeout=self._timeout,
+                verify=self._verify_certificate,
+                stream=True,
+                **kwargs
             )
         except RequestException as e:
-            logger.error('Error connecting to %s: %s', self._list_url, e)
-            return []
+            logger.error('Error connecting to %s: %s', url, e)
 
-        if response.status_code != 200:
-            return []
+    def _rows(self, response):
+        if response.encoding is None:
+            response.encoding = 'utf-8'
+        lines = response.iter_lines(decode_unicode=True)
+        return self._reader.from_lines(lines)
 
-        return [
-            self._SourceResult(result)
-            for result in self._reader.from_text(response.text)
-            if result.get(self._unique_column) in source_entry_ids
-        ]
+
+class _ListCache:
+    def __init__(self, ttl):
+        self.lock = threading.Lock()
+        self.index = {}
+        self._ttl = ttl
+        self._expires_at = None
+        self._etag = None
+        self._last_modified = None
+
+    def is_fresh(self):
+        return self._expires_at is not None and time.monotonic() < self._expires_at
+
+    def conditional_headers(self):
+        headers = {}
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+        if self._last_modified:
+            headers['If-Modified-Since'] = self._last_modified
+        return headers
+
+    def revalidated(self):
+        self._expires_at = time.monotonic() + self._ttl
+
+    def update(self, index, headers):
+        self.index = index
+        self._etag = headers.get('ETag')
+        self._last_modified = headers.get('Last-Modified')
+        self.revalidated()
+
+
+_sources = weakref.WeakSet()
 
 
 class _CSVReader:
     def __init__(self, delimiter):
         self._delimiter = delimiter
 
-    def from_text(self, raw):
-        reader = unicode_csv_reader(raw, delimiter=self._delimiter)
-        headers = next(reader)
-        for result in reader:
-            yield dict(zip(headers, result))
-
+    def from_lines(self, lines):
+        reader = csv.reader(lines, delimiter=self._delimiter)
+        headers = next(reader, None)
+        if headers is None:
+            return
 
-def unicode_csv_reader(unicode_data, **kwargs):
-    csv_reader = csv.reader(unicode_data.split('\n'), **kwargs)
-    for row in csv_reader:
-        yield row
+        for row in reader:
+            if row:
+                yield dict(zip(headers, row))
@@ -14,6 +14,11 @@ class SourceSchema(BaseSourceSchema):
     delimiter = fields.String(Length(min=1, max=1), missing=',')
     timeout = fields.Float(Range(min=0), missing=10.0)
     unique_column = fields.String(Length(min=1, max=128), allownone=True, missing=None)
+    pool_size = fields.Integer(validate=Range(min=1), missing=10)
+    max_retries = fields.Integer(validate=Range(min=0), missing=0)
+    keep_alive = fields.Boolean(missing=True)
+    max_results = fields.Integer(validate=Range(min=1), allownone=True, missing=None)
+    list_cache_ttl = fields.Float(validate=Range(min=0), missing=0)
 
 
 class ListSchema(_ListSchema):
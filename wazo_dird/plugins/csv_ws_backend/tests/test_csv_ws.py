@@ -3,11 +3,23 @@
 
 import unittest
 
-from hamcrest import assert_that, is_, empty
-from mock import patch
+from collections import defaultdict
+
+from hamcrest import (
+    assert_that,
+    contains,
+    empty,
+    equal_to,
+    has_entries,
+    has_entry,
+    has_key,
+    is_,
+    not_,
+)
+from mock import MagicMock, patch
 from mock import sentinel as s
 
-from ..plugin import CSVWSPlugin
+from ..plugin import CSVWSPlugin, provide_status
 
 
 class TestCSVWSPlugin(unittest.TestCase):
@@ -16,8 +28,8 @@ class TestCSVWSPlugin(unittest.TestCase):
 
         self.assertRaises(Exception, source.load, {})
 
-    @patch('wazo_dird.plugins.csv_ws_backend.plugin.requests')
-    def test_that_search_queries_the_lookup_url(self, mocked_requests):
+    @patch('wazo_dird.plugins.csv_ws_backend.plugin.PooledSession')
+    def test_that_search_queries_the_lookup_url(self, Session):
         lookup_url = 'http://example.com:8000/ws'
         config = {
             'config': {
@@ -35,12 +47,16 @@ class TestCSVWSPlugin(unittest.TestCase):
 
         source.search(term)
 
-        mocked_requests.get.assert_called_once_with(
-            lookup_url, params=expected_params, timeout=s.timeout, verify=True
+        Session.return_value.get.assert_called_once_with(
+            lookup_url,
+            params=expected_params,
+            timeout=s.timeout,
+            verify=True,
+            stream=True,
         )
 
-    @patch('wazo_dird.plugins.csv_ws_backend.plugin.requests')
-    def test_that_first_match_queries_the_lookup_url(self, mocked_requests):
+    @patch('wazo_dird.plugins.csv_ws_backend.plugin.PooledSession')
+    def test_that_first_match_queries_the_lookup_url(self, Session):
         lookup_url = 'http://example.com:8000/ws'
         config = {
             'config': {
@@ -59,8 +75,12 @@ class TestCSVWSPlugin(unittest.TestCase):
 
         source.first_match(term)
 
-        mocked_requests.get.assert_called_once_with(
-            lookup_url, params=expected_params, timeout=s.timeout, verify=True
+        Session.return_value.get.assert_called_once_with(
+            lookup_url,
+            params=expected_params,
+            timeout=s.timeout,
+            verify=True,
+            stream=True,
         )
 
     def test_that_list_returns_an_empty_list_if_no_unique_column(self):
@@ -96,8 +116,8 @@ class TestCSVWSPlugin(unittest.TestCase):
 
         assert_that(result, is_(empty()))
 
-    @patch('wazo_dird.plugins.csv_ws_backend.plugin.requests')
-    def test_that_list_queries_the_list_url(self, mocked_requests):
+    @patch('wazo_dird.plugins.csv_ws_backend.plugin.PooledSession')
+    def test_that_list_queries_the_list_url(self, Session):
         config = {
             'config': {
                 'list_url': 'the_list_url',
@@ -113,6 +133,228 @@ class TestCSVWSPlugin(unittest.TestCase):
 
         source.list([1, 2, 3])
 
-        mocked_requests.get.assert_called_once_with(
-            'the_list_url', timeout=s.timeout, verify=True
+        Session.return_value.get.assert_called_once_with(
+            'the_list_url', timeout=s.timeout, verify=True, stream=True, headers={}
+        )
+
+    @patch('wazo_dird.plugins.csv_ws_backend.plugin.PooledSession')
+    def test_that_the_session_is_configured_from_the_source(self, Session):
+        config = {
+            'config': {
+                'lookup_url': 'the_lookup_url',
+                'name': 'my-ws-source',
+                'pool_size': 3,
+                'max_retries': 2,
+                'keep_alive': False,
+            }
+        }
+
+        source = CSVWSPlugin()
+        source.load(config)
+
+        Session.assert_called_once_with(pool_size=3, max_retries=2, keep_alive=False)
+
+    @patch('wazo_dird.plugins.csv_ws_backend.plugin.PooledSession')
+    def test_that_unload_closes_the_session(self, Session):
+        config = {'config': {'lookup_url': 'the_lookup_url', 'name': 'my-ws-source'}}
+
+        source = CSVWSPlugin()
+        source.load(config)
+        source.unload()
+
+        Session.return_value.close.assert_called_once_with()
+
+
+@patch('wazo_dird.plugins.csv_ws_backend.plugin.PooledSession')
+class TestCSVWSPluginResponses(unittest.TestCase):
+    def setUp(self):
+        self.config = {
+            'config': {
+                'lookup_url': 'the_lookup_url',
+                'list_url': 'the_list_url',
+                'unique_column': 'id',
+                'name': 'my-ws-source',
+                'searched_columns': ['firstname'],
+                'first_matched_columns': ['exten'],
+            }
+        }
+        self.lines = [
+            'id,firstname,exten',
+            '1,Alice,1001',
+            '',
+            '2,Bob,1002',
+            '3,Charlie,1003',
+        ]
+        self.read_lines = []
+
+    def test_search_returns_every_row(self, Session):
+        source = self._load_source(Session)
+
+        result = source.search('a')
+
+        assert_that(
+            [r.fields['firstname'] for r in result], contains('Alice', 'Bob', 'Charlie')
+        )
+
+    def test_search_stops_reading_at_max_results(self, Session):
+        self.config['config']['max_results'] = 1
+        source = self._load_source(Session)
+
+        result = source.search('a')
+
+        assert_that([r.fields['firstname'] for r in result], contains('Alice'))
+        assert_that(self.read_lines, contains(*self.lines[:2]))
+
+    def test_first_match_stops_reading_at_the_first_match(self, Session):
+        source = self._load_source(Session)
+
+        result = source.first_match('1002')
+
+        assert_that(result.fields, has_entries(firstname='Bob'))
+        assert_that(self.read_lines, contains(*self.lines[:4]))
+
+    def test_list_returns_the_requested_entries(self, Session):
+        source = self._load_source(Session)
+
+        result = source.list(['2', '1', '2', '42'])
+
+        assert_that([r.fields['id'] for r in result], contains('2', '1'))
+
+    def test_an_empty_response(self, Session):
+        self.lines = []
+        source = self._load_source(Session)
+
+        assert_that(source.search('a'), is_(empty()))
+
+    def test_an_error_status(self, Session):
+        source = self._load_source(Session)
+        Session.return_value.get.return_value.status_code = 404
+
+        assert_that(source.search('a'), is_(empty()))
+        assert_that(self.read_lines, is_(empty()))
+
+    def _load_source(self, Session):
+        response = MagicMock(status_code=200, encoding='utf-8')
+        response.iter_lines.side_effect = lambda **kwargs: self._iter_lines()
+        Session.return_value.get.return_value = response
+        source = CSVWSPlugin()
+        source.load(self.config)
+        return source
+
+    def _iter_lines(self):
+        for line in self.lines:
+            self.read_lines.append(line)
+            yield line
+
+
+@patch('wazo_dird.plugins.csv_ws_backend.plugin.PooledSession')
+class TestCSVWSPluginListCache(unittest.TestCase):
+    def setUp(self):
+        self.config = {
+            'config': {
+                'lookup_url': 'the_lookup_url',
+                'list_url': 'the_list_url',
+                'unique_column': 'id',
+                'name': 'my-ws-source',
+            }
+        }
+
+    def test_that_a_fresh_document_is_not_downloaded_again(self, Session):
+        self.config['config']['list_cache_ttl'] = 60
+        source = self._load_source(Session, self._response(['id,name', '1,Alice']))
+
+        source.list(['1'])
+        result = source.list(['1'])
+
+        assert_that(result[0].fields, has_entries(name='Alice'))
+        assert_that(Session.return_value.get.call_count, equal_to(1))
+
+    def test_that_an_expired_document_is_revalidated(self, Session):
+        headers = {'ETag': '"v1"', 'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+        source = self._load_source(
+            Session, self._response(['id,name', '1,Alice'], headers=headers)
         )
+        source.list(['1'])
+        Session.return_value.get.return_value = self._response([], status_code=304)
+
+        result = source.list(['1'])
+
+        assert_that(result[0].fields, has_entries(name='Alice'))
+        Session.return_value.get.assert_called_with(
+            'the_list_url',
+            timeout=10,
+            verify=True,
+            stream=True,
+            headers={
+                'If-None-Match': '"v1"',
+                'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT',
+            },
+        )
+
+    def test_that_a_modified_document_replaces_the_cache(self, Session):
+        source = self._load_source(Session, self._response(['id,name', '1,Alice']))
+        source.list(['1'])
+        Session.return_value.get.return_value = self._response(['id,name', '1,Bob'])
+
+        result = source.list(['1'])
+
+        assert_that(result[0].fields, has_entries(name='Bob'))
+
+    def test_that_the_cache_is_used_when_the_server_fails(self, Session):
+        source = self._load_source(Session, self._response(['id,name', '1,Alice']))
+        source.list(['1'])
+        Session.return_value.get.return_value = self._response([], status_code=500)
+
+        result = source.list(['1'])
+
+        assert_that(result[0].fields, has_entries(name='Alice'))
+
+    def _load_source(self, Session, response):
+        Session.return_value.get.return_value = response
+        source = CSVWSPlugin()
+        source.load(self.config)
+        return source
+
+    @staticmethod
+    def _response(lines, status_code=200, headers=None):
+        response = MagicMock(status_code=status_code, encoding='utf-8')
+        response.headers = headers or {}
+        response.iter_lines.return_value = iter(lines)
+        return response
+
+
+class TestProvideStatus(unittest.TestCase):
+    @patch('wazo_dird.plugins.csv_ws_backend.plugin.PooledSession')
+    def test_that_loaded_sources_report_their_connections(self, Session):
+        Session.return_value.connection_stats.return_value = {
+            'requests': 5,
+            'connections': 2,
+            'reused_connections': 3,
+        }
+        config = {
+            'config': {
+                'uuid': 'source-uuid',
+                'lookup_url': 'the_lookup_url',
+                'name': 'my-ws-source',
+            }
+        }
+        source = CSVWSPlugin()
+        source.load(config)
+        status = defaultdict(dict)
+
+        provide_status(status)
+
+        assert_that(
+            status['csv_ws_sources'],
+            has_entry(
+                'source-uuid',
+                has_entries(name='my-ws-source', requests=5, reused_connections=3),
+            ),
+        )
+
+        source.unload()
+        status = defaultdict(dict)
+
+        provide_status(status)
+
+        assert_that(status['csv_ws_sources'], not_(has_key('source-uuid')))
@@ -3,8 +3,15 @@
 
 import logging
 
+import requests
+
 from wazo_dird import BaseSourcePlugin, make_result_class
-from wazo_dird.helpers import BaseBackendView
+from wazo_dird.helpers import BaseBackendView, used_fields
+from wazo_dird.plugin_helpers.bus_event_registry import registry as bus_events
+from wazo_dird.plugin_helpers.user_contact_cache import (
+    EVENTS as CONTACT_CACHE_EVENTS,
+    UserContactCache,
+)
 
 from .exceptions import GoogleTokenNotFoundException
 from . import services
@@ -12,6 +19,9 @@ from .http import GoogleContactList, GoogleItem, GoogleList
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_SYNC_INTERVAL = 60.0
+ALWAYS_FORMATTED_FIELDS = ('id', 'name')
+
 
 class GoogleViewPlugin(BaseBackendView):
 
@@ -40,7 +50,6 @@ class GooglePlugin(BaseSourcePlugin):
         config = dependencies['config']
         self.auth = config['auth']
         self.name = config['name']
-        self.google = services.GoogleService()
         self.unique_column = 'id'
 
         format_columns = dependencies['config'].get(self.FORMAT_COLUMNS, {})
@@ -69,6 +78,27 @@ class GooglePlugin(BaseSourcePlugin):
                 self.name,
             )
 
+        # Only the fields used by this source are requested and formatted
+        fields = used_fields(
+            self._searched_columns, self._first_matched_columns, format_columns
+        )
+        fields.update(ALWAYS_FORMATTED_FIELDS)
+        self.google = services.GoogleService(fields)
+
+        self._contacts = UserContactCache(
+            self.google.sync_contacts,
+            self._first_match_values,
+            unique_column=self.unique_column,
+            provider='google',
+            sync_interval=config.get('sync_interval', DEFAULT_SYNC_INTERVAL),
+        )
+        for event_name in CONTACT_CACHE_EVENTS:
+            bus_events.subscribe(event_name, self._contacts.on_event)
+
+    def unload(self):
+        for event_name in CONTACT_CACHE_EVENTS:
+            bus_events.unsubscribe(event_name, self._contacts.on_event)
+
     def search(self, term, args=None):
         logger.debug('Searching term=%s', term)
         try:
@@ -90,10 +120,16 @@ class GooglePlugin(BaseSourcePlugin):
         except GoogleTokenNotFoundException:
             return []
 
-        contacts, _ = self.google.get_contacts(google_token)
-        filtered_contacts = [c for c in contacts if c[self.unique_column] in unique_ids]
+        user_contacts = self._get_user_contacts(args['user_uuid'], google_token)
+        if not user_contacts:
+            return []
 
-        return [self._SourceResult(contact) for contact in filtered_contacts]
+        contacts = user_contacts.contacts
+        return [
+            self._SourceResult(contacts[unique_id])
+            for unique_id in dict.fromkeys(unique_ids)
+            if unique_id in contacts
+        ]
 
     def first_match(self, term, args=None):
         if not self._first_matched_columns:
@@ -109,12 +145,14 @@ class GooglePlugin(BaseSourcePlugin):
             logger.debug('could not find a matching google token, aborting first_match')
             return None
 
-        contacts, _ = self.google.get_contacts(google_token)
-        lowered_term = term.lower()
+        user_contacts = self._get_user_contacts(args['user_uuid'], google_token)
+        if not user_contacts:
+            return None
 
-        for contact in contacts:
-            if self._first_match_predicate(lowered_term, contact):
-                return self._SourceResult(contact)
+        unique_id = user_contacts.first_matched.get(term.lower())
+        if unique_id is None:
+            return None
+        return self._SourceResult(user_contacts.contacts[unique_id])
 
     def match_all(self, terms, args=None):
         if not self._first_matched_columns:
@@ -130,32 +168,37 @@ class GooglePlugin(BaseSourcePlugin):
             logger.debug('could not find a matching google token, aborting match_all')
             return {}
 
-        contacts, _ = self.google.get_contacts(google_token)
+        user_contacts = self._get_user_contacts(args['user_uuid'], google_token)
+        if not user_contacts:
+            return {}
+
         results = {}
         for term in terms:
-            lowered_term = term.lower()
-            for contact in contacts:
-                if self._first_match_predicate(lowered_term, contact):
-                    results[term] = self._SourceResult(contact)
+            unique_id = user_contacts.first_matched.get(term.lower())
+            if unique_id is not None:
+                results[term] = self._SourceResult(user_contacts.contacts[unique_id])
         return results
 
-    def _first_match_predicate(self, term, contact):
+    def _get_user_contacts(self, user_uuid, google_token):
+        try:
+            return self._contacts.get(user_uuid, google_token)
+        except requests.RequestException as e:
+            logger.info('%s: failed to sync the google contacts: %s', self.name, e)
+            return None
+
+    def _first_match_values(self, contact):
+        values = []
         for column in self._first_matched_columns:
             column_value = contact.get(column) or ''
             if isinstance(column_value, (dict, list)):
                 for value in column_value:
                     if isinstance(value, dict):
-                        for sub_value in value.values():
-                            if term == sub_value.lower():
-                                return True
+                        values.extend(sub_value.lower() for sub_value in value.values())
                     else:
-                        if term == value.lower():
-                            return True
+                        values.append(value.lower())
             else:
-                if term == str(column_value).lower():
-                    return True
-
-        return False
+                values.append(str(column_value).lower())
+        return values
 
     def _get_google_token(self, user_uuid, token=None, **ignored):
         if not token:
@@ -6,6 +6,7 @@ from marshmallow import EXCLUDE
 from xivo.mallow_helpers import ListSchema as _ListSchema
 from wazo_dird.schemas import BaseSourceSchema, BaseAuthConfigSchema
 from xivo.mallow import fields
+from xivo.mallow.validate import Range
 
 
 class SourceSchema(BaseSourceSchema):
@@ -15,6 +16,7 @@ class SourceSchema(BaseSourceSchema):
         missing=lambda: BaseAuthConfigSchema().load({}),
         unknown=EXCLUDE,
     )
+    sync_interval = fields.Float(validate=Range(min=0), missing=60.0)
 
 
 class ListSchema(_ListSchema):
@@ -6,11 +6,11 @@ import logging
 import requests
 
 from wazo_auth_client import Client as Auth
+from wazo_dird.plugin_helpers.external_token_cache import token_cache
 from wazo_dird.plugin_helpers.self_sorting_service import SelfSortingServiceMixin
 
 from .exceptions import GoogleTokenNotFoundException
 
-
 logger = logging.getLogger(__name__)
 
 
@@ -20,8 +20,14 @@ class GoogleService(SelfSortingServiceMixin):
     contacts_url = 'https://google.com/m8/feeds/contacts/default/full'
     groups_url = 'https://google.com/m8/feeds/groups/default/full'
 
-    def __init__(self):
-        self.formatter = ContactFormatter()
+    def __init__(self, fields=None):
+        self.formatter = ContactFormatter(fields)
+        if fields is None:
+            self._feed_fields = None
+        else:
+            # gd:deleted, link and updated are used by sync_contacts
+            elements = ','.join(self.formatter.elements + ['gd:deleted'])
+            self._feed_fields = 'updated,link,entry({})'.format(elements)
 
     def get_contacts_with_term(self, google_token, term):
         for contact in self._fetch(google_token, term=term):
@@ -34,10 +40,70 @@ class GoogleService(SelfSortingServiceMixin):
         paginated_contacts = self._paginate(sorted_contacts, **list_params)
         return paginated_contacts, total
 
+    def sync_contacts(self, google_token, sync_state=None):
+        """Return the contacts modified since `sync_state`, the deleted ids and the next state
+
+        Returns None when the contacts could not be fetched. The pages of the feed
+        are followed, the next state is only returned once the last page is read.
+        """
+        headers = self.headers(google_token)
+        if sync_state:
+            group_id, updated_min = sync_state
+        else:
+            group_id = self._get_my_contacts_group_id(headers, verify=True)
+            updated_min = None
+
+        query_params = self._query_params()
+        if group_id:
+            query_params['group'] = group_id
+        if updated_min:
+            query_params['updated-min'] = updated_min
+            query_params['showdeleted'] = 'true'
+
+        modified, deleted = [], []
+        updated = None
+        page_url = self.contacts_url
+        while page_url:
+            try:
+                response = requests.get(page_url, headers=headers, params=query_params)
+            except requests.RequestException as e:
+                logger.info('Failed to sync contacts from google: %s', e)
+                return None
+            if response.status_code != 200:
+                return None
+
+            feed = response.json().get('feed', {})
+            # The time of the first page is the earliest, no modification made while the
+            # next pages are read is missed by the next sync
+            updated = updated or feed.get('updated', {}).get('$t')
+            for contact in feed.get('entry', []):
+                formatted_contact = self.formatter.format(contact)
+                if 'gd$deleted' in contact:
+                    deleted.append(formatted_contact['id'])
+                else:
+                    modified.append(formatted_contact)
+
+            # The next link already contains the query parameters
+            page_url, query_params = self._next_page_url(feed), None
+
+        logger.debug(
+            'Synced contacts from google: %s modified, %s deleted',
+            len(modified),
+            len(deleted),
+        )
+        return modified, deleted, (group_id, updated or updated_min)
+
+    @staticmethod
+    def _next_page_url(feed):
+        for link in feed.get('link', []):
+            if link.get('rel') == 'next':
+                return link.get('href')
+        return None
+
     def _fetch(self, google_token, term=None):
         headers = self.headers(google_token)
         group_id = self._get_my_contacts_group_id(headers)
-        query_params = {'alt': 'json', 'max-results': 1000}
+        query_params = self._query_params()
         if term:
             query_params['q'] = term
         if group_id:
@@ -55,10 +121,16 @@ class GoogleService(SelfSortingServiceMixin):
         for contact in response.json().get('feed', {}).get('entry', []):
             yield self.formatter.format(contact)
 
-    def _get_my_contacts_group_id(self, headers):
+    def _query_params(self):
+        query_params = {'alt': 'json', 'max-results': 1000}
+        if self._feed_fields:
+            query_params['fields'] = self._feed_fields
+        return query_params
+
+    def _get_my_contacts_group_id(self, headers, verify=False):
         query_params = {'alt': 'json'}
         response = requests.get(
-            self.groups_url, headers=headers, params=query_params, verify=False
+            self.groups_url, headers=headers, params=query_params, verify=verify
         )
         if response.status_code != 200:
             return
@@ -94,9 +166,12 @@ class GoogleService(SelfSortingServiceMixin):
 
 
 def get_google_access_token(user_uuid, wazo_token, **auth_config):
-    try:
+    def fetch():
         auth = Auth(token=wazo_token, **auth_config)
-        return auth.external.get('google', user_uuid).get('access_token')
+        return auth.external.get('google', user_uuid)
+
+    try:
+        return token_cache.get('google', user_uuid, fetch).get('access_token')
     except requests.HTTPError as e:
         logger.error('Google token could not be fetched from wazo-auth, error: %s', e)
         raise GoogleTokenNotFoundException(user_uuid)
@@ -114,21 +189,39 @@ def get_google_access_token(user_uuid, wazo_token, **auth_config):
 class ContactFormatter:
 
     chars_to_remove = [' ', '-', '(', ')']
+    # The formatted fields, their extractor and the feed elements they are extracted from
+    formatted_fields = {
+        'id': ('_extract_id', ['id']),
+        'name': ('_extract_name', ['gd:name', 'title']),
+        'firstname': ('_extract_first_name', ['gd:name']),
+        'lastname': ('_extract_last_name', ['gd:name']),
+        'numbers_by_label': ('_extract_numbers_by_label', ['gd:phoneNumber']),
+        'numbers': ('_extract_numbers', ['gd:phoneNumber']),
+        'numbers_except_label': ('_extract_numbers_except_label', ['gd:phoneNumber']),
+        'emails': ('_extract_emails', ['gd:email']),
+        'organizations': ('_extract_organizations', ['gd:organization']),
+        'addresses': ('_extract_addresses', ['gd:structuredPostalAddress']),
+        'note': ('_extract_note', ['content']),
+    }
+
+    def __init__(self, fields=None):
+        if fields is None:
+            fields = self.formatted_fields.keys()
+        self._extractors = {
+            field: getattr(self, extractor)
+            for field, (extractor, _) in self.formatted_fields.items()
+            if field in fields
+        }
+        self.elements = sorted(
+            {
+                element
+                for field in self._extractors
+                for element in self.formatted_fields[field][1]
+            }
+        )
 
     def format(self, contact):
-        return {
-            'id': self._extract_id(contact),
-            'name': self._extract_name(contact),
-            'firstname': self._extract_first_name(contact),
-            'lastname': self._extract_last_name(contact),
-            'numbers_by_label': self._extract_numbers_by_label(contact),
-            'numbers': self._extract_numbers(contact),
-            'numbers_except_label': self._extract_numbers_except_label(contact),
-            'emails': self._extract_emails(contact),
-            'organizations': self._extract_organizations(contact),
-            'addresses': self._extract_addresses(contact),
-            'note': self._extract_note(contact),
-        }
+        return {field: extract(contact) for field, extract in self._extractors.items()}
 
     @classmethod
     def _extract_emails(cls, contact):
@@ -3,8 +3,18 @@
 
 from unittest import TestCase
 
-from hamcrest import assert_that, calling, equal_to, not_, raises
-
+from hamcrest import (
+    assert_that,
+    calling,
+    contains,
+    equal_to,
+    has_entries,
+    not_,
+    raises,
+)
+from mock import Mock, patch
+
+from .. import services
 from ..plugin import GooglePlugin
 
 
@@ -34,26 +44,20 @@ class TestGooglePlugin(TestCase):
             not_(raises(Exception)),
         )
 
-    def test_first_match_predicate(self):
+    def test_that_reverse_lookups_use_the_synced_contacts(self):
         self.source.load(self.DEPENDENCIES)
-
-        term = '5555551234'
-
-        mario = {'name': 'Mario Bros', 'numbers': {}}
-        luigi = {
-            'name': 'Luigi Bros',
-            'numbers_by_label': {'mobile': '5555551234'},
-            'numbers': ['5555551234'],
-        }
-        peach = {
-            'name': 'Peach',
-            'numbers_by_label': {'mobile': '5555551234', 'business': '4185553212'},
-            'numbers': ['5555551234', '4185553212'],
-        }
-
-        assert_that(self.source._first_match_predicate(term, mario), equal_to(False))
-        assert_that(self.source._first_match_predicate(term, luigi), equal_to(True))
-        assert_that(self.source._first_match_predicate(term, peach), equal_to(True))
-        assert_that(
-            self.source._first_match_predicate(term[:-1], peach), equal_to(False)
-        )
+        luigi = {'id': '1', 'name': 'Luigi Bros', 'numbers': ['5555551234']}
+        self.source.google = Mock()
+        self.source.google.sync_contacts.return_value = ([luigi], [], 'state')
+        self.source._contacts._sync = self.source.google.sync_contacts
+        args = {'user_uuid': 'user-uuid', 'token': 'token'}
+
+        with patch.object(services, 'get_google_access_token', return_value='g-token'):
+            first = self.source.first_match('5555551234', args=args)
+            all_ = self.source.match_all(['5555551234', '1'], args=args)
+            listed = self.source.list(['1', '2'], args=args)
+
+        assert_that(first.fields, has_entries(name='Luigi Bros'))
+        assert_that(all_, has_entries({'5555551234': equal_to(first)}))
+        assert_that(listed, contains(equal_to(first)))
+        self.source.google.sync_contacts.assert_called_once_with('g-token', None)
@@ -3,7 +3,17 @@
 
 import unittest
 
-from hamcrest import assert_that, contains, contains_inanyorder, has_entries, has_items
+from hamcrest import (
+    assert_that,
+    contains,
+    contains_inanyorder,
+    equal_to,
+    has_entries,
+    has_items,
+    has_key,
+    not_,
+)
+from mock import Mock, patch
 
 from .. import services
 
@@ -173,3 +183,134 @@ class TestGoogleContactFormatter(unittest.TestCase):
             formatted_contact,
             has_entries(note='Notey'),
         )
+
+
+class TestGoogleServiceSync(unittest.TestCase):
+    def setUp(self):
+        self.service = services.GoogleService()
+
+    def test_that_deleted_contacts_are_returned_separately(self):
+        feed = {
+            'feed': {
+                'updated': {'$t': '2021-01-02T00:00:00.000Z'},
+                'entry': [
+                    {'id': {'$t': 'http://google.com/base/1'}, 'title': {'$t': 'A'}},
+                    {'id': {'$t': 'http://google.com/base/2'}, 'gd$deleted': {}},
+                ],
+            }
+        }
+        response = Mock(status_code=200, json=Mock(return_value=feed))
+
+        with patch.object(services.requests, 'get', return_value=response) as get:
+            result = self.service.sync_contacts(
+                'token', ('group', '2021-01-01T00:00:00.000Z')
+            )
+
+        modified, deleted, sync_state = result
+        assert_that(modified, contains(has_entries(id='1', name='A')))
+        assert_that(deleted, contains('2'))
+        assert_that(sync_state, equal_to(('group', '2021-01-02T00:00:00.000Z')))
+        assert_that(
+            get.call_args[1]['params'],
+            has_entries(
+                {
+                    'group': 'group',
+                    'updated-min': '2021-01-01T00:00:00.000Z',
+                    'showdeleted': 'true',
+                }
+            ),
+        )
+
+    def test_that_the_pages_are_followed_before_the_state_moves(self):
+        next_url = services.GoogleService.contacts_url + '?start-index=2'
+        pages = [
+            {
+                'feed': {
+                    'updated': {'$t': '2021-01-02T00:00:00.000Z'},
+                    'link': [{'rel': 'next', 'href': next_url}],
+                    'entry': [{'id': {'$t': 'http://google.com/base/1'}}],
+                }
+            },
+            {
+                'feed': {
+                    'updated': {'$t': '2021-01-02T00:00:01.000Z'},
+                    'entry': [{'id': {'$t': 'http://google.com/base/2'}}],
+                }
+            },
+        ]
+        responses = [Mock(status_code=200, json=Mock(return_value=p)) for p in pages]
+
+        with patch.object(services.requests, 'get', side_effect=responses) as get:
+            result = self.service.sync_contacts('token', ('group', 'updated'))
+
+        modified, _, sync_state = result
+        assert_that(modified, contains(has_entries(id='1'), has_entries(id='2')))
+        assert_that(sync_state, equal_to(('group', '2021-01-02T00:00:00.000Z')))
+        first_call, second_call = get.call_args_list
+        assert_that(second_call[0], contains(next_url))
+        assert_that(second_call[1]['params'], equal_to(None))
+        assert_that(first_call[1], not_(has_key('verify')))
+
+    def test_that_the_state_does_not_move_when_a_page_fails(self):
+        next_url = services.GoogleService.contacts_url + '?start-index=2'
+        feed = {
+            'feed': {
+                'updated': {'$t': '2021-01-02T00:00:00.000Z'},
+                'link': [{'rel': 'next', 'href': next_url}],
+            }
+        }
+        responses = [
+            Mock(status_code=200, json=Mock(return_value=feed)),
+            Mock(status_code=503),
+        ]
+
+        with patch.object(services.requests, 'get', side_effect=responses):
+            result = self.service.sync_contacts('token', ('group', 'updated'))
+
+        assert_that(result, equal_to(None))
+
+    def test_that_nothing_is_returned_on_error(self):
+        response = Mock(status_code=401)
+
+        with patch.object(services.requests, 'get', return_value=response):
+            result = self.service.sync_contacts('token', ('group', 'updated'))
+
+        assert_that(result, equal_to(None))
+
+
+class TestGoogleServiceProjection(unittest.TestCase):
+    def test_that_only_the_requested_fields_are_formatted(self):
+        formatter = services.ContactFormatter(['id', 'numbers'])
+        google_contact = {
+            'id': {'$t': 'http://www.google.com/m8/feeds/contacts/me/base/42'},
+            'title': {'$t': 'Joe Blow'},
+            'gd$phoneNumber': [
+                {'rel': 'http://schemas.google.com/g/2005#work', '$t': '1234'}
+            ],
+        }
+
+        formatted_contact = formatter.format(google_contact)
+
+        assert_that(formatted_contact, equal_to({'id': '42', 'numbers': ['1234']}))
+        assert_that(formatter.elements, contains('gd:phoneNumber', 'id'))
+
+    def test_that_only_the_requested_fields_are_fetched(self):
+        service = services.GoogleService(['id', 'name'])
+        response = Mock(status_code=200, json=Mock(return_value={'feed': {}}))
+
+        with patch.object(services.requests, 'get', return_value=response) as get:
+            service.sync_contacts('token', ('group', 'updated'))
+
+        assert_that(
+            get.call_args[1]['params'],
+            has_entries(fields='updated,link,entry(gd:name,id,title,gd:deleted)'),
+        )
+
+    def test_that_all_fields_are_fetched_by_default(self):
+        service = services.GoogleService()
+        response = Mock(status_code=200, json=Mock(return_value={'feed': {}}))
+
+        with patch.object(services.requests, 'get', return_value=response) as get:
+            service.sync_contacts('token', ('group', 'updated'))
+
+        assert_that(get.call_args[1]['params'], not_(has_key('fields')))
@@ -5,9 +5,15 @@ import itertools
 import ldap
 import logging
 import re
+import select
 import threading
+import time
 import uuid
+import weakref
 
+from collections import namedtuple
+from contextlib import contextmanager
+from ldap.controls import SimplePagedResultsControl
 from ldap.filter import escape_filter_chars
 from wazo_dird import BaseSourcePlugin
 from wazo_dird import make_result_class
@@ -29,30 +35,52 @@ class LDAPPlugin(BaseSourcePlugin):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.ldap_factory = _LDAPFactory()
-        self._lock = threading.Lock()
 
     def load(self, args):
         self._ldap_config = self.ldap_factory.new_ldap_config(args['config'])
         self._ldap_result_formatter = self.ldap_factory.new_ldap_result_formatter(
             self._ldap_config
         )
-        self._ldap_client = self.ldap_factory.new_ldap_client(self._ldap_config)
+        self._ldap_client = self.ldap_factory.new_ldap_client_pool(self._ldap_config)
         self._ldap_client.set_up()
+        self._replica = None
+        if self._ldap_config.ldap_replica():
+            self._replica = self.ldap_factory.new_ldap_replica(
+                self._ldap_config, self._ldap_client, self._ldap_result_formatter
+            )
+            self._replica.start()
 
     def unload(self):
+        if self._replica:
+            self._replica.stop()
         self._ldap_client.close()
 
     def search(self, term, args=None):
+        max_results = self._ldap_config.max_results()
+        if self._replica_is_ready():
+            return self._replica.search(term, max_results)
+
         filter_str = self._ldap_config.build_search_filter(term)
 
-        return self._search_and_format(filter_str)
+        results = []
+        for page in self._ldap_client.search_pages(filter_str, max_results or -1):
+            results.extend(self._ldap_result_formatter.format(page))
+            if max_results and len(results) >= max_results:
+                return results[:max_results]
+        return results
 
     def first_match(self, term, args=None):
+        if self._replica_is_ready():
+            return self._replica.first_match(term)
+
         filter_str = self._ldap_config.build_first_match_filter(term)
 
         return self._first_match_and_format(filter_str)
 
     def match_all(self, extens, args=None):
+        if self._replica_is_ready():
+            return self._replica.match_all(extens)
+
         results = {}
         columns = self._ldap_config.first_matched_columns()
         logger.debug('Looking for columns (%s) with (%s)', columns, extens)
@@ -74,20 +102,24 @@ class LDAPPlugin(BaseSourcePlugin):
             return []
         if not uids:
             return []
+        if self._replica_is_ready():
+            return self._replica.list(uids)
 
         filter_str = self._ldap_config.build_list_filter(uids)
 
         return self._search_and_format(filter_str)
 
+    def _replica_is_ready(self):
+        # Until its first copy of the directory, the replica is not used
+        return self._replica is not None and self._replica.is_ready()
+
     def _search_and_format(self, filter_str):
-        with self._lock:
-            raw_results = self._ldap_client.search(filter_str)
+        raw_results = self._ldap_client.search(filter_str)
 
         return self._ldap_result_formatter.format(raw_results)
 
     def _first_match_and_format(self, filter_str):
-        with self._lock:
-            raw_results = self._ldap_client.search(filter_str, 1)
+        raw_results = self._ldap_client.search(filter_str, 1)
 
         if not raw_results:
             return None
@@ -98,8 +130,7 @@ class LDAPPlugin(BaseSourcePlugin):
         return self._ldap_result_formatter.format_one_result(attrs)
 
     def _match_all_and_format(self, filter_str):
-        with self._lock:
-            raw_results = self._ldap_client.search(filter_str)
+        raw_results = self._ldap_client.search(filter_str)
 
         results = []
         for dn, attrs in raw_results:
@@ -117,6 +148,12 @@ class _LDAPFactory:
     def new_ldap_client(self, ldap_config):
         return _LDAPClient(ldap_config)
 
+    def new_ldap_client_pool(self, ldap_config):
+        return _LDAPClientPool(ldap_config, self.new_ldap_client)
+
+    def new_ldap_replica(self, ldap_config, ldap_client, ldap_result_formatter):
+        return _LDAPReplica(ldap_config, ldap_client, ldap_result_formatter)
+
     def new_ldap_result_formatter(self, ldap_config):
         return _LDAPResultFormatter(ldap_config)
 
@@ -127,6 +164,13 @@ class _LDAPConfig:
     DEFAULT_LDAP_PASSWORD = ''
     DEFAULT_LDAP_NETWORK_TIMEOUT = 0.3
     DEFAULT_LDAP_TIMEOUT = 1.0
+    DEFAULT_LDAP_POOL_SIZE = 5
+    DEFAULT_LDAP_POOL_IDLE_TIMEOUT = 60.0
+    DEFAULT_LDAP_SEARCHES_PER_CONNECTION = 1
+    DEFAULT_LDAP_PAGE_SIZE = 0
+    DEFAULT_MAX_RESULTS = None
+    DEFAULT_LDAP_REPLICA_REFRESH_INTERVAL = 60.0
+    DEFAULT_LDAP_REPLICA_FULL_REFRESH_INTERVAL = 3600.0
 
     def __init__(self, config):
         if not config.get('ldap_custom_filter') and not config.get(
@@ -177,6 +221,48 @@ class _LDAPConfig:
     def ldap_timeout(self):
         return self._config.get('ldap_timeout', self.DEFAULT_LDAP_TIMEOUT)
 
+    def ldap_pool_size(self):
+        return self._config.get('ldap_pool_size', self.DEFAULT_LDAP_POOL_SIZE)
+
+    def ldap_pool_idle_timeout(self):
+        return self._config.get(
+            'ldap_pool_idle_timeout', self.DEFAULT_LDAP_POOL_IDLE_TIMEOUT
+        )
+
+    def ldap_page_size(self):
+        return self._config.get('ldap_page_size', self.DEFAULT_LDAP_PAGE_SIZE)
+
+    def max_results(self):
+        return self._config.get('max_results', self.DEFAULT_MAX_RESULTS)
+
+    def ldap_replica(self):
+        if not self._config.get('ldap_replica', False):
+            return False
+
+        if self._config.get('ldap_custom_filter'):
+            logger.warning(
+                'LDAP "%s": ldap_replica is ignored with an ldap_custom_filter',
+                self.name(),
+            )
+            return False
+        return True
+
+    def ldap_replica_refresh_interval(self):
+        return self._config.get(
+            'ldap_replica_refresh_interval', self.DEFAULT_LDAP_REPLICA_REFRESH_INTERVAL
+        )
+
+    def ldap_replica_full_refresh_interval(self):
+        return self._config.get(
+            'ldap_replica_full_refresh_interval',
+            self.DEFAULT_LDAP_REPLICA_FULL_REFRESH_INTERVAL,
+        )
+
+    def ldap_searches_per_connection(self):
+        return self._config.get(
+            'ldap_searches_per_connection', self.DEFAULT_LDAP_SEARCHES_PER_CONNECTION
+        )
+
     def attributes(self):
         format_columns = self._config.get(BaseSourcePlugin.FORMAT_COLUMNS)
         if not format_columns:
@@ -291,29 +377,70 @@ class _LDAPConfig:
         )
 
 
+class _ConnectionLost(Exception):
+    pass
+
+
 class _LDAPClient:
-    def __init__(self, ldap_config, ldap_obj_factory=ldap.initialize):
+
+    # Time to wait for a response before polling it again, when the connection is shared
+    POLL_INTERVAL = 0.01
+    # Fetches are always paged, the size limit of the server would truncate them otherwise
+    FETCH_PAGE_SIZE = 500
+
+    def __init__(
+        self, ldap_config, ldap_obj_factory=ldap.initialize, clock=time.monotonic
+    ):
         self._ldap_config = ldap_config
         self._ldap_obj_factory = ldap_obj_factory
+        self._clock = clock
         self._ldap_obj = None
+        self._lock = threading.Lock()
         self._name = self._ldap_config.name()
         self._base_dn = self._ldap_config.ldap_base_dn()
         self._attributes = self._ldap_config.attributes()
+        self._timeout = self._ldap_config.ldap_timeout()
+        self._shared = self._ldap_config.ldap_searches_per_connection() > 1
+        self._page_size = self._ldap_config.ldap_page_size()
 
     def close(self):
-        if self._is_set_up():
-            self._tear_down()
+        with self._lock:
+            if self._is_set_up():
+                self._tear_down()
 
     def set_up(self):
         # This is an optional method. The main interest is that it will raise an exception
         # if the ldap_obj can't be initialized properly. This can be useful if you want to
         # fail early.
-        if not self._is_set_up():
-            self._set_up()
+        self._connect()
+
+    def is_alive(self):
+        ldap_obj = self._ldap_obj
+        if ldap_obj is None:
+            return False
+
+        try:
+            ldap_obj.whoami_s()
+        except ldap.LDAPError as e:
+            logger.info('LDAP "%s": connection lost: %r', self._name, e)
+            self._disconnect(ldap_obj)
+            return False
+        return True
 
     def _is_set_up(self):
         return self._ldap_obj is not None
 
+    def _connect(self):
+        with self._lock:
+            if not self._is_set_up():
+                self._set_up()
+            return self._ldap_obj
+
+    def _disconnect(self, ldap_obj):
+        with self._lock:
+            if self._ldap_obj is ldap_obj:
+                self._tear_down()
+
     def _set_up(self):
         self._ldap_obj = self._new_ldap_obj()
         self._bind()
@@ -324,7 +451,7 @@ class _LDAPClient:
         ldap_obj.set_option(
             ldap.OPT_NETWORK_TIMEOUT, self._ldap_config.ldap_network_timeout()
         )
-        ldap_obj.set_option(ldap.OPT_TIMEOUT, self._ldap_config.ldap_timeout())
+        ldap_obj.set_option(ldap.OPT_TIMEOUT, self._timeout)
         return ldap_obj
 
     def _bind(self):
@@ -337,37 +464,55 @@ class _LDAPClient:
             self._tear_down()
 
     def _tear_down(self):
-        self._ldap_obj.unbind_s()
-        self._ldap_obj = None
+        ldap_obj, self._ldap_obj = self._ldap_obj, None
+        try:
+            ldap_obj.unbind_s()
+        except ldap.LDAPError as e:
+            logger.debug('LDAP "%s": unbind error: %r', self._name, e)
 
     def search(self, filter_str, limit=-1):
-        if self._is_set_up():
+        results = []
+        for page in self.search_pages(filter_str, limit):
+            results.extend(page)
+        return results
+
+    def search_pages(self, filter_str, limit=-1):
+        ldap_obj = self._ldap_obj
+        if ldap_obj is not None:
             retry = True
         else:
-            self._set_up()
-            if not self._is_set_up():
-                return []
+            ldap_obj = self._connect()
+            if ldap_obj is None:
+                return
             retry = False
 
-        results = self._search(filter_str, limit)
-        if not self._is_set_up() and retry:
-            self._set_up()
-            if not self._is_set_up():
-                return []
-            results = self._search(filter_str, limit)
-
-        return results
-
-    def _search(self, filter_str, limit):
-        results = []
+        has_results = False
+        try:
+            for page in self._search(ldap_obj, filter_str, limit):
+                has_results = True
+                yield page
+            return
+        except _ConnectionLost:
+            if has_results or not retry:
+                return
+
+        ldap_obj = self._connect()
+        if ldap_obj is None:
+            return
+        try:
+            yield from self._search(ldap_obj, filter_str, limit)
+        except _ConnectionLost:
+            pass
 
+    def _search(self, ldap_obj, filter_str, limit):
         try:
-            results = self._ldap_obj.search_ext_s(
-                self._base_dn,
-                ldap.SCOPE_SUBTREE,
+            yield from self._search_pages(
+                ldap_obj,
                 filter_str,
+                limit,
                 self._attributes,
-                sizelimit=limit,
+                self._timeout,
+                self._page_size,
             )
         except ldap.FILTER_ERROR:
             logger.warning(
@@ -383,10 +528,487 @@ class _LDAPClient:
             logger.warning('LDAP "%s": search error: timed out', self._name)
         except ldap.LDAPError as e:
             logger.error('LDAP "%s": search error: %r', self._name, e)
-            self._tear_down()
+            self._disconnect(ldap_obj)
+            raise _ConnectionLost()
+
+    def fetch_pages(self, filter_str, attributes, timeout):
+        # Unlike search_pages, errors are raised to the caller and results truncated by
+        # the size limit of the server raise SIZELIMIT_EXCEEDED
+        ldap_obj = self._connect()
+        if ldap_obj is None:
+            raise _ConnectionLost()
+
+        try:
+            yield from self._search_pages(
+                ldap_obj,
+                filter_str,
+                -1,
+                attributes,
+                timeout,
+                self._page_size or self.FETCH_PAGE_SIZE,
+                partial=False,
+            )
+        except ldap.SIZELIMIT_EXCEEDED:
+            raise
+        except ldap.LDAPError:
+            self._disconnect(ldap_obj)
+            raise
+
+    def _search_pages(
+        self, ldap_obj, filter_str, limit, attributes, timeout, page_size, partial=True
+    ):
+        page_control = None
+        if page_size:
+            page_control = SimplePagedResultsControl(
+                criticality=False, size=page_size, cookie=''
+            )
 
+        remaining = limit
+        while True:
+            if page_control:
+                if remaining > 0:
+                    page_control.size = min(page_size, remaining)
+                msgid = ldap_obj.search_ext(
+                    self._base_dn,
+                    ldap.SCOPE_SUBTREE,
+                    filter_str,
+                    attributes,
+                    serverctrls=[page_control],
+                    sizelimit=remaining,
+                )
+            else:
+                msgid = ldap_obj.search_ext(
+                    self._base_dn,
+                    ldap.SCOPE_SUBTREE,
+                    filter_str,
+                    attributes,
+                    sizelimit=remaining,
+                )
+            entries, controls = self._wait_results(ldap_obj, msgid, timeout, partial)
+            cookie = self._next_page_cookie(controls) if page_control else None
+            if remaining > 0:
+                remaining -= len(entries)
+
+            try:
+                if entries:
+                    yield entries
+            except GeneratorExit:
+                self._release_paged_search(ldap_obj, filter_str, attributes, cookie)
+                raise
+
+            if not cookie:
+                return
+            if limit > 0 and remaining <= 0:
+                self._release_paged_search(ldap_obj, filter_str, attributes, cookie)
+                return
+            page_control.cookie = cookie
+
+    def _release_paged_search(self, ldap_obj, filter_str, attributes, cookie):
+        # A paged search that is not read until the end is released with a page size of 0
+        if not cookie:
+            return
+
+        page_control = SimplePagedResultsControl(
+            criticality=False, size=0, cookie=cookie
+        )
+        try:
+            msgid = ldap_obj.search_ext(
+                self._base_dn,
+                ldap.SCOPE_SUBTREE,
+                filter_str,
+                attributes,
+                serverctrls=[page_control],
+            )
+            self._wait_results(ldap_obj, msgid, self._timeout)
+        except ldap.LDAPError as e:
+            logger.debug('LDAP "%s": paged search release error: %r', self._name, e)
+
+    @staticmethod
+    def _next_page_cookie(controls):
+        for control in controls or []:
+            if control.controlType == SimplePagedResultsControl.controlType:
+                return control.cookie
+        return None
+
+    def _wait_results(self, ldap_obj, msgid, timeout, partial=True):
+        deadline = self._clock() + timeout
+        results = []
+        while True:
+            remaining = deadline - self._clock()
+            try:
+                if remaining <= 0:
+                    raise ldap.TIMEOUT()
+                result_type, data, _, controls = ldap_obj.result3(
+                    msgid, all=0, timeout=0 if self._shared else remaining
+                )
+            except ldap.SIZELIMIT_EXCEEDED:
+                if not partial:
+                    raise
+                return results, []
+            except ldap.TIMEOUT:
+                self._abandon(ldap_obj, msgid)
+                raise
+
+            if result_type is None:
+                self._wait_readable(ldap_obj, min(remaining, self.POLL_INTERVAL))
+                continue
+
+            results.extend(data)
+            if result_type == ldap.RES_SEARCH_RESULT:
+                return results, controls
+
+    def _wait_readable(self, ldap_obj, timeout):
+        # Another search on the same connection may already have read the response, so
+        # do not wait for the socket longer than a short interval
+        try:
+            select.select([ldap_obj.fileno()], [], [], timeout)
+        except (OSError, ValueError, ldap.LDAPError):
+            time.sleep(timeout)
+
+    def _abandon(self, ldap_obj, msgid):
+        try:
+            ldap_obj.abandon_ext(msgid)
+        except ldap.LDAPError as e:
+            logger.debug('LDAP "%s": abandon error: %r', self._name, e)
+
+
+class _PooledClient:
+    def __init__(self, client, released_at):
+        self.client = client
+        self.searches = 0
+        self.released_at = released_at
+
+
+class _LDAPClientPool:
+    # Connections idle for less than this are reused without checking them
+    HEALTH_CHECK_IDLE_TIME = 5.0
+
+    def __init__(self, ldap_config, client_factory=_LDAPClient, clock=time.monotonic):
+        self._ldap_config = ldap_config
+        self._client_factory = client_factory
+        self._clock = clock
+        self._name = ldap_config.name()
+        self._size = ldap_config.ldap_pool_size()
+        self._idle_timeout = ldap_config.ldap_pool_idle_timeout()
+        self._slots = threading.BoundedSemaphore(
+            self._size * ldap_config.ldap_searches_per_connection()
+        )
+        self._lock = threading.Lock()
+        self._clients = []
+        self._closed = False
+
+    def set_up(self):
+        with self._client() as client:
+            client.set_up()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle_clients = [pooled for pooled in self._clients if not pooled.searches]
+            self._remove(idle_clients)
+
+        for pooled in idle_clients:
+            pooled.client.close()
+
+    def search(self, filter_str, limit=-1):
+        with self._client() as client:
+            return client.search(filter_str, limit)
+
+    def search_pages(self, filter_str, limit=-1):
+        with self._client() as client:
+            yield from client.search_pages(filter_str, limit)
+
+    def fetch_pages(self, filter_str, attributes, timeout):
+        with self._client() as client:
+            yield from client.fetch_pages(filter_str, attributes, timeout)
+
+    @contextmanager
+    def _client(self):
+        with self._slots:
+            pooled = self._acquire()
+            try:
+                yield pooled.client
+            finally:
+                self._release(pooled)
+
+    def _acquire(self):
+        now = self._clock()
+        with self._lock:
+            expired_clients = self._pop_expired_clients(now)
+            pooled = self._pick_client()
+            if pooled is None:
+                logger.debug('LDAP "%s": opening a new connection', self._name)
+                pooled = _PooledClient(self._client_factory(self._ldap_config), now)
+                self._clients.append(pooled)
+            pooled.searches += 1
+            check = pooled.searches == 1 and (
+                now - pooled.released_at > self.HEALTH_CHECK_IDLE_TIME
+            )
+
+        for expired in expired_clients:
+            expired.client.close()
+
+        if check:
+            # A dead connection is closed and will be opened again by the search
+            pooled.client.is_alive()
+        return pooled
+
+    def _release(self, pooled):
+        with self._lock:
+            pooled.searches -= 1
+            if pooled.searches:
+                return
+            pooled.released_at = self._clock()
+            if not self._closed:
+                return
+            self._remove([pooled])
+
+        pooled.client.close()
+
+    def _pick_client(self):
+        idle_clients = [pooled for pooled in self._clients if not pooled.searches]
+        if idle_clients:
+            return max(idle_clients, key=lambda pooled: pooled.released_at)
+
+        if len(self._clients) < self._size:
+            return None
+
+        # The semaphore guarantees that one of them accepts another search
+        return min(self._clients, key=lambda pooled: pooled.searches)
+
+    def _pop_expired_clients(self, now):
+        expired = [
+            pooled
+            for pooled in self._clients
+            if not pooled.searches and now - pooled.released_at > self._idle_timeout
+        ]
+        if expired:
+            logger.debug(
+                'LDAP "%s": closing %s idle connections', self._name, len(expired)
+            )
+            self._remove(expired)
+        return expired
+
+    def _remove(self, pooled_clients):
+        for pooled in pooled_clients:
+            self._clients.remove(pooled)
+
+
+_ReplicaContent = namedtuple(
+    '_ReplicaContent', ['entries', 'searched', 'first_matched', 'unique', 'modified']
+)
+
+
+class _LDAPReplica:
+
+    FETCH_TIMEOUT = 60.0
+    MODIFY_TIMESTAMP = 'modifyTimestamp'
+
+    def __init__(
+        self, ldap_config, ldap_client, result_formatter, clock=time.monotonic
+    ):
+        self._name = ldap_config.name()
+        self._ldap_client = ldap_client
+        self._result_formatter = result_formatter
+        self._clock = clock
+        self._searched_columns = ldap_config.searched_columns()
+        self._first_matched_columns = ldap_config.first_matched_columns()
+        self._unique_column = ldap_config.unique_column()
+        self._binary_uuid = ldap_config.has_binary_uuid()
+        self._refresh_interval = ldap_config.ldap_replica_refresh_interval()
+        self._full_refresh_interval = ldap_config.ldap_replica_full_refresh_interval()
+        self._attributes = self._replicated_attributes(ldap_config)
+        self._content = None
+        self._last_full_refresh = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        thread = threading.Thread(
+            target=_replicate,
+            args=(weakref.ref(self), self._stopped, self._refresh_interval),
+            name='ldap-replica-{}'.format(self._name),
+        )
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def is_ready(self):
+        return self._content is not None
+
+    def refresh(self):
+        now = self._clock()
+        full = self._content is None or (
+            now - self._last_full_refresh >= self._full_refresh_interval
+        )
+        try:
+            if full:
+                self._full_refresh()
+                self._last_full_refresh = now
+            else:
+                self._delta_refresh()
+        except ldap.SIZELIMIT_EXCEEDED:
+            logger.warning(
+                'LDAP "%s": replica refresh truncated by the size limit of the server, '
+                'keeping the last content. The server may not support paged results',
+                self._name,
+            )
+        except (ldap.LDAPError, _ConnectionLost) as e:
+            logger.warning(
+                'LDAP "%s": replica refresh failed, keeping the last content: %r',
+                self._name,
+                e,
+            )
+
+    def search(self, term, max_results=None):
+        content = self._content
+        term = term.lower()
+        results = []
+        for dn, values in content.searched.items():
+            if any(term in value for value in values):
+                results.append(self._format(content, dn))
+                if max_results and len(results) >= max_results:
+                    break
+        return results
+
+    def first_match(self, term):
+        content = self._content
+        dns = content.first_matched.get(_exact_key(term))
+        if not dns:
+            return None
+        return self._format(content, dns[0])
+
+    def match_all(self, terms):
+        content = self._content
+        results = {}
+        for term in terms:
+            dns = content.first_matched.get(_exact_key(term))
+            if dns:
+                results[term] = self._format(content, dns[0])
         return results
 
+    def list(self, uids):
+        content = self._content
+        return [
+            self._format(content, content.unique[uid])
+            for uid in dict.fromkeys(uids)
+            if uid in content.unique
+        ]
+
+    def _format(self, content, dn):
+        attrs = {
+            name: values
+            for name, values in content.entries[dn].items()
+            if name != self.MODIFY_TIMESTAMP
+        }
+        return self._result_formatter.format_one_result(attrs)
+
+    def _full_refresh(self):
+        entries = self._fetch('(objectClass=*)')
+        logger.debug('LDAP "%s": replicated %s entries', self._name, len(entries))
+        self._content = self._new_content(entries)
+
+    def _delta_refresh(self):
+        content = self._content
+        if not content.modified:
+            return self._full_refresh()
+
+        filter_str = '({}>={})'.format(
+            self.MODIFY_TIMESTAMP, escape_filter_chars(content.modified)
+        )
+        modified_entries = self._fetch(filter_str)
+        # >= returns the last modified entries again, they are not changes
+        modified_entries = {
+            dn: attrs
+            for dn, attrs in modified_entries.items()
+            if content.entries.get(dn) != attrs
+        }
+        if not modified_entries:
+            return
+
+        logger.debug(
+            'LDAP "%s": replicated %s modified entries',
+            self._name,
+            len(modified_entries),
+        )
+        entries = dict(content.entries)
+        entries.update(modified_entries)
+        self._content = self._new_content(entries)
+
+    def _fetch(self, filter_str):
+        entries = {}
+        pages = self._ldap_client.fetch_pages(
+            filter_str, self._attributes, self.FETCH_TIMEOUT
+        )
+        for page in pages:
+            for dn, attrs in page:
+                if dn:
+                    entries[dn] = attrs
+        return entries
+
+    def _new_content(self, entries):
+        searched, first_matched, unique = {}, {}, {}
+        modified = None
+        for dn, attrs in entries.items():
+            searched[dn] = [
+                value.lower()
+                for column in self._searched_columns
+                for value in self._decoded(attrs, column)
+            ]
+            for column in self._first_matched_columns:
+                for value in self._decoded(attrs, column):
+                    first_matched.setdefault(_exact_key(value), []).append(dn)
+            unique_id = self._unique_id(attrs)
+            if unique_id is not None:
+                unique[unique_id] = dn
+            for value in self._decoded(attrs, self.MODIFY_TIMESTAMP):
+                if modified is None or value > modified:
+                    modified = value
+        return _ReplicaContent(entries, searched, first_matched, unique, modified)
+
+    def _unique_id(self, attrs):
+        values = attrs.get(self._unique_column) if self._unique_column else None
+        if not values:
+            return None
+        if self._binary_uuid:
+            return str(uuid.UUID(bytes=values[0]))
+        return values[0].decode('utf-8', 'replace')
+
+    @staticmethod
+    def _decoded(attrs, column):
+        return [value.decode('utf-8', 'replace') for value in attrs.get(column, [])]
+
+    def _replicated_attributes(self, ldap_config):
+        attributes = ldap_config.attributes()
+        if attributes is None:
+            return ['*', self.MODIFY_TIMESTAMP]
+
+        columns = (
+            attributes
+            + self._searched_columns
+            + self._first_matched_columns
+            + [self.MODIFY_TIMESTAMP]
+        )
+        return list(dict.fromkeys(columns))
+
+
+def _replicate(replica_ref, stopped, interval):
+    while True:
+        replica = replica_ref()
+        if replica is None:
+            return
+        replica.refresh()
+        del replica
+
+        if stopped.wait(interval):
+            return
+
+
+def _exact_key(value):
+    # Like the LDAP equality match of phone numbers, ignore the case, spaces and hyphens
+    return value.lower().replace(' ', '').replace('-', '')
+
 
 class _LDAPResultFormatter:
     def __init__(self, ldap_config):
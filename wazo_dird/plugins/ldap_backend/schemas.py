@@ -15,6 +15,16 @@ class SourceSchema(BaseSourceSchema):
     ldap_custom_filter = fields.String(validate=Length(min=1, max=1024), missing=None)
     ldap_network_timeout = fields.Float(validate=Range(min=0), default=0.3)
     ldap_timeout = fields.Float(validate=Range(min=0), default=1.0)
+    ldap_pool_size = fields.Integer(validate=Range(min=1), default=5)
+    ldap_pool_idle_timeout = fields.Float(validate=Range(min=0), default=60.0)
+    ldap_searches_per_connection = fields.Integer(validate=Range(min=1), default=1)
+    ldap_page_size = fields.Integer(validate=Range(min=0), default=0)
+    max_results = fields.Integer(validate=Range(min=1), allownone=True, missing=None)
+    ldap_replica = fields.Boolean(missing=False)
+    ldap_replica_refresh_interval = fields.Float(validate=Range(min=1), default=60.0)
+    ldap_replica_full_refresh_interval = fields.Float(
+        validate=Range(min=1), default=3600.0
+    )
     unique_column = fields.String(Length(min=1, max=128), allownone=True, missing=None)
     unique_column_format = fields.String(
         validate=OneOf(['string', 'binary_uuid']), missing='string'
@@ -3,11 +3,23 @@
 
 import ldap
 import os
+import threading
 import unittest
 import uuid
 
 from hamcrest import assert_that
 from hamcrest import contains_inanyorder
+from hamcrest import contains
+from hamcrest import empty
+from hamcrest import equal_to
+from hamcrest import has_entries
+from hamcrest import has_key
+from hamcrest import has_length
+from hamcrest import is_
+from hamcrest import is_not
+from hamcrest import none
+from hamcrest import same_instance
+from ldap.controls import SimplePagedResultsControl
 from ldap.ldapobject import LDAPObject
 from mock import Mock, ANY, sentinel, call
 from wazo_dird.plugins.base_plugins import BaseSourcePlugin
@@ -17,6 +29,9 @@ from ..plugin import (
     _LDAPConfig,
     _LDAPResultFormatter,
     _LDAPClient,
+    _LDAPClientPool,
+    _LDAPReplica,
+    _replicate,
     LDAPPlugin,
     _LDAPFactory,
 )
@@ -26,14 +41,15 @@ class TestLDAPPlugin(unittest.TestCase):
     def setUp(self):
         self.config = {'config': sentinel}
         self.ldap_config = Mock(_LDAPConfig)
+        self.ldap_config.ldap_replica.return_value = False
         self.ldap_result_formatter = Mock(_LDAPResultFormatter)
-        self.ldap_client = Mock(_LDAPClient)
+        self.ldap_client = Mock(_LDAPClientPool)
         self.ldap_factory = Mock(_LDAPFactory)
         self.ldap_factory.new_ldap_config.return_value = self.ldap_config
         self.ldap_factory.new_ldap_result_formatter.return_value = (
             self.ldap_result_formatter
         )
-        self.ldap_factory.new_ldap_client.return_value = self.ldap_client
+        self.ldap_factory.new_ldap_client_pool.return_value = self.ldap_client
         self.ldap_plugin = LDAPPlugin()
         self.ldap_plugin.ldap_factory = self.ldap_factory
 
@@ -44,7 +60,7 @@ class TestLDAPPlugin(unittest.TestCase):
         self.ldap_factory.new_ldap_result_formatter.assert_called_once_with(
             self.ldap_config
         )
-        self.ldap_factory.new_ldap_client.assert_called_once_with(self.ldap_config)
+        self.ldap_factory.new_ldap_client_pool.assert_called_once_with(self.ldap_config)
         self.ldap_client.set_up.assert_called_once_with()
 
     def test_unload(self):
@@ -56,18 +72,43 @@ class TestLDAPPlugin(unittest.TestCase):
     def test_search(self):
         term = 'foobar'
         self.ldap_config.build_search_filter.return_value = sentinel.filter
-        self.ldap_client.search.return_value = sentinel.search_result
-        self.ldap_result_formatter.format.return_value = sentinel.format_result
+        self.ldap_config.max_results.return_value = None
+        self.ldap_client.search_pages.return_value = iter(
+            [sentinel.page_1, sentinel.page_2]
+        )
+        self.ldap_result_formatter.format.side_effect = [
+            [sentinel.result_1],
+            [sentinel.result_2],
+        ]
 
         self.ldap_plugin.load(self.config)
         result = self.ldap_plugin.search(term)
 
         self.ldap_config.build_search_filter.assert_called_once_with(term)
-        self.ldap_client.search.assert_called_once_with(sentinel.filter)
-        self.ldap_result_formatter.format.assert_called_once_with(
-            sentinel.search_result
+        self.ldap_client.search_pages.assert_called_once_with(sentinel.filter, -1)
+        self.ldap_result_formatter.format.assert_has_calls(
+            [call(sentinel.page_1), call(sentinel.page_2)]
         )
-        self.assertIs(result, sentinel.format_result)
+        self.assertEqual(result, [sentinel.result_1, sentinel.result_2])
+
+    def test_search_with_max_results(self):
+        self.ldap_config.build_search_filter.return_value = sentinel.filter
+        self.ldap_config.max_results.return_value = 2
+        self.ldap_client.search_pages.return_value = iter(
+            [sentinel.page_1, sentinel.page_2, sentinel.page_3]
+        )
+        self.ldap_result_formatter.format.side_effect = [
+            [sentinel.result_1],
+            [sentinel.result_2, sentinel.result_3],
+            [sentinel.result_4],
+        ]
+
+        self.ldap_plugin.load(self.config)
+        result = self.ldap_plugin.search('foobar')
+
+        self.ldap_client.search_pages.assert_called_once_with(sentinel.filter, 2)
+        self.assertEqual(2, self.ldap_result_formatter.format.call_count)
+        self.assertEqual(result, [sentinel.result_1, sentinel.result_2])
 
     def test_first_match(self):
         exten = '123456'
@@ -161,6 +202,55 @@ class TestLDAPPlugin(unittest.TestCase):
         self.assertEqual([], result)
 
 
+class TestLDAPPluginWithReplica(unittest.TestCase):
+    def setUp(self):
+        self.ldap_config = Mock(_LDAPConfig)
+        self.ldap_config.ldap_replica.return_value = True
+        self.ldap_config.max_results.return_value = None
+        self.ldap_client = Mock(_LDAPClientPool)
+        self.ldap_replica = Mock(_LDAPReplica)
+        self.ldap_factory = Mock(_LDAPFactory)
+        self.ldap_factory.new_ldap_config.return_value = self.ldap_config
+        self.ldap_factory.new_ldap_client_pool.return_value = self.ldap_client
+        self.ldap_factory.new_ldap_replica.return_value = self.ldap_replica
+        self.ldap_plugin = LDAPPlugin()
+        self.ldap_plugin.ldap_factory = self.ldap_factory
+        self.ldap_plugin.load({'config': sentinel})
+
+    def test_load(self):
+        self.ldap_replica.start.assert_called_once_with()
+
+    def test_unload(self):
+        self.ldap_plugin.unload()
+
+        self.ldap_replica.stop.assert_called_once_with()
+
+    def test_that_the_replica_answers_when_ready(self):
+        self.ldap_replica.is_ready.return_value = True
+        self.ldap_replica.search.return_value = sentinel.search_result
+        self.ldap_replica.first_match.return_value = sentinel.first_match_result
+        self.ldap_replica.match_all.return_value = sentinel.match_all_result
+        self.ldap_replica.list.return_value = sentinel.list_result
+
+        assert_that(self.ldap_plugin.search('foo'), is_(sentinel.search_result))
+        assert_that(
+            self.ldap_plugin.first_match('123'), is_(sentinel.first_match_result)
+        )
+        assert_that(self.ldap_plugin.match_all(['123']), is_(sentinel.match_all_result))
+        assert_that(self.ldap_plugin.list(['abc']), is_(sentinel.list_result))
+        self.assertFalse(self.ldap_client.search.called)
+        self.assertFalse(self.ldap_client.search_pages.called)
+
+    def test_that_the_server_answers_until_the_replica_is_ready(self):
+        self.ldap_replica.is_ready.return_value = False
+        self.ldap_client.search.return_value = []
+
+        self.ldap_plugin.first_match('123')
+
+        self.assertFalse(self.ldap_replica.first_match.called)
+        self.ldap_client.search.assert_called_once_with(ANY, 1)
+
+
 class TestLDAPFactory(unittest.TestCase):
     def setUp(self):
         self.ldap_factory = _LDAPFactory()
@@ -172,11 +262,21 @@ class TestLDAPFactory(unittest.TestCase):
         self.assertIsInstance(ldap_config, _LDAPConfig)
 
     def test_ldap_client(self):
-        ldap_config = Mock()
+        ldap_config = Mock(_LDAPConfig)
+        ldap_config.ldap_searches_per_connection.return_value = 1
+        ldap_config.ldap_page_size.return_value = 0
         ldap_client = self.ldap_factory.new_ldap_client(ldap_config)
 
         self.assertIsInstance(ldap_client, _LDAPClient)
 
+    def test_ldap_client_pool(self):
+        ldap_config = Mock(_LDAPConfig)
+        ldap_config.ldap_pool_size.return_value = 5
+        ldap_config.ldap_searches_per_connection.return_value = 1
+        ldap_client_pool = self.ldap_factory.new_ldap_client_pool(ldap_config)
+
+        self.assertIsInstance(ldap_client_pool, _LDAPClientPool)
+
     def test_ldap_result_formatter(self):
         ldap_config = Mock()
         ldap_result_formatter = self.ldap_factory.new_ldap_result_formatter(ldap_config)
@@ -490,10 +590,18 @@ class TestLDAPClient(unittest.TestCase):
         self.ldap_config.attributes.return_value = self.attributes
         self.ldap_config.ldap_username.return_value = self.username
         self.ldap_config.ldap_password.return_value = self.password
+        self.ldap_config.ldap_timeout.return_value = 1.0
+        self.ldap_config.ldap_searches_per_connection.return_value = 1
+        self.ldap_config.ldap_page_size.return_value = 0
         self.ldap_obj = Mock(LDAPObject)
+        self.ldap_obj.search_ext.return_value = sentinel.msgid
+        self.ldap_obj.result3.return_value = (ldap.RES_SEARCH_RESULT, [], None, [])
         self.ldap_obj_factory = Mock()
         self.ldap_obj_factory.return_value = self.ldap_obj
-        self.ldap_client = _LDAPClient(self.ldap_config, self.ldap_obj_factory)
+        self.now = 0
+        self.ldap_client = _LDAPClient(
+            self.ldap_config, self.ldap_obj_factory, clock=lambda: self.now
+        )
 
     def test_set_up(self):
         self.ldap_client.set_up()
@@ -525,35 +633,137 @@ class TestLDAPClient(unittest.TestCase):
         self.ldap_obj.unbind_s.assert_called_once_with()
 
     def test_search(self):
-        self.ldap_obj.search_ext_s.return_value = sentinel
+        entries = [('cn=foo', {}), ('cn=bar', {})]
+        self.ldap_obj.result3.side_effect = [
+            (ldap.RES_SEARCH_ENTRY, entries[:1], sentinel.msgid, []),
+            (ldap.RES_SEARCH_ENTRY, entries[1:], sentinel.msgid, []),
+            (ldap.RES_SEARCH_RESULT, [], sentinel.msgid, []),
+        ]
 
         result = self.ldap_client.search('foo')
 
-        self.ldap_obj.search_ext_s.assert_called_once_with(
+        self.ldap_obj.search_ext.assert_called_once_with(
             self.base_dn, ANY, 'foo', self.attributes, sizelimit=-1
         )
+        self.ldap_obj.result3.assert_called_with(sentinel.msgid, all=0, timeout=1.0)
         self.assertEqual(1, self.ldap_obj_factory.call_count)
-        self.assertIs(result, sentinel)
+        self.assertEqual(result, entries)
 
     def test_search_on_filter_error(self):
-        self.ldap_obj.search_ext_s.side_effect = ldap.FILTER_ERROR('moo')
+        self.ldap_obj.search_ext.side_effect = ldap.FILTER_ERROR('moo')
 
         self.ldap_client.set_up()
         result = self.ldap_client.search('foo')
 
         self.assertEqual(result, [])
         self.assertEqual(1, self.ldap_obj_factory.call_count)
-        self.assertEqual(1, self.ldap_obj.search_ext_s.call_count)
+        self.assertEqual(1, self.ldap_obj.search_ext.call_count)
 
     def test_search_on_server_down_error(self):
-        self.ldap_obj.search_ext_s.side_effect = ldap.SERVER_DOWN('moo')
+        self.ldap_obj.search_ext.side_effect = ldap.SERVER_DOWN('moo')
 
         self.ldap_client.set_up()
         result = self.ldap_client.search('foo')
 
         self.assertEqual(result, [])
         self.assertEqual(2, self.ldap_obj_factory.call_count)
-        self.assertEqual(2, self.ldap_obj.search_ext_s.call_count)
+        self.assertEqual(2, self.ldap_obj.search_ext.call_count)
+
+    def test_search_on_timeout(self):
+        self.ldap_obj.result3.side_effect = ldap.TIMEOUT()
+
+        result = self.ldap_client.search('foo')
+
+        self.assertEqual(result, [])
+        self.ldap_obj.abandon_ext.assert_called_once_with(sentinel.msgid)
+        self.assertFalse(self.ldap_obj.unbind_s.called)
+
+    def test_search_on_size_limit_exceeded(self):
+        self.ldap_obj.result3.side_effect = [
+            (ldap.RES_SEARCH_ENTRY, [('cn=foo', {})], sentinel.msgid, []),
+            ldap.SIZELIMIT_EXCEEDED(),
+        ]
+
+        result = self.ldap_client.search('foo', 1)
+
+        self.assertEqual(result, [('cn=foo', {})])
+
+    def test_fetch_pages_are_always_paged(self):
+        self.ldap_obj.result3.side_effect = [
+            (ldap.RES_SEARCH_ENTRY, [('cn=a', {})], sentinel.msgid, []),
+            (ldap.RES_SEARCH_RESULT, [], sentinel.msgid, [self._paged(b'')]),
+        ]
+
+        result = list(self.ldap_client.fetch_pages('foo', ['cn'], 60))
+
+        self.assertEqual(result, [[('cn=a', {})]])
+        page_control = self.ldap_obj.search_ext.call_args[1]['serverctrls'][0]
+        self.assertEqual(page_control.size, _LDAPClient.FETCH_PAGE_SIZE)
+
+    def test_fetch_pages_on_size_limit_exceeded(self):
+        self.ldap_obj.result3.side_effect = [
+            (ldap.RES_SEARCH_ENTRY, [('cn=foo', {})], sentinel.msgid, []),
+            ldap.SIZELIMIT_EXCEEDED(),
+        ]
+
+        pages = self.ldap_client.fetch_pages('foo', ['cn'], 60)
+
+        self.assertRaises(ldap.SIZELIMIT_EXCEEDED, list, pages)
+        self.assertFalse(self.ldap_obj.unbind_s.called)
+
+    def test_search_pages(self):
+        self.ldap_config.ldap_page_size.return_value = 2
+        ldap_client = _LDAPClient(self.ldap_config, self.ldap_obj_factory)
+        page_1 = [('cn=a', {}), ('cn=b', {})]
+        page_2 = [('cn=c', {})]
+        self.ldap_obj.result3.side_effect = [
+            (ldap.RES_SEARCH_ENTRY, page_1, sentinel.msgid, []),
+            (ldap.RES_SEARCH_RESULT, [], sentinel.msgid, [self._paged(b'next')]),
+            (ldap.RES_SEARCH_ENTRY, page_2, sentinel.msgid, []),
+            (ldap.RES_SEARCH_RESULT, [], sentinel.msgid, [self._paged(b'')]),
+        ]
+
+        result = list(ldap_client.search_pages('foo'))
+
+        self.assertEqual(result, [page_1, page_2])
+        self.assertEqual(2, self.ldap_obj.search_ext.call_count)
+        next_page_control = self.ldap_obj.search_ext.call_args[1]['serverctrls'][0]
+        self.assertEqual(next_page_control.cookie, b'next')
+
+    def test_search_pages_stops_at_the_limit(self):
+        self.ldap_config.ldap_page_size.return_value = 2
+        ldap_client = _LDAPClient(self.ldap_config, self.ldap_obj_factory)
+        page_1 = [('cn=a', {}), ('cn=b', {})]
+        self.ldap_obj.result3.side_effect = [
+            (ldap.RES_SEARCH_ENTRY, page_1, sentinel.msgid, []),
+            (ldap.RES_SEARCH_RESULT, [], sentinel.msgid, [self._paged(b'next')]),
+            (ldap.RES_SEARCH_RESULT, [], sentinel.msgid, []),
+        ]
+
+        result = list(ldap_client.search_pages('foo', 2))
+
+        self.assertEqual(result, [page_1])
+        release_control = self.ldap_obj.search_ext.call_args[1]['serverctrls'][0]
+        self.assertEqual(release_control.size, 0)
+        self.assertEqual(release_control.cookie, b'next')
+
+    def test_search_pages_released_when_not_read_until_the_end(self):
+        self.ldap_config.ldap_page_size.return_value = 2
+        ldap_client = _LDAPClient(self.ldap_config, self.ldap_obj_factory)
+        page_1 = [('cn=a', {}), ('cn=b', {})]
+        self.ldap_obj.result3.side_effect = [
+            (ldap.RES_SEARCH_ENTRY, page_1, sentinel.msgid, []),
+            (ldap.RES_SEARCH_RESULT, [], sentinel.msgid, [self._paged(b'next')]),
+            (ldap.RES_SEARCH_RESULT, [], sentinel.msgid, []),
+        ]
+
+        pages = ldap_client.search_pages('foo')
+        next(pages)
+        pages.close()
+
+        self.assertEqual(2, self.ldap_obj.search_ext.call_count)
+        release_control = self.ldap_obj.search_ext.call_args[1]['serverctrls'][0]
+        self.assertEqual(release_control.size, 0)
 
     def test_multiple_search(self):
         self.ldap_client.search('foo')
@@ -561,7 +771,320 @@ class TestLDAPClient(unittest.TestCase):
         self.ldap_client.search('foobar')
 
         self.assertEqual(1, self.ldap_obj.simple_bind_s.call_count)
-        self.assertEqual(3, self.ldap_obj.search_ext_s.call_count)
+        self.assertEqual(3, self.ldap_obj.search_ext.call_count)
+
+    def test_shared_connection_search_polls_the_result(self):
+        self.ldap_config.ldap_searches_per_connection.return_value = 2
+        ldap_client = _LDAPClient(
+            self.ldap_config, self.ldap_obj_factory, clock=lambda: self.now
+        )
+        self.ldap_obj.fileno.return_value = os.open(os.devnull, os.O_RDONLY)
+        self.addCleanup(os.close, self.ldap_obj.fileno.return_value)
+        self.ldap_obj.result3.side_effect = [
+            (None, None, None, None),
+            (ldap.RES_SEARCH_ENTRY, [('cn=foo', {})], sentinel.msgid, []),
+            (ldap.RES_SEARCH_RESULT, [], sentinel.msgid, []),
+        ]
+
+        result = ldap_client.search('foo')
+
+        self.assertEqual(result, [('cn=foo', {})])
+        self.ldap_obj.result3.assert_called_with(sentinel.msgid, all=0, timeout=0)
+
+    def test_shared_connection_search_timeout(self):
+        self.ldap_config.ldap_searches_per_connection.return_value = 2
+        ldap_client = _LDAPClient(
+            self.ldap_config, self.ldap_obj_factory, clock=lambda: self.now
+        )
+        self.ldap_obj.fileno.return_value = os.open(os.devnull, os.O_RDONLY)
+        self.addCleanup(os.close, self.ldap_obj.fileno.return_value)
+
+        def poll(*args, **kwargs):
+            self.now += 0.6
+            return (None, None, None, None)
+
+        self.ldap_obj.result3.side_effect = poll
+
+        result = ldap_client.search('foo')
+
+        self.assertEqual(result, [])
+        self.assertEqual(2, self.ldap_obj.result3.call_count)
+        self.ldap_obj.abandon_ext.assert_called_once_with(sentinel.msgid)
+
+    def test_is_alive(self):
+        self.ldap_client.set_up()
+
+        self.assertTrue(self.ldap_client.is_alive())
+
+    def test_is_alive_when_not_set_up(self):
+        self.assertFalse(self.ldap_client.is_alive())
+
+    def test_is_alive_on_server_down_error(self):
+        self.ldap_obj.whoami_s.side_effect = ldap.SERVER_DOWN('moo')
+        self.ldap_client.set_up()
+
+        self.assertFalse(self.ldap_client.is_alive())
+        self.ldap_obj.unbind_s.assert_called_once_with()
+
+    @staticmethod
+    def _paged(cookie):
+        return SimplePagedResultsControl(True, size=0, cookie=cookie)
+
+
+class TestLDAPClientPool(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.ldap_config = Mock(_LDAPConfig)
+        self.ldap_config.ldap_pool_size.return_value = 2
+        self.ldap_config.ldap_pool_idle_timeout.return_value = 60
+        self.ldap_config.ldap_searches_per_connection.return_value = 1
+        self.clients = []
+        self.pool = _LDAPClientPool(
+            self.ldap_config, self._new_client, clock=lambda: self.now
+        )
+
+    def test_set_up(self):
+        self.pool.set_up()
+
+        self.clients[0].set_up.assert_called_once_with()
+
+    def test_that_sequential_searches_reuse_a_connection(self):
+        self.pool.search('foo')
+        self.pool.search('bar', 1)
+
+        assert_that(self.clients, has_length(1))
+        self.clients[0].search.assert_has_calls([call('foo', -1), call('bar', 1)])
+
+    def test_that_concurrent_searches_use_different_connections(self):
+        with self.pool._client() as first:
+            with self.pool._client() as second:
+                self.assertIsNot(first, second)
+
+        assert_that(self.clients, has_length(2))
+
+    def test_that_the_pool_size_is_bounded(self):
+        with self.pool._client(), self.pool._client():
+            thread = threading.Thread(target=self.pool.search, args=('foo',))
+            thread.start()
+            thread.join(0.05)
+            self.assertTrue(thread.is_alive())
+        thread.join()
+
+        assert_that(self.clients, has_length(2))
+
+    def test_that_idle_connections_are_closed(self):
+        with self.pool._client(), self.pool._client():
+            pass
+        self.now = 61
+
+        self.pool.search('foo')
+
+        assert_that(self.clients, has_length(3))
+        self.clients[0].close.assert_called_once_with()
+        self.clients[1].close.assert_called_once_with()
+
+    def test_that_a_recently_used_connection_is_not_checked(self):
+        self.pool.search('foo')
+        self.now = 1
+
+        self.pool.search('bar')
+
+        self.assertFalse(self.clients[0].is_alive.called)
+
+    def test_that_an_unused_connection_is_checked(self):
+        self.pool.search('foo')
+        self.now = 30
+
+        self.pool.search('bar')
+
+        self.clients[0].is_alive.assert_called_once_with()
+
+    def test_that_connections_are_shared_when_all_are_busy(self):
+        self.ldap_config.ldap_searches_per_connection.return_value = 2
+        pool = _LDAPClientPool(self.ldap_config, self._new_client)
+
+        with pool._client() as first, pool._client() as second:
+            with pool._client() as third, pool._client() as fourth:
+                self.assertIsNot(first, second)
+                assert_that([third, fourth], contains_inanyorder(first, second))
+
+        assert_that(self.clients, has_length(2))
+
+    def test_close(self):
+        with self.pool._client():
+            self.pool.search('foo')
+            self.pool.close()
+
+        self.clients[0].close.assert_called_once_with()
+        self.clients[1].close.assert_called_once_with()
+
+    def _new_client(self, ldap_config):
+        client = Mock(_LDAPClient)
+        self.clients.append(client)
+        return client
+
+
+class TestLDAPReplica(unittest.TestCase):
+    def setUp(self):
+        self.now = 0
+        self.ldap_config = Mock(_LDAPConfig)
+        self.ldap_config.name.return_value = 'my-ldap'
+        self.ldap_config.searched_columns.return_value = ['cn', 'mail']
+        self.ldap_config.first_matched_columns.return_value = ['telephoneNumber']
+        self.ldap_config.unique_column.return_value = 'entryUUID'
+        self.ldap_config.has_binary_uuid.return_value = False
+        self.ldap_config.attributes.return_value = ['cn', 'entryUUID']
+        self.ldap_config.ldap_replica_refresh_interval.return_value = 60
+        self.ldap_config.ldap_replica_full_refresh_interval.return_value = 3600
+        self.ldap_client = Mock(_LDAPClientPool)
+        self.ldap_client.fetch_pages.return_value = [
+            [
+                self._entry('1', 'Alice Smith', '+1 555-1234', '20210101000000Z'),
+                self._entry('2', 'Bob Martin', '5556789', '20210102000000Z'),
+                (None, ['ldap://referral']),
+            ]
+        ]
+        self.formatter = Mock(_LDAPResultFormatter)
+        self.formatter.format_one_result.side_effect = lambda attrs: attrs['cn'][0]
+        self.replica = _LDAPReplica(
+            self.ldap_config, self.ldap_client, self.formatter, clock=lambda: self.now
+        )
+
+    def test_not_ready_before_the_first_refresh(self):
+        self.assertFalse(self.replica.is_ready())
+
+    def test_full_refresh(self):
+        self.replica.refresh()
+
+        self.assertTrue(self.replica.is_ready())
+        self.ldap_client.fetch_pages.assert_called_once_with(
+            '(objectClass=*)',
+            ['cn', 'entryUUID', 'mail', 'telephoneNumber', 'modifyTimestamp'],
+            ANY,
+        )
+
+    def test_search(self):
+        self.replica.refresh()
+
+        assert_that(self.replica.search('SMITH'), contains(b'Alice Smith'))
+        assert_that(self.replica.search('i', max_results=1), contains(b'Alice Smith'))
+        assert_that(self.replica.search('nobody'), empty())
+
+    def test_first_match_ignores_spaces_and_hyphens(self):
+        self.replica.refresh()
+
+        assert_that(self.replica.first_match('+15551234'), equal_to(b'Alice Smith'))
+        assert_that(self.replica.first_match('555'), none())
+
+    def test_match_all(self):
+        self.replica.refresh()
+
+        result = self.replica.match_all(['5556789', '+1 555-1234', '42'])
+
+        assert_that(
+            result,
+            has_entries({'5556789': b'Bob Martin', '+1 555-1234': b'Alice Smith'}),
+        )
+        assert_that(result, is_not(has_key('42')))
+
+    def test_list(self):
+        self.replica.refresh()
+
+        assert_that(
+            self.replica.list(['2', '3', '1']), contains(b'Bob Martin', b'Alice Smith')
+        )
+
+    def test_delta_refresh(self):
+        self.replica.refresh()
+        self.ldap_client.fetch_pages.return_value = [
+            [self._entry('2', 'Robert Martin', '5556789', '20210103000000Z')]
+        ]
+        self.now = 60
+
+        self.replica.refresh()
+
+        self.ldap_client.fetch_pages.assert_called_with(
+            '(modifyTimestamp>=20210102000000Z)', ANY, ANY
+        )
+        assert_that(self.replica.first_match('5556789'), equal_to(b'Robert Martin'))
+        assert_that(self.replica.first_match('+15551234'), equal_to(b'Alice Smith'))
+
+    def test_delta_refresh_keeps_the_content_when_nothing_changed(self):
+        self.replica.refresh()
+        content = self.replica._content
+        self.ldap_client.fetch_pages.return_value = [
+            [self._entry('2', 'Bob Martin', '5556789', '20210102000000Z')]
+        ]
+        self.now = 60
+
+        self.replica.refresh()
+
+        assert_that(self.replica._content, same_instance(content))
+
+    def test_full_refresh_removes_deleted_entries(self):
+        self.replica.refresh()
+        self.ldap_client.fetch_pages.return_value = [
+            [self._entry('2', 'Bob Martin', '5556789', '20210102000000Z')]
+        ]
+        self.now = 3600
+
+        self.replica.refresh()
+
+        self.ldap_client.fetch_pages.assert_called_with('(objectClass=*)', ANY, ANY)
+        assert_that(self.replica.first_match('+15551234'), none())
+
+    def test_content_is_kept_when_the_server_is_down(self):
+        self.replica.refresh()
+        self.ldap_client.fetch_pages.side_effect = ldap.SERVER_DOWN('moo')
+        self.now = 3600
+
+        self.replica.refresh()
+
+        assert_that(self.replica.first_match('5556789'), equal_to(b'Bob Martin'))
+
+    def test_not_ready_when_the_fetch_is_truncated(self):
+        self.ldap_client.fetch_pages.side_effect = ldap.SIZELIMIT_EXCEEDED()
+
+        self.replica.refresh()
+
+        self.assertFalse(self.replica.is_ready())
+
+    def test_content_is_kept_when_the_delta_is_truncated(self):
+        self.replica.refresh()
+        self.ldap_client.fetch_pages.side_effect = ldap.SIZELIMIT_EXCEEDED()
+        self.now = 60
+
+        self.replica.refresh()
+
+        assert_that(self.replica.first_match('5556789'), equal_to(b'Bob Martin'))
+
+    def test_replication_stops_with_the_replica(self):
+        stopped = threading.Event()
+        replica = Mock(_LDAPReplica)
+        replica_ref = Mock(side_effect=[replica, None])
+
+        _replicate(replica_ref, stopped, 0)
+
+        replica.refresh.assert_called_once_with()
+
+    def test_replication_stops_when_stopped(self):
+        stopped = threading.Event()
+        stopped.set()
+        replica = Mock(_LDAPReplica)
+
+        _replicate(lambda: replica, stopped, 0)
+
+        replica.refresh.assert_called_once_with()
+
+    @staticmethod
+    def _entry(uid, cn, number, modified):
+        attrs = {
+            'entryUUID': [uid.encode()],
+            'cn': [cn.encode()],
+            'telephoneNumber': [number.encode()],
+            'modifyTimestamp': [modified.encode()],
+        }
+        return 'cn={},dc=example'.format(uid), attrs
 
 
 class TestLDAPResultFormatter(unittest.TestCase):
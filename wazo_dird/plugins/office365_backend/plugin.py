@@ -2,10 +2,16 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import logging
+
 from operator import itemgetter
 
 from wazo_dird import BaseSourcePlugin, make_result_class
-from wazo_dird.helpers import BaseBackendView
+from wazo_dird.helpers import BaseBackendView, used_fields
+from wazo_dird.plugin_helpers.bus_event_registry import registry as bus_events
+from wazo_dird.plugin_helpers.user_contact_cache import (
+    EVENTS as CONTACT_CACHE_EVENTS,
+    UserContactCache,
+)
 
 from .http import MicrosoftItem, MicrosoftList, MicrosoftContactList
 from .exceptions import MicrosoftTokenNotFoundException, UnexpectedEndpointException
@@ -13,6 +19,22 @@ from . import services
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_SYNC_INTERVAL = 60.0
+# The delta query is not sent again once it is answered with one of these
+UNSUPPORTED_QUERY_CODES = (404, 405, 501)
+# Always fetched, for the unique column, the sort and the computed fields
+SELECTED_FIELDS = (
+    (
+        'id',
+        'displayName',
+        'givenName',
+        'surname',
+        'emailAddresses',
+    )
+    + services.MULTI_PHONE_FIELDS
+    + services.SINGLE_PHONE_FIELDS
+)
+
 
 class Office365View(BaseBackendView):
 
@@ -43,6 +65,7 @@ class Office365Plugin(BaseSourcePlugin):
         self.name = config['name']
         self.endpoint = config['endpoint']
         self.office365 = services.Office365Service()
+        self._delta_supported = services.delta_url(self.endpoint) is not None
 
         self.unique_column = 'id'
         format_columns = dependencies['config'].get(self.FORMAT_COLUMNS, {})
@@ -71,13 +94,27 @@ class Office365Plugin(BaseSourcePlugin):
                 self.name,
             )
 
+        self._select = self._selected_fields(format_columns)
+        self._contacts = UserContactCache(
+            self._sync_contacts,
+            self._first_match_values,
+            unique_column=self.unique_column,
+            provider='microsoft',
+            sync_interval=config.get('sync_interval', DEFAULT_SYNC_INTERVAL),
+        )
+        for event_name in CONTACT_CACHE_EVENTS:
+            bus_events.subscribe(event_name, self._contacts.on_event)
+
+    def unload(self):
+        for event_name in CONTACT_CACHE_EVENTS:
+            bus_events.unsubscribe(event_name, self._contacts.on_event)
+
     def search(self, term, args=None):
         logger.debug('Searching term=%s', term)
-        contacts = self._fetch_contacts(args)
-        if not contacts:
+        user_contacts = self._get_user_contacts(args)
+        if not user_contacts:
             return []
 
-        updated_contacts = self._update_contact_fields(contacts)
         lowered_term = term.lower()
 
         def match_fn(contact):
@@ -87,23 +124,23 @@ class Office365Plugin(BaseSourcePlugin):
                     return True
             return False
 
-        filtered_contacts = [c for c in updated_contacts if match_fn(c)]
+        filtered_contacts = [c for c in user_contacts.contacts.values() if match_fn(c)]
         sorted_contacts = sorted(filtered_contacts, key=itemgetter('givenName'))
 
         return [self._SourceResult(c) for c in sorted_contacts]
 
     def list(self, unique_ids, args=None):
-        contacts = self._fetch_contacts(args)
-        if not contacts:
+        user_contacts = self._get_user_contacts(args)
+        if not user_contacts:
             return []
 
-        updated_contacts = self._update_contact_fields(contacts)
-        filtered_contacts = [
-            c for c in updated_contacts if c[self.unique_column] in unique_ids
+        contacts = user_contacts.contacts
+        return [
+            self._SourceResult(contacts[unique_id])
+            for unique_id in dict.fromkeys(unique_ids)
+            if unique_id in contacts
         ]
 
-        return [self._SourceResult(contact) for contact in filtered_contacts]
-
     def first_match(self, term, args=None):
         if not self._first_matched_columns:
             logger.debug(
@@ -112,16 +149,14 @@ class Office365Plugin(BaseSourcePlugin):
             )
             return
 
-        contacts = self._fetch_contacts(args)
-        if not contacts:
+        user_contacts = self._get_user_contacts(args)
+        if not user_contacts:
             return
 
-        updated_contacts = self._update_contact_fields(contacts)
-        lowered_term = term.lower()
-
-        for contact in updated_contacts:
-            if self._first_match_predicate(lowered_term, contact):
-                return self._SourceResult(contact)
+        unique_id = user_contacts.first_matched.get(term.lower())
+        if unique_id is None:
+            return None
+        return self._SourceResult(user_contacts.contacts[unique_id])
 
     def match_all(self, terms, args=None):
         if not self._first_matched_columns:
@@ -131,45 +166,79 @@ class Office365Plugin(BaseSourcePlugin):
             )
             return {}
 
-        contacts = self._fetch_contacts(args)
-        if not contacts:
+        user_contacts = self._get_user_contacts(args)
+        if not user_contacts:
             return {}
 
-        updated_contacts = self._update_contact_fields(contacts)
         results = {}
         for term in terms:
-            lowered_term = term.lower()
-            for contact in updated_contacts:
-                if self._first_match_predicate(lowered_term, contact):
-                    results[term] = self._SourceResult(contact)
+            unique_id = user_contacts.first_matched.get(term.lower())
+            if unique_id is not None:
+                results[term] = self._SourceResult(user_contacts.contacts[unique_id])
         return results
 
-    def _fetch_contacts(self, args=None):
+    def _get_user_contacts(self, args=None):
         try:
             microsoft_token = self._get_microsoft_token(**args)
         except MicrosoftTokenNotFoundException:
             logger.debug('could not find a matching Microsoft token')
-            return
-
+            return None
+
+        return self._contacts.get(args['user_uuid'], microsoft_token)
+
+    def _sync_contacts(self, microsoft_token, delta_link):
+        if self._delta_supported:
+            try:
+                modified, deleted, delta_link = self.office365.sync_contacts(
+                    microsoft_token, self.endpoint, delta_link, select=self._select
+                )
+                return self._update_contact_fields(modified), deleted, delta_link
+            except UnexpectedEndpointException as e:
+                error_code = e.details.get('error_code')
+                if delta_link or error_code not in (400,) + UNSUPPORTED_QUERY_CODES:
+                    return None
+
+                if error_code in UNSUPPORTED_QUERY_CODES:
+                    logger.info(
+                        '%s: delta queries are not supported on %s, all the contacts will be fetched',
+                        self.name,
+                        self.endpoint,
+                    )
+                    self._delta_supported = False
+                else:
+                    # The delta query is tried again on the next sync
+                    logger.debug(
+                        '%s: delta query refused on %s, fetching all the contacts',
+                        self.name,
+                        self.endpoint,
+                    )
+
+        # Endpoints without delta queries still get all the contacts
         try:
-            contacts, _ = self.office365.get_contacts(microsoft_token, self.endpoint)
+            modified, _ = self.office365.get_contacts(
+                microsoft_token, self.endpoint, select=self._select
+            )
         except UnexpectedEndpointException:
-            return
-        return contacts
+            return None
+        return self._update_contact_fields(modified), [], None
 
-    def _first_match_predicate(self, term, contact):
+    def _selected_fields(self, format_columns):
+        fields = used_fields(
+            self._searched_columns, self._first_matched_columns, format_columns
+        )
+        fields.update(SELECTED_FIELDS)
+        return sorted(fields & services.CONTACT_FIELDS)
+
+    def _first_match_values(self, contact):
+        values = []
         for column in self._first_matched_columns:
             column_value = contact.get(column) or ''
 
             if isinstance(column_value, list):
-                for item in column_value:
-                    if term == item.lower():
-                        return True
+                values.extend(item.lower() for item in column_value)
             else:
-                if term == str(column_value).lower():
-                    return True
-
-        return False
+                values.append(str(column_value).lower())
+        return values
 
     def _get_microsoft_token(self, user_uuid, token=None, **ignored):
         if not token:
@@ -7,7 +7,7 @@ from xivo.mallow_helpers import ListSchema as _ListSchema
 from wazo_dird.schemas import BaseAuthConfigSchema, BaseSourceSchema
 from xivo.mallow import fields
 
-from xivo.mallow.validate import Length
+from xivo.mallow.validate import Length, Range
 
 
 class SourceSchema(BaseSourceSchema):
@@ -21,6 +21,7 @@ class SourceSchema(BaseSourceSchema):
         missing='https://graph.microsoft.com/v1.0/me/contacts',
         validate=Length(min=1, max=255),
     )
+    sync_interval = fields.Float(validate=Range(min=0), missing=60.0)
 
 
 class ListSchema(_ListSchema):
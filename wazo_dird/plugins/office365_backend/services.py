@@ -5,71 +5,148 @@ import itertools
 import logging
 import uuid
 
+from urllib.parse import urlsplit, urlunsplit
+
 import requests
 
 from wazo_auth_client import Client as Auth
 
+from wazo_dird.plugin_helpers.external_token_cache import token_cache
 from wazo_dird.plugin_helpers.self_sorting_service import SelfSortingServiceMixin
+from wazo_dird.plugin_helpers.user_contact_cache import SyncStateExpired
 
 from .exceptions import MicrosoftTokenNotFoundException, UnexpectedEndpointException
 
-
 logger = logging.getLogger(__name__)
 
+PAGE_SIZE = 500
 MULTI_PHONE_FIELDS = ('businessPhones', 'homePhones')
 SINGLE_PHONE_FIELDS = ('mobilePhone',)
+# The properties of a contact resource that can be used in a $select
+CONTACT_FIELDS = {
+    'assistantName',
+    'birthday',
+    'businessAddress',
+    'businessHomePage',
+    'businessPhones',
+    'categories',
+    'children',
+    'companyName',
+    'department',
+    'displayName',
+    'emailAddresses',
+    'fileAs',
+    'generation',
+    'givenName',
+    'homeAddress',
+    'homePhones',
+    'id',
+    'imAddresses',
+    'initials',
+    'jobTitle',
+    'lastModifiedDateTime',
+    'manager',
+    'middleName',
+    'mobilePhone',
+    'nickName',
+    'officeLocation',
+    'otherAddress',
+    'parentFolderId',
+    'personalNotes',
+    'profession',
+    'spouseName',
+    'surname',
+    'title',
+    'yomiCompanyName',
+    'yomiGivenName',
+    'yomiSurname',
+}
 
 
 class Office365Service(SelfSortingServiceMixin):
 
     USER_AGENT = 'wazo_ua/1.0'
 
-    def get_contacts(self, microsoft_token, url, **list_params):
-        count = self._get_total_contacts(microsoft_token, url)
-        contacts = list(self._fetch(microsoft_token, url, count))
+    def get_contacts(self, microsoft_token, url, select=None, **list_params):
+        contacts = list(self._fetch(microsoft_token, url, select))
         total_contacts = len(contacts)
         sorted_contacts = self.sort(contacts, **list_params)
         paginated_contacts = self._paginate(sorted_contacts, **list_params)
         return paginated_contacts, total_contacts
 
-    def _fetch(self, microsoft_token, url, count):
-        headers = self.headers(microsoft_token)
-        try:
-            response = requests.get(url, headers=headers, params={'$top': count})
-            if response.status_code == 200:
-                logger.debug('Successfully fetched contacts from microsoft.')
-                logger.debug('Raw data: %s', response.text)
-                return response.json().get('value', [])
-            else:
-                logger.error(
-                    'An error occured while fetching information from microsoft endpoint'
-                )
-                raise UnexpectedEndpointException(
-                    endpoint=url, error_code=response.status_code
+    def sync_contacts(self, microsoft_token, url, delta_link=None, select=None):
+        """Return the contacts modified since `delta_link`, the deleted ids and the next delta link
+
+        Without `delta_link`, all the contacts are returned. `url` must have a
+        `delta_url`. Delta queries are paged with a Prefer header instead of $top.
+        """
+        headers = dict(
+            self.headers(microsoft_token),
+            Prefer='odata.maxpagesize={}'.format(PAGE_SIZE),
+        )
+        if delta_link:
+            page_url, params = delta_link, None
+        else:
+            page_url, params = delta_url(url), self._select_params(select)
+
+        modified, deleted = [], []
+        while True:
+            page = self._get_page(
+                url, page_url, headers, params, from_delta_link=bool(delta_link)
+            )
+            for contact in page.get('value', []):
+                if '@removed' in contact:
+                    deleted.append(contact['id'])
+                else:
+                    modified.append(contact)
+
+            # The next links already contain the query parameters
+            page_url, params = page.get('@odata.nextLink'), None
+            if not page_url:
+                logger.debug(
+                    'Successfully synced contacts from Microsoft: %s modified, %s deleted',
+                    len(modified),
+                    len(deleted),
                 )
-        except requests.RequestException:
-            raise UnexpectedEndpointException(endpoint=url)
+                return modified, deleted, page.get('@odata.deltaLink')
 
-    def _get_total_contacts(self, microsoft_token, url):
+    def _fetch(self, microsoft_token, url, select=None):
         headers = self.headers(microsoft_token)
+        page_url, params = url, self._params(select)
+        while page_url:
+            page = self._get_page(url, page_url, headers, params)
+            logger.debug('Successfully fetched a page of contacts from microsoft.')
+            yield from page.get('value', [])
+            page_url, params = page.get('@odata.nextLink'), None
+
+    def _get_page(self, url, page_url, headers, params, from_delta_link=False):
         try:
-            response = requests.get(url, headers=headers, params={'$count': 'true'})
-            if response.status_code == 200:
-                count = response.json().get('@odata.count', 0)
-                logger.debug(
-                    'Successfully got contact number from Microsoft: %s', count
-                )
-                return count
-            else:
-                logger.error(
-                    'An error occured while fetching information from Microsoft endpoint'
-                )
-                raise UnexpectedEndpointException(
-                    endpoint=url, error_code=response.status_code
-                )
+            response = requests.get(page_url, headers=headers, params=params)
         except requests.RequestException:
             raise UnexpectedEndpointException(endpoint=url)
 
+        # Expired delta links are answered with a 410 Gone, the caller syncs everything
+        if response.status_code == 410 and from_delta_link:
+            raise SyncStateExpired()
+        elif response.status_code != 200:
+            logger.error(
+                'An error occured while fetching information from microsoft endpoint'
+            )
+            raise UnexpectedEndpointException(
+                endpoint=url, error_code=response.status_code
+            )
+        return response.json()
+
+    @classmethod
+    def _params(cls, select):
+        return dict(cls._select_params(select), **{'$top': PAGE_SIZE})
+
+    @staticmethod
+    def _select_params(select):
+        if not select:
+            return {}
+        return {'$select': ','.join(select)}
+
     def _paginate(self, contacts, limit=None, offset=None, **_):
         if limit is None and offset is None:
             return contacts
@@ -94,10 +171,26 @@ class Office365Service(SelfSortingServiceMixin):
         }
 
 
+def delta_url(url):
+    """The delta query of a contacts endpoint, None when Graph has none for it
+
+    Graph only answers delta queries on the contacts of a contact folder, such as
+    /me/contactFolders/{id}/contacts, not on /me/contacts.
+    """
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    parts = path.rstrip('/').split('/')
+    if len(parts) < 3 or parts[-1] != 'contacts' or parts[-3] != 'contactFolders':
+        return None
+    return urlunsplit((scheme, netloc, '/'.join(parts + ['delta']), query, fragment))
+
+
 def get_microsoft_access_token(user_uuid, wazo_token, **auth_config):
-    try:
+    def fetch():
         auth = Auth(token=wazo_token, **auth_config)
-        return auth.external.get('microsoft', user_uuid).get('access_token')
+        return auth.external.get('microsoft', user_uuid)
+
+    try:
+        return token_cache.get('microsoft', user_uuid, fetch).get('access_token')
     except requests.HTTPError as e:
         logger.error('Microsoft token could not be fetched from wazo-auth, error %s', e)
         raise MicrosoftTokenNotFoundException(user_uuid)
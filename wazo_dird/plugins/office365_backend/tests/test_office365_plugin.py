@@ -6,6 +6,7 @@ from unittest import TestCase
 from hamcrest import (
     assert_that,
     calling,
+    contains,
     contains_inanyorder,
     empty,
     equal_to,
@@ -16,6 +17,10 @@ from hamcrest import (
     raises,
 )
 
+from mock import Mock, patch
+
+from .. import services
+from ..exceptions import UnexpectedEndpointException
 from ..plugin import Office365Plugin
 
 
@@ -46,30 +51,6 @@ class TestOffice365Plugin(TestCase):
             not_(raises(Exception)),
         )
 
-    def test_first_match_predicate(self):
-        self.source.load(self.DEPENDENCIES)
-
-        term = '5555551234'
-
-        mario = {'name': 'Mario Bros', 'mobilePhone': None, 'businessPhones': []}
-        luigi = {
-            'name': 'Luigi Bros',
-            'mobilePhone': None,
-            'businessPhones': ['5555551234'],
-        }
-        peach = {
-            'name': 'Peach',
-            'mobilePhone': '5555551234',
-            'businessPhones': ['4185553212'],
-        }
-
-        assert_that(self.source._first_match_predicate(term, mario), equal_to(False))
-        assert_that(self.source._first_match_predicate(term, luigi), equal_to(True))
-        assert_that(self.source._first_match_predicate(term, peach), equal_to(True))
-        assert_that(
-            self.source._first_match_predicate(term[:-1], peach), equal_to(False)
-        )
-
     def test_update_contact_fields_all_phones(self):
         self.source.load(self.DEPENDENCIES)
 
@@ -153,3 +134,123 @@ class TestOffice365Plugin(TestCase):
                 )
             ),
         )
+
+
+class TestOffice365PluginSync(TestCase):
+
+    ARGS = {'user_uuid': 'user-uuid', 'token': 'token'}
+    ENDPOINT = 'https://graph.microsoft.com/v1.0/me/contactFolders/abc/contacts'
+    DEPENDENCIES = {
+        'config': dict(TestOffice365Plugin.DEPENDENCIES['config'], endpoint=ENDPOINT)
+    }
+
+    def setUp(self):
+        self.source = Office365Plugin()
+        self.source.load(self.DEPENDENCIES)
+        self.source.office365 = Mock()
+        self.peach = {
+            'id': '1',
+            'givenName': 'Peach',
+            'mobilePhone': '5555551234',
+            'businessPhones': ['4185553212'],
+        }
+        self.source.office365.sync_contacts.return_value = ([self.peach], [], 'delta')
+        patcher = patch.object(
+            services, 'get_microsoft_access_token', return_value='ms-token'
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_that_lookups_use_the_synced_contacts(self):
+        first = self.source.first_match('4185553212', args=self.ARGS)
+        all_ = self.source.match_all(['5555551234', '1'], args=self.ARGS)
+        listed = self.source.list(['1', '2'], args=self.ARGS)
+        found = self.source.search('pea', args=self.ARGS)
+
+        assert_that(first.fields, has_entries(givenName='Peach'))
+        assert_that(all_, has_entries({'5555551234': equal_to(first)}))
+        assert_that(listed, contains(equal_to(first)))
+        assert_that(found, empty())
+        self.source.office365.sync_contacts.assert_called_once_with(
+            'ms-token', self.ENDPOINT, None, select=self.source._select
+        )
+
+    def test_that_derived_fields_are_computed_on_sync(self):
+        result = self.source.list(['1'], args=self.ARGS)
+
+        assert_that(
+            result[0].fields,
+            has_entries(numbers=['5555551234', '4185553212'], email=None),
+        )
+
+    def test_that_all_contacts_are_fetched_without_delta_query(self):
+        self.source.load(TestOffice365Plugin.DEPENDENCIES)
+        self.source.office365 = Mock()
+        self.source.office365.get_contacts.return_value = ([self.peach], 1)
+
+        result = self.source.first_match('5555551234', args=self.ARGS)
+
+        assert_that(result.fields, has_entries(givenName='Peach'))
+        self.source.office365.sync_contacts.assert_not_called()
+
+    def test_that_unsupported_delta_queries_are_not_sent_again(self):
+        self.source.office365.sync_contacts.side_effect = UnexpectedEndpointException(
+            error_code=404
+        )
+        self.source.office365.get_contacts.return_value = ([self.peach], 1)
+
+        first = self.source._sync_contacts('ms-token', None)
+        second = self.source._sync_contacts('ms-token', None)
+
+        assert_that(first, equal_to(second))
+        self.source.office365.sync_contacts.assert_called_once()
+        assert_that(self.source.office365.get_contacts.call_count, equal_to(2))
+
+    def test_that_refused_delta_queries_are_sent_again(self):
+        self.source.office365.sync_contacts.side_effect = UnexpectedEndpointException(
+            error_code=400
+        )
+        self.source.office365.get_contacts.return_value = ([self.peach], 1)
+
+        first = self.source._sync_contacts('ms-token', None)
+        self.source._sync_contacts('ms-token', None)
+
+        assert_that(first, equal_to(([self.peach], [], None)))
+        assert_that(self.source.office365.sync_contacts.call_count, equal_to(2))
+
+    def test_that_a_failed_delta_query_keeps_the_contacts(self):
+        self.source.office365.sync_contacts.side_effect = UnexpectedEndpointException(
+            error_code=503
+        )
+
+        result = self.source._sync_contacts('ms-token', None)
+
+        assert_that(result, equal_to(None))
+        self.source.office365.get_contacts.assert_not_called()
+
+    def test_that_only_the_configured_fields_are_selected(self):
+        dependencies = {
+            'config': dict(
+                TestOffice365Plugin.DEPENDENCIES['config'],
+                searched_columns=['companyName', 'numbers'],
+                format_columns={'title': '{jobTitle}', 'phone': '{numbers[0]}'},
+            )
+        }
+
+        self.source.load(dependencies)
+
+        assert_that(
+            self.source._select,
+            contains_inanyorder(
+                'id',
+                'displayName',
+                'givenName',
+                'surname',
+                'emailAddresses',
+                'businessPhones',
+                'homePhones',
+                'mobilePhone',
+                'companyName',
+                'jobTitle',
+            ),
+        )
@@ -0,0 +1,93 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+from hamcrest import assert_that, calling, contains, equal_to, has_entries, raises
+from mock import Mock, patch
+
+from wazo_dird.plugin_helpers.user_contact_cache import SyncStateExpired
+
+from .. import services
+
+URL = 'https://graph.microsoft.com/v1.0/me/contacts'
+FOLDER_URL = 'https://graph.microsoft.com/v1.0/me/contactFolders/abc/contacts'
+
+
+def _response(status_code=200, **body):
+    return Mock(status_code=status_code, json=Mock(return_value=body))
+
+
+class TestOffice365Service(unittest.TestCase):
+    def setUp(self):
+        self.service = services.Office365Service()
+
+    def test_that_contacts_are_fetched_page_by_page(self):
+        pages = [
+            _response(value=[{'id': '1'}], **{'@odata.nextLink': URL + '?skip=1'}),
+            _response(value=[{'id': '2'}]),
+        ]
+
+        with patch.object(services.requests, 'get', side_effect=pages) as get:
+            contacts, total = self.service.get_contacts(
+                'token', URL, select=['id', 'givenName']
+            )
+
+        assert_that(contacts, contains({'id': '1'}, {'id': '2'}))
+        assert_that(total, equal_to(2))
+        first_call, second_call = get.call_args_list
+        assert_that(
+            first_call[1]['params'],
+            equal_to({'$top': services.PAGE_SIZE, '$select': 'id,givenName'}),
+        )
+        assert_that(second_call[0], contains(URL + '?skip=1'))
+        assert_that(second_call[1]['params'], equal_to(None))
+
+    def test_that_delta_queries_return_the_removed_contacts(self):
+        pages = [
+            _response(
+                value=[{'id': '1'}, {'id': '2', '@removed': {'reason': 'deleted'}}],
+                **{'@odata.deltaLink': URL + '/delta?token=next'}
+            )
+        ]
+
+        with patch.object(services.requests, 'get', side_effect=pages) as get:
+            result = self.service.sync_contacts('token', URL, URL + '/delta?token=a')
+
+        assert_that(result, equal_to(([{'id': '1'}], ['2'], URL + '/delta?token=next')))
+        assert_that(get.call_args[0], contains(URL + '/delta?token=a'))
+
+    def test_that_expired_delta_links_raise(self):
+        with patch.object(services.requests, 'get', return_value=_response(410)):
+            assert_that(
+                calling(self.service.sync_contacts).with_args('token', URL, 'link'),
+                raises(SyncStateExpired),
+            )
+
+    def test_that_a_gone_full_sync_is_an_endpoint_error(self):
+        with patch.object(services.requests, 'get', return_value=_response(410)):
+            assert_that(
+                calling(self.service.sync_contacts).with_args('token', FOLDER_URL),
+                raises(services.UnexpectedEndpointException),
+            )
+
+    def test_that_the_first_delta_query_selects_the_fields(self):
+        response = _response(value=[], **{'@odata.deltaLink': 'link'})
+
+        with patch.object(services.requests, 'get', return_value=response) as get:
+            self.service.sync_contacts('token', FOLDER_URL + '/', select=['id'])
+
+        assert_that(get.call_args[0], contains(FOLDER_URL + '/delta'))
+        assert_that(get.call_args[1]['params'], equal_to({'$select': 'id'}))
+        assert_that(
+            get.call_args[1]['headers'],
+            has_entries(Prefer='odata.maxpagesize={}'.format(services.PAGE_SIZE)),
+        )
+
+    def test_that_only_contact_folders_have_a_delta_url(self):
+        assert_that(services.delta_url(URL), equal_to(None))
+        assert_that(services.delta_url(URL + '/delta'), equal_to(None))
+        assert_that(
+            services.delta_url(FOLDER_URL + '?a=b'),
+            equal_to(FOLDER_URL + '/delta?a=b'),
+        )
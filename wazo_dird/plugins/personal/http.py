@@ -1,8 +1,10 @@
 # Copyright 2015-2019 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import codecs
 import csv
 import io
+import json
 import logging
 import re
 
@@ -15,11 +17,14 @@ from xivo.rest_api_helpers import APIException
 
 from wazo_dird import auth
 from wazo_dird.auth import required_acl
+from wazo_dird.exception import NoSuchImportJob
+from wazo_dird.plugin_helpers.import_jobs import spool_upload
 from wazo_dird.rest_api import LegacyAuthResource
 
 logger = logging.getLogger(__name__)
 
 CHARSET_REGEX = re.compile('.*; *charset *= *(.*)')
+EXPORT_CHUNK_SIZE = 64 * 1024
 
 
 parser = reqparse.RequestParser()
@@ -66,14 +71,12 @@ class PersonalAll(LegacyAuthResource):
     def get(self):
         user_uuid = _get_calling_user_uuid()
 
-        contacts = self.personal_service.list_contacts_raw(user_uuid)
-
         mimetype = request.mimetype
         if not mimetype:
             args = parser.parse_args()
             mimetype = args.get('format', None)
 
-        return self.contacts_formatter(mimetype)(contacts)
+        return self.contacts_formatter(mimetype)(user_uuid)
 
     @required_acl('dird.personal.delete')
     def delete(self):
@@ -83,37 +86,76 @@ class PersonalAll(LegacyAuthResource):
 
         return '', 204
 
-    @classmethod
-    def contacts_formatter(cls, mimetype):
-        formatters = {'text/csv': cls.format_csv, 'application/json': cls.format_json}
-        return formatters.get(mimetype, cls.format_json)
-
-    @staticmethod
-    def format_csv(contacts):
-        if not contacts:
+    def contacts_formatter(self, mimetype):
+        formatters = {
+            'text/csv': self.format_csv,
+            'application/x-ndjson': self.format_ndjson,
+            'application/json': self.format_json,
+        }
+        return formatters.get(mimetype, self.format_json)
+
+    def format_csv(self, user_uuid):
+        fieldnames = self.personal_service.list_contact_fieldnames(user_uuid)
+        if not fieldnames:
             return '', 204
-        csv_text = io.StringIO()
-        fieldnames = sorted(
-            list(set(attribute for contact in contacts for attribute in contact))
-        )
-        for contact in contacts:
-            for attribute in contact:
-                if contact[attribute] is None:
-                    contact[attribute] = ''
-        csv_writer = csv.DictWriter(csv_text, fieldnames)
-        csv_writer.writeheader()
-        csv_writer.writerows(contacts)
+
+        contacts = self.personal_service.iter_contacts_raw(user_uuid)
         return Response(
-            response=csv_text.getvalue(),
+            response=_csv_chunks(fieldnames, contacts),
             status=200,
             content_type='text/csv; charset=utf-8',
         )
 
-    @staticmethod
-    def format_json(contacts):
+    def format_ndjson(self, user_uuid):
+        contacts = self.personal_service.iter_contacts_raw(user_uuid)
+        return Response(
+            response=_ndjson_chunks(contacts),
+            status=200,
+            content_type='application/x-ndjson; charset=utf-8',
+        )
+
+    def format_json(self, user_uuid):
+        contacts = self.personal_service.list_contacts_raw(user_uuid)
         return {'items': contacts}, 200
 
 
+def _csv_chunks(fieldnames, contacts):
+    buffer = io.StringIO()
+    # A contact created after the fieldnames were listed may have other fields
+    writer = csv.DictWriter(buffer, fieldnames, extrasaction='ignore')
+    writer.writeheader()
+    return _buffered_chunks(buffer, writer.writerow, contacts)
+
+
+def _ndjson_chunks(contacts):
+    buffer = io.StringIO()
+
+    def write(contact):
+        buffer.write(json.dumps(contact))
+        buffer.write('\n')
+
+    return _buffered_chunks(buffer, write, contacts)
+
+
+def _buffered_chunks(buffer, write, contacts):
+    try:
+        for contact in contacts:
+            write(contact)
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        chunk = buffer.getvalue()
+        if chunk:
+            yield chunk
+    finally:
+        # Releases the database session of the contacts when the client disconnects
+        close = getattr(contacts, 'close', None)
+        if close:
+            close()
+
+
 class PersonalOne(LegacyAuthResource):
 
     personal_service = None
@@ -201,3 +243,49 @@ class PersonalImport(LegacyAuthResource):
     def _mass_import(self, csv_document, user_uuid):
         reader = csv.DictReader(csv_document.split('\n'))
         return self.personal_service.create_contacts(reader, user_uuid)
+
+
+class PersonalImportJobAll(LegacyAuthResource):
+
+    personal_service = None
+
+    @classmethod
+    def configure(cls, personal_service):
+        cls.personal_service = personal_service
+
+    @required_acl('dird.personal.import.create')
+    def post(self):
+        user_uuid = _get_calling_user_uuid()
+
+        charset = request.mimetype_params.get('charset', 'utf-8')
+        try:
+            codecs.lookup(charset)
+        except LookupError as e:
+            error = {'reason': [str(e)], 'timestamp': [time()], 'status_code': 400}
+            return error, 400
+
+        document = spool_upload(request.stream)
+        try:
+            job = self.personal_service.start_import(user_uuid, document, charset)
+        except Exception:
+            document.close()
+            raise
+        return job, 202
+
+
+class PersonalImportJobOne(LegacyAuthResource):
+
+    personal_service = None
+
+    @classmethod
+    def configure(cls, personal_service):
+        cls.personal_service = personal_service
+
+    @required_acl('dird.personal.import.{job_uuid}.read')
+    def get(self, job_uuid):
+        user_uuid = _get_calling_user_uuid()
+        try:
+            return self.personal_service.get_import(user_uuid, job_uuid), 200
+        except NoSuchImportJob as e:
+            error = {'reason': [str(e)], 'timestamp': [time()], 'status_code': 404}
+            return error, 404
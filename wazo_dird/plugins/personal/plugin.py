@@ -6,7 +6,13 @@ import re
 
 from wazo_dird import BaseViewPlugin
 
-from .http import PersonalAll, PersonalImport, PersonalOne
+from .http import (
+    PersonalAll,
+    PersonalImport,
+    PersonalImportJobAll,
+    PersonalImportJobOne,
+    PersonalOne,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +24,8 @@ class PersonalViewPlugin(BaseViewPlugin):
     personal_all_url = '/personal'
     personal_one_url = '/personal/<contact_id>'
     personal_import_url = '/personal/import'
+    personal_import_job_all_url = '/personal/imports'
+    personal_import_job_one_url = '/personal/imports/<job_uuid>'
 
     def load(self, dependencies):
         api = dependencies['api']
@@ -26,6 +34,10 @@ class PersonalViewPlugin(BaseViewPlugin):
             PersonalAll.configure(personal_service)
             PersonalOne.configure(personal_service)
             PersonalImport.configure(personal_service)
+            PersonalImportJobAll.configure(personal_service)
+            PersonalImportJobOne.configure(personal_service)
             api.add_resource(PersonalAll, self.personal_all_url)
             api.add_resource(PersonalOne, self.personal_one_url)
             api.add_resource(PersonalImport, self.personal_import_url)
+            api.add_resource(PersonalImportJobAll, self.personal_import_job_all_url)
+            api.add_resource(PersonalImportJobOne, self.personal_import_job_one_url)
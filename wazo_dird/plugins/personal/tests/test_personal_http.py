@@ -0,0 +1,83 @@
+# Copyright 2021 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import json
+
+from unittest import TestCase
+
+from hamcrest import assert_that, equal_to
+from mock import Mock, patch, sentinel as s
+
+from .. import http
+from ..http import PersonalAll
+
+
+class TestPersonalExport(TestCase):
+    def setUp(self):
+        self.service = Mock()
+        PersonalAll.configure(self.service)
+        self.resource = PersonalAll()
+
+    def test_that_an_empty_csv_export_returns_204(self):
+        self.service.list_contact_fieldnames.return_value = []
+
+        result = self.resource.format_csv(s.user_uuid)
+
+        assert_that(result, equal_to(('', 204)))
+        self.service.iter_contacts_raw.assert_not_called()
+
+    def test_that_the_csv_export_mixes_all_the_fields(self):
+        self.service.list_contact_fieldnames.return_value = ['firstname', 'id']
+        self.service.iter_contacts_raw.return_value = iter(
+            [{'id': '1', 'firstname': 'Alice'}, {'id': '2', 'lastname': 'Bob'}]
+        )
+
+        response = self.resource.format_csv(s.user_uuid)
+
+        assert_that(response.status_code, equal_to(200))
+        assert_that(
+            response.get_data(as_text=True),
+            equal_to('firstname,id\r\nAlice,1\r\n,2\r\n'),
+        )
+
+    def test_that_the_ndjson_export_returns_a_contact_per_line(self):
+        contacts = [{'id': '1', 'firstname': 'Alice'}, {'id': '2'}]
+        self.service.iter_contacts_raw.return_value = iter(contacts)
+
+        response = self.resource.format_ndjson(s.user_uuid)
+
+        lines = response.get_data(as_text=True).splitlines()
+        assert_that([json.loads(line) for line in lines], equal_to(contacts))
+
+    def test_that_the_export_is_streamed_by_chunks(self):
+        contacts = [{'id': str(i), 'firstname': 'Alice'} for i in range(10)]
+        self.service.iter_contacts_raw.return_value = iter(contacts)
+
+        with patch.object(http, 'EXPORT_CHUNK_SIZE', 64):
+            chunks = list(self.resource.format_ndjson(s.user_uuid).response)
+
+        assert_that(len(chunks) > 1, equal_to(True))
+        assert_that(
+            [json.loads(line) for line in ''.join(chunks).splitlines()],
+            equal_to(contacts),
+        )
+
+    def test_that_the_contacts_are_released_when_the_client_disconnects(self):
+        released = []
+
+        def contacts():
+            try:
+                for i in range(10):
+                    yield {'id': str(i), 'firstname': 'Alice'}
+            finally:
+                released.append(True)
+
+        self.service.list_contact_fieldnames.return_value = ['firstname', 'id']
+        self.service.iter_contacts_raw.return_value = contacts()
+
+        with patch.object(http, 'EXPORT_CHUNK_SIZE', 16):
+            response = self.resource.format_csv(s.user_uuid)
+            next(iter(response.response))
+            response.close()
+
+        assert_that(released, equal_to([True]))
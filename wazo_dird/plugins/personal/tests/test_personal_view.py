@@ -7,7 +7,13 @@ from hamcrest import assert_that, equal_to
 from mock import Mock
 
 from ..plugin import PersonalViewPlugin
-from ..http import PersonalAll, PersonalImport, PersonalOne
+from ..http import (
+    PersonalAll,
+    PersonalImport,
+    PersonalImportJobAll,
+    PersonalImportJobOne,
+    PersonalOne,
+)
 
 
 class TestPersonalView(TestCase):
@@ -41,3 +47,9 @@ class TestPersonalView(TestCase):
         self.api.add_resource.assert_any_call(
             PersonalImport, PersonalViewPlugin.personal_import_url
         )
+        self.api.add_resource.assert_any_call(
+            PersonalImportJobAll, PersonalViewPlugin.personal_import_job_all_url
+        )
+        self.api.add_resource.assert_any_call(
+            PersonalImportJobOne, PersonalViewPlugin.personal_import_job_one_url
+        )
@@ -6,11 +6,13 @@ import logging
 from wazo_dird import BaseServicePlugin
 from wazo_dird import database, exception
 from wazo_dird.database.helpers import Session
+from wazo_dird.plugin_helpers.import_jobs import ImportJobs, read_csv_batches
 
 logger = logging.getLogger(__name__)
 
 
 UNIQUE_COLUMN = 'id'
+IMPORT_BATCH_SIZE = 1000
 
 
 class PersonalImportError(ValueError):
@@ -18,6 +20,9 @@ class PersonalImportError(ValueError):
 
 
 class PersonalServicePlugin(BaseServicePlugin):
+
+    _service = None
+
     def load(self, dependencies):
         try:
             config = dependencies['config']
@@ -31,7 +36,13 @@ class PersonalServicePlugin(BaseServicePlugin):
             raise ValueError(msg)
 
         crud = database.PersonalContactCRUD(Session)
-        return _PersonalService(config, source_manager, crud, controller)
+        self._service = _PersonalService(config, source_manager, crud, controller)
+        return self._service
+
+    def unload(self):
+        if self._service:
+            self._service.stop()
+            self._service = None
 
 
 class _PersonalService:
@@ -50,19 +61,46 @@ class _PersonalService:
         self._config = config
         self._source_manager = source_manager
         self._controller = controller
+        self._import_jobs = ImportJobs()
+
+    def stop(self):
+        self._import_jobs.stop()
 
     def create_contact(self, contact_infos, user_uuid):
         self.validate_contact(contact_infos)
         return self._crud.create_personal_contact(user_uuid, contact_infos)
 
     def create_contacts(self, contact_infos, user_uuid):
+        numbered_contact_infos = [
+            (contact_infos.line_num, contact_info) for contact_info in contact_infos
+        ]
+        return self._create_numbered_contacts(numbered_contact_infos, user_uuid)
+
+    def start_import(self, user_uuid, document, charset):
+        job = self._import_jobs.submit(
+            user_uuid, self._import, document, charset, user_uuid
+        )
+        return job.to_dict()
+
+    def get_import(self, user_uuid, job_uuid):
+        return self._import_jobs.get(user_uuid, job_uuid).to_dict()
+
+    def _import(self, job, document, charset, user_uuid):
+        for batch in read_csv_batches(document, charset, IMPORT_BATCH_SIZE):
+            created, errors = self._create_numbered_contacts(batch, user_uuid)
+            job.created += len(created)
+            for error in errors:
+                job.add_error(error['line'], *error['errors'])
+            job.lines += len(batch)
+
+    def _create_numbered_contacts(self, numbered_contact_infos, user_uuid):
         errors = []
         to_add = []
-        existing_contact_uuids = set(
-            [contact['id'] for contact in self._crud.list_personal_contacts()]
+        existing_contact_uuids = self._crud.find_existing_contact_uuids(
+            self._imported_uuids(numbered_contact_infos)
         )
 
-        for contact_info in contact_infos:
+        for line, contact_info in numbered_contact_infos:
             try:
                 if None in contact_info.keys():
                     raise PersonalImportError('too many fields')
@@ -72,12 +110,21 @@ class _PersonalService:
                 self.validate_contact(contact_info, existing_contact_uuids)
                 to_add.append(contact_info)
             except self.InvalidPersonalContact as e:
-                errors.append({'errors': e.errors, 'line': contact_infos.line_num})
+                errors.append({'errors': e.errors, 'line': line})
             except PersonalImportError as e:
-                errors.append({'errors': [str(e)], 'line': contact_infos.line_num})
+                errors.append({'errors': [str(e)], 'line': line})
 
         return (self._crud.create_personal_contacts(user_uuid, to_add), errors)
 
+    @staticmethod
+    def _imported_uuids(numbered_contact_infos):
+        uuids = set()
+        for _, contact_info in numbered_contact_infos:
+            uuid = contact_info.get('id', contact_info.get('uuid'))
+            if isinstance(uuid, str) and uuid:
+                uuids.add(uuid)
+        return uuids
+
     def get_contact(self, contact_id, user_uuid):
         return self._crud.get_personal_contact(user_uuid, contact_id)
 
@@ -105,6 +152,12 @@ class _PersonalService:
     def list_contacts_raw(self, user_uuid):
         return self._crud.list_personal_contacts(user_uuid)
 
+    def list_contact_fieldnames(self, user_uuid):
+        return self._crud.list_personal_contact_fieldnames(user_uuid)
+
+    def iter_contacts_raw(self, user_uuid):
+        return self._crud.iter_personal_contacts(user_uuid)
+
     def _find_personal_source(self, tenant_uuid):
         source_service = self._controller.services['source']
         for source in source_service.list_('personal', [tenant_uuid]):
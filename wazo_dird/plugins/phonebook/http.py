@@ -1,6 +1,7 @@
 # Copyright 2016-2019 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import codecs
 import logging
 import time
 import csv
@@ -19,9 +20,11 @@ from wazo_dird.exception import (
     InvalidContactException,
     InvalidPhonebookException,
     NoSuchContact,
+    NoSuchImportJob,
     NoSuchPhonebook,
     NoSuchTenant,
 )
+from wazo_dird.plugin_helpers.import_jobs import spool_upload
 from wazo_dird.rest_api import LegacyAuthResource
 
 logger = logging.getLogger(__name__)
@@ -100,6 +103,18 @@ class _ArgParser:
         raise InvalidArgumentError('{} should be a positive integer'.format(name))
 
 
+class _ContactArgParser(_ArgParser):
+    def __init__(self, args):
+        super().__init__(args)
+        self._after = args.get('after')
+
+    def list_params(self):
+        params = super().list_params()
+        if self._after:
+            params['after'] = self._after
+        return params
+
+
 def _default_error_route(f):
     @wraps(f)
     def decorator(self_, *args, **kwargs):
@@ -140,13 +155,10 @@ class ContactAll(_Resource):
     @required_acl('dird.tenants.{tenant}.phonebooks.{phonebook_id}.contacts.read')
     @_default_error_route
     def get(self, tenant, phonebook_id):
-        parser = _ArgParser(request.args)
+        parser = _ContactArgParser(request.args)
         scoping_tenant = Tenant.autodetect()
         matching_tenant = self._find_tenant(scoping_tenant, tenant)
-        count = self.phonebook_service.count_contact(
-            matching_tenant['uuid'], phonebook_id, **parser.count_params()
-        )
-        contacts = self.phonebook_service.list_contact(
+        contacts, count = self.phonebook_service.list_and_count_contact(
             matching_tenant['uuid'], phonebook_id, **parser.list_params()
         )
 
@@ -224,6 +236,52 @@ class ContactImport(_Resource):
         return {'created': created, 'failed': failed}
 
 
+class ContactImportJobAll(_Resource):
+
+    error_code_map = {NoSuchTenant: 404, NoSuchPhonebook: 404}
+
+    @required_acl('dird.tenants.{tenant}.phonebooks.{phonebook_id}.contacts.create')
+    @_default_error_route
+    def post(self, tenant, phonebook_id):
+        scoping_tenant = Tenant.autodetect()
+        matching_tenant = self._find_tenant(scoping_tenant, tenant)
+        charset = request.mimetype_params.get('charset', 'utf-8')
+        try:
+            codecs.lookup(charset)
+        except LookupError as e:
+            return _make_error(str(e), 400)
+
+        document = spool_upload(request.stream)
+        try:
+            job = self.phonebook_service.start_import(
+                matching_tenant['uuid'], phonebook_id, document, charset
+            )
+        except Exception:
+            document.close()
+            raise
+
+        return job, 202
+
+
+class ContactImportJobOne(_Resource):
+
+    error_code_map = {NoSuchTenant: 404, NoSuchImportJob: 404}
+
+    @required_acl(
+        'dird.tenants.{tenant}.phonebooks.{phonebook_id}.contacts.imports.{job_uuid}.read'
+    )
+    @_default_error_route
+    def get(self, tenant, phonebook_id, job_uuid):
+        scoping_tenant = Tenant.autodetect()
+        matching_tenant = self._find_tenant(scoping_tenant, tenant)
+        return (
+            self.phonebook_service.get_import(
+                matching_tenant['uuid'], phonebook_id, job_uuid
+            ),
+            200,
+        )
+
+
 class ContactOne(_Resource):
 
     error_code_map = {
@@ -3,7 +3,15 @@
 
 from wazo_dird import BaseViewPlugin
 
-from .http import ContactAll, ContactImport, ContactOne, PhonebookAll, PhonebookOne
+from .http import (
+    ContactAll,
+    ContactImport,
+    ContactImportJobAll,
+    ContactImportJobOne,
+    ContactOne,
+    PhonebookAll,
+    PhonebookOne,
+)
 
 
 class PhonebookViewPlugin(BaseViewPlugin):
@@ -21,6 +29,16 @@ class PhonebookViewPlugin(BaseViewPlugin):
             '/tenants/<string:tenant>/phonebooks/<int:phonebook_id>/contacts/import',
             resource_class_args=args,
         )
+        api.add_resource(
+            ContactImportJobAll,
+            '/tenants/<string:tenant>/phonebooks/<int:phonebook_id>/contacts/imports',
+            resource_class_args=args,
+        )
+        api.add_resource(
+            ContactImportJobOne,
+            '/tenants/<string:tenant>/phonebooks/<int:phonebook_id>/contacts/imports/<job_uuid>',
+            resource_class_args=args,
+        )
         api.add_resource(
             ContactOne,
             '/tenants/<string:tenant>/phonebooks/<int:phonebook_id>/contacts/<contact_uuid>',
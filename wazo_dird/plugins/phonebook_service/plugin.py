@@ -4,15 +4,17 @@
 import logging
 
 from marshmallow import ValidationError, fields, Schema, validate, pre_load
-from unidecode import unidecode
 
 from wazo_dird import BaseServicePlugin
 from wazo_dird import database
 from wazo_dird.database.helpers import Session
 from wazo_dird.exception import InvalidContactException, InvalidPhonebookException
+from wazo_dird.plugin_helpers.import_jobs import ImportJobs, read_csv_batches
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_IMPORT_BATCH_SIZE = 1000
+
 
 class _PhonebookSchema(Schema):
     name = fields.String(validate=validate.Length(min=1, max=255), required=True)
@@ -24,6 +26,9 @@ class _PhonebookSchema(Schema):
 
 
 class PhonebookServicePlugin(BaseServicePlugin):
+
+    _service = None
+
     def load(self, args):
         self._config = args.get('config')
         if not self._config:
@@ -32,38 +37,37 @@ class PhonebookServicePlugin(BaseServicePlugin):
             )
             raise ValueError(msg)
 
-        return _PhonebookService(
+        service_config = self._config.get('services', {}).get('phonebook', {})
+        self._service = _PhonebookService(
             database.PhonebookCRUD(Session),
             database.PhonebookContactCRUD(Session),
+            service_config.get('import_batch_size', DEFAULT_IMPORT_BATCH_SIZE),
         )
+        return self._service
+
+    def unload(self):
+        if self._service:
+            self._service.stop()
+            self._service = None
 
 
 class _PhonebookService:
-    def __init__(self, phonebook_crud, contact_crud):
+    def __init__(
+        self, phonebook_crud, contact_crud, import_batch_size=DEFAULT_IMPORT_BATCH_SIZE
+    ):
         self._phonebook_crud = phonebook_crud
         self._contact_crud = contact_crud
+        self._import_batch_size = import_batch_size
+        self._import_jobs = ImportJobs()
 
-    def list_contact(
-        self,
-        tenant_uuid,
-        phonebook_id,
-        limit=None,
-        offset=None,
-        order=None,
-        direction=None,
-        **params
-    ):
-        results = self._contact_crud.list(tenant_uuid, phonebook_id, **params)
-        if order:
-            reverse = direction == 'desc'
-            results = sorted(
-                results, key=lambda x: unidecode(x.get(order, '')), reverse=reverse
-            )
-        if offset:
-            results = results[offset:]
-        if limit:
-            results = results[:limit]
-        return results
+    def stop(self):
+        self._import_jobs.stop()
+
+    def list_contact(self, tenant_uuid, phonebook_id, **params):
+        return self._contact_crud.list(tenant_uuid, phonebook_id, **params)
+
+    def list_and_count_contact(self, tenant_uuid, phonebook_id, **params):
+        return self._contact_crud.list_and_count(tenant_uuid, phonebook_id, **params)
 
     def list_phonebook(self, tenant_uuid, **params):
         return self._phonebook_crud.list(tenant_uuid, **params)
@@ -121,11 +125,42 @@ class _PhonebookService:
                 errors.append(contact)
 
         created, failed = self._contact_crud.create_many(
-            tenant_uuid, phonebook_id, to_add
+            tenant_uuid, phonebook_id, to_add, batch_size=self._import_batch_size
         )
 
         return created, failed + errors
 
+    def start_import(self, tenant_uuid, phonebook_id, document, charset):
+        self._phonebook_crud.get(tenant_uuid, phonebook_id)
+        owner = (tenant_uuid, phonebook_id)
+        job = self._import_jobs.submit(
+            owner, self._import, document, charset, tenant_uuid, phonebook_id
+        )
+        return job.to_dict()
+
+    def get_import(self, tenant_uuid, phonebook_id, job_uuid):
+        owner = (tenant_uuid, phonebook_id)
+        return self._import_jobs.get(owner, job_uuid).to_dict()
+
+    def _import(self, job, document, charset, tenant_uuid, phonebook_id):
+        for batch in read_csv_batches(document, charset, self._import_batch_size):
+            to_add, lines = [], {}
+            for line, contact in batch:
+                try:
+                    to_add.append(self._validate_contact(contact))
+                except InvalidContactException as e:
+                    job.add_error(line, str(e))
+                    continue
+                lines[id(contact)] = line
+
+            created, failed = self._contact_crud.create_many(
+                tenant_uuid, phonebook_id, to_add, batch_size=self._import_batch_size
+            )
+            job.created += len(created)
+            for contact in failed:
+                job.add_error(lines[id(contact)], 'duplicated or invalid contact')
+            job.lines += len(batch)
+
     @staticmethod
     def _validate_contact(body):
         if not body:
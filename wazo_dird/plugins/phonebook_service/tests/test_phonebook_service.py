@@ -1,20 +1,26 @@
 # Copyright 2016-2019 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import io
 import unittest
 
 from hamcrest import (
     assert_that,
     calling,
-    contains,
     contains_inanyorder,
     equal_to,
+    has_entries,
     raises,
 )
 from mock import Mock, sentinel as s
 
 from wazo_dird import database
-from wazo_dird.exception import InvalidContactException, InvalidPhonebookException
+from wazo_dird.exception import (
+    InvalidContactException,
+    InvalidPhonebookException,
+    NoSuchPhonebook,
+)
+from wazo_dird.plugin_helpers.import_jobs import ImportJob
 
 from ..plugin import PhonebookServicePlugin as Plugin, _PhonebookService as Service
 
@@ -206,169 +212,37 @@ class TestPhonebookServiceContactAPI(_BasePhonebookServiceTest):
 
 
 class TestPhonebookServiceContactList(_BasePhonebookServiceTest):
-    def setUp(self):
-        super().setUp()
-        self._manolo = {
-            'firstname': 'Manolo',
-            'lastname': 'Laporte-Carpentier',
-            'number': '5551111234',
-        }
-        self._annabelle = {
-            'firstname': 'Ännabelle',
-            'lastname': 'Courval',
-            'number': '5552221234',
-        }
-        self._gary_bob = {'firstname': 'Gary-Bob', 'lastname': 'Derome'}
-        self._antonin = {
-            'firstname': 'Antonin',
-            'lastname': 'Mongeau',
-            'number': '5554441234',
-        }
-        self._simon = {'firstname': 'Simon', 'lastname': "L'Espérance"}
-        self._contacts = [
-            self._manolo,
-            self._annabelle,
-            self._gary_bob,
-            self._antonin,
-            self._simon,
-        ]
-
-    def test_that_list_returns_the_db_result_when_no_pagination_or_sorting(self):
-        self.contact_crud.list.return_value = self._contacts
-
-        result = self.service.list_contact(
-            s.tenant_uuid, s.phonebook_id, search=s.search
-        )
-
-        self.contact_crud.list.assert_called_once_with(
-            s.tenant_uuid, s.phonebook_id, search=s.search
-        )
-        assert_that(result, contains(*self._contacts))
-
-    def test_that_list_can_be_limited(self):
-        self.contact_crud.list.return_value = self._contacts
-
-        result = self.service.list_contact(
-            s.tenant_uuid, s.phonebook_id, search=s.search, limit=2
-        )
-
-        self.contact_crud.list.assert_called_once_with(
-            s.tenant_uuid, s.phonebook_id, search=s.search
-        )
-        assert_that(result, contains(self._manolo, self._annabelle))
-
-    def test_that_list_can_have_an_offset(self):
-        self.contact_crud.list.return_value = self._contacts
-
-        result = self.service.list_contact(
-            s.tenant_uuid, s.phonebook_id, search=s.search, offset=3
-        )
-
-        self.contact_crud.list.assert_called_once_with(
-            s.tenant_uuid, s.phonebook_id, search=s.search
-        )
-        assert_that(result, contains(self._antonin, self._simon))
-
-    def test_that_limit_and_offset_work_togeter(self):
-        self.contact_crud.list.return_value = self._contacts
-
-        result = self.service.list_contact(
-            s.tenant_uuid, s.phonebook_id, search=s.search, offset=1, limit=2
-        )
-
-        self.contact_crud.list.assert_called_once_with(
-            s.tenant_uuid, s.phonebook_id, search=s.search
-        )
-        assert_that(result, contains(self._annabelle, self._gary_bob))
-
-    def test_that_results_can_be_ordered(self):
-        self.contact_crud.list.return_value = self._contacts
-
-        result = self.service.list_contact(
-            s.tenant_uuid, s.phonebook_id, search=s.search, order='firstname'
-        )
-
-        self.contact_crud.list.assert_called_once_with(
-            s.tenant_uuid, s.phonebook_id, search=s.search
-        )
-        assert_that(
-            result,
-            contains(
-                self._annabelle,
-                self._antonin,
-                self._gary_bob,
-                self._manolo,
-                self._simon,
-            ),
-        )
-
-    def test_that_results_can_be_ordered_by_an_unknown_column_with_no_effect(self):
-        self.contact_crud.list.return_value = self._contacts
-
+    def test_list_contact(self):
         result = self.service.list_contact(
             s.tenant_uuid,
             s.phonebook_id,
             search=s.search,
-            order='number',
-            direction='desc',
+            order=s.order,
+            direction=s.direction,
+            limit=s.limit,
+            offset=s.offset,
         )
 
+        assert_that(result, equal_to(self.contact_crud.list.return_value))
         self.contact_crud.list.assert_called_once_with(
-            s.tenant_uuid, s.phonebook_id, search=s.search
-        )
-        assert_that(
-            result,
-            contains_inanyorder(
-                self._manolo,
-                self._antonin,
-                self._annabelle,
-                self._gary_bob,  # no number
-                self._simon,
-            ),
-        )  # no number
-
-    def test_that_the_direction_can_be_specified(self):
-        self.contact_crud.list.return_value = self._contacts
-
-        result = self.service.list_contact(
             s.tenant_uuid,
             s.phonebook_id,
             search=s.search,
-            order='firstname',
-            direction='desc',
-        )
-
-        self.contact_crud.list.assert_called_once_with(
-            s.tenant_uuid, s.phonebook_id, search=s.search
-        )
-        assert_that(
-            result,
-            contains(
-                self._simon,
-                self._manolo,
-                self._gary_bob,
-                self._antonin,
-                self._annabelle,
-            ),
+            order=s.order,
+            direction=s.direction,
+            limit=s.limit,
+            offset=s.offset,
         )
 
-    def test_all(self):
-        self.contact_crud.list.return_value = self._contacts
-
-        result = self.service.list_contact(
-            s.tenant_uuid,
-            s.phonebook_id,
-            search=s.search,
-            order='lastname',
-            direction='desc',
-            limit=3,
-            offset=1,
+    def test_list_and_count_contact(self):
+        result = self.service.list_and_count_contact(
+            s.tenant_uuid, s.phonebook_id, search=s.search, limit=s.limit, after=s.after
         )
 
-        self.contact_crud.list.assert_called_once_with(
-            s.tenant_uuid, s.phonebook_id, search=s.search
+        assert_that(result, equal_to(self.contact_crud.list_and_count.return_value))
+        self.contact_crud.list_and_count.assert_called_once_with(
+            s.tenant_uuid, s.phonebook_id, search=s.search, limit=s.limit, after=s.after
         )
-        assert_that(result, contains(self._manolo, self._simon, self._gary_bob))
 
 
 class TestPhonebookServiceContactImport(_BasePhonebookServiceTest):
@@ -384,3 +258,49 @@ class TestPhonebookServiceContactImport(_BasePhonebookServiceTest):
 
         assert_that(created, equal_to(s.created))
         assert_that(errors, contains_inanyorder(*db_errors + invalids))
+
+    def test_import_by_batches(self):
+        service = Service(self.phonebook_crud, self.contact_crud, import_batch_size=10)
+        self.contact_crud.create_many.return_value = s.created, []
+        contacts = [{'firstname': 'Foo'}, {'firstname': 'Bar'}]
+
+        service.import_contacts(s.tenant_uuid, s.phonebook_id, contacts)
+
+        self.contact_crud.create_many.assert_called_once_with(
+            s.tenant_uuid, s.phonebook_id, contacts, batch_size=10
+        )
+
+    def test_that_no_import_starts_without_a_phonebook(self):
+        self.phonebook_crud.get.side_effect = NoSuchPhonebook(s.phonebook_id)
+        document = Mock()
+
+        assert_that(
+            calling(self.service.start_import).with_args(
+                s.tenant_uuid, s.phonebook_id, document, 'utf-8'
+            ),
+            raises(NoSuchPhonebook),
+        )
+
+    def test_import_job_progress(self):
+        service = Service(self.phonebook_crud, self.contact_crud, import_batch_size=2)
+        self.contact_crud.create_many.side_effect = lambda _, __, contacts, **___: (
+            contacts[:1],
+            contacts[1:],
+        )
+        document = io.BytesIO(b'firstname,lastname\nFoo,Bar\nBar,Foo\n,\nBaz,\n')
+        job = ImportJob(s.owner)
+
+        service._import(job, document, 'utf-8', s.tenant_uuid, s.phonebook_id)
+
+        assert_that(
+            job.to_dict(),
+            has_entries(
+                lines=4,
+                created=2,
+                failed=2,
+                errors=[
+                    {'line': 3, 'errors': ['duplicated or invalid contact']},
+                    {'line': 5, 'errors': ['duplicated or invalid contact']},
+                ],
+            ),
+        )
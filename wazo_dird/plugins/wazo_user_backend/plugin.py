@@ -2,18 +2,24 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import logging
+import threading
+import weakref
 
-from unidecode import unidecode
+from collections import namedtuple
+from itertools import chain
 from requests.exceptions import ConnectionError, RequestException
 
 from wazo_dird import BaseSourcePlugin, make_result_class
-from wazo_dird.helpers import BaseBackendView
+from wazo_dird.helpers import BaseBackendView, normalize
+from wazo_dird.plugin_helpers.bus_event_registry import registry as bus_events
 from wazo_dird.plugin_helpers.confd_client_registry import registry
 
 from . import http
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_RESYNC_INTERVAL = 3600.0
+
 
 class WazoUserView(BaseBackendView):
 
@@ -51,10 +57,14 @@ class WazoUserPlugin(BaseSourcePlugin):
         'voicemail_number',
     ]
     _match_all_supported_columns = ['exten', 'mobile_phone_number']
+    # Below this number of terms, one search per term is cheaper than fetching all the
+    # users when confd cannot filter on all the first matched columns
+    _match_all_fetch_all_min_terms = 10
 
     def __init__(self):
         self._client = None
         self._uuid = None
+        self._replica = None
         self._search_params = {'view': 'directory', 'recurse': True}
 
     def load(self, dependencies):
@@ -68,23 +78,31 @@ class WazoUserPlugin(BaseSourcePlugin):
             'wazo', self.name, 'id', format_columns=config.get(self.FORMAT_COLUMNS)
         )
         self._search_params.update(config.get('extra_search_params', {}))
+        if config.get('replica'):
+            self._replica = _UserReplica(
+                self, config.get('replica_resync_interval', DEFAULT_RESYNC_INTERVAL)
+            )
+            self._replica.start()
         logger.info('Wazo %s successfully loaded', config['name'])
 
     def unload(self):
+        if self._replica:
+            self._replica.stop()
         registry.unregister_all()
 
     def name(self):
         return self.name
 
     def search(self, term, profile=None, args=None):
-        clean_term = unidecode(term.lower())
+        if self._replica_is_ready():
+            return self._replica.search(term)
+
+        clean_term = normalize(term)
         entries = self._fetch_entries(term)
 
         def match_fn(entry):
             for column in self._searched_columns:
-                column_value = entry.fields.get(column) or ''
-                clean_column_value = unidecode(str(column_value).lower())
-                if clean_term in clean_column_value:
+                if clean_term in normalize(entry.fields.get(column)):
                     return True
             return False
 
@@ -92,6 +110,9 @@ class WazoUserPlugin(BaseSourcePlugin):
 
     def first_match(self, term, args=None):
         logger.debug('Looking for "%s"', term)
+        if self._replica_is_ready():
+            return self._replica.first_match(term)
+
         entries = self._fetch_entries(term)
 
         def match_fn(entry):
@@ -108,35 +129,46 @@ class WazoUserPlugin(BaseSourcePlugin):
         return None
 
     def match_all(self, terms, args=None):
-        results = {}
+        if self._replica_is_ready():
+            return self._replica.match_all(terms)
 
-        # NOTE(fblackburn) fallback if one of fields are not supported
         supported = all(
             column in self._match_all_supported_columns
             for column in self._first_matched_columns
         )
+        # NOTE(fblackburn) fallback if there are fewer terms than requests to send
         first_match_faster = len(terms) < len(self._first_matched_columns)
-        if not supported or first_match_faster:
+        if not supported:
+            first_match_faster = (
+                first_match_faster or len(terms) < self._match_all_fetch_all_min_terms
+            )
+        if first_match_faster:
             results = {}
             for term in terms:
                 results[term] = self.first_match(term, args=args)
             return results
 
-        for column in self._first_matched_columns:
+        if supported:
             terms_merged = ','.join(terms)
-            logger.debug('Looking for "%s"="%s"', column, terms)
-            entries = self._fetch_entries(terms_merged, column)
-            for entry in entries:
-                term = entry.fields.get(column)
-                if term in terms:
-                    results[term] = entry
-                    logger.debug('Found a match: %s', entry)
+            logger.debug('Looking for "%s" in %s', terms, self._first_matched_columns)
+            entries = chain.from_iterable(
+                self._fetch_entries(terms_merged, column)
+                for column in self._first_matched_columns
+            )
+        else:
+            # confd cannot filter on all the columns, the users are fetched only once
+            logger.debug('Looking for "%s" in all users', terms)
+            entries = self._fetch_entries()
 
+        results = self._match_terms(terms, entries)
         if not results:
             logger.debug('Found no match')
         return results
 
     def list(self, unique_ids, args=None):
+        if self._replica_is_ready():
+            return self._replica.list(unique_ids)
+
         entries = self._fetch_entries()
 
         def match_fn(entry):
@@ -147,6 +179,24 @@ class WazoUserPlugin(BaseSourcePlugin):
 
         return [entry for entry in entries if match_fn(entry)]
 
+    def _match_terms(self, terms, entries):
+        remaining = set(terms)
+        results = {}
+        for entry in entries:
+            for column in self._first_matched_columns:
+                term = entry.fields.get(column)
+                if term in remaining:
+                    remaining.discard(term)
+                    results[term] = entry
+                    logger.debug('Found a match: %s', entry)
+            if not remaining:
+                break
+        return results
+
+    def _replica_is_ready(self):
+        # Until its first load, the replica is not used
+        return self._replica is not None and self._replica.is_ready()
+
     def _fetch_entries(self, term=None, column='search'):
         try:
             uuid = self._get_uuid()
@@ -204,3 +254,162 @@ class WazoUserPlugin(BaseSourcePlugin):
             user_uuid=entry['uuid'],
             endpoint_id=entry['line_id'],
         )
+
+
+# The indexes hold positions in `users`, a new result is built for each lookup
+_ReplicaContent = namedtuple(
+    '_ReplicaContent', ['uuid', 'users', 'searched', 'first_matched', 'unique']
+)
+
+
+class _UserReplica:
+
+    # A burst of bus events triggers a single reload after this delay
+    RELOAD_DELAY = 1.0
+    EVENTS = [
+        'user_created',
+        'user_edited',
+        'user_deleted',
+        'user_line_associated',
+        'user_line_dissociated',
+        'user_voicemail_associated',
+        'user_voicemail_dissociated',
+        'line_edited',
+        'line_extension_associated',
+        'line_extension_dissociated',
+        'extension_edited',
+        'voicemail_edited',
+    ]
+
+    def __init__(self, source, resync_interval):
+        self._source = source
+        self._resync_interval = resync_interval
+        self._content = None
+        self._stopped = threading.Event()
+        self._outdated = threading.Event()
+
+    def start(self):
+        for event_name in self.EVENTS:
+            bus_events.subscribe(event_name, self.on_event)
+
+        thread = threading.Thread(
+            target=_replicate,
+            args=(
+                weakref.ref(self),
+                self._stopped,
+                self._outdated,
+                self._resync_interval,
+                self.RELOAD_DELAY,
+            ),
+            name='wazo-replica-{}'.format(self._source.name),
+        )
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        for event_name in self.EVENTS:
+            bus_events.unsubscribe(event_name, self.on_event)
+        self._stopped.set()
+        self._outdated.set()
+
+    def is_ready(self):
+        return self._content is not None
+
+    def on_event(self, body):
+        if self._is_from_another_stack(body):
+            return
+        logger.debug('%s: %s received, reloading', self._source.name, body['name'])
+        self._outdated.set()
+
+    def reload(self):
+        try:
+            uuid = self._source._get_uuid()
+            users = list(self._source._fetch_users())
+        except RequestException as e:
+            logger.info(
+                '%s: cannot reload the users, keeping the last ones: %s',
+                self._source.name,
+                e,
+            )
+            return
+
+        self._content = self._new_content(uuid, users)
+        logger.debug('%s: replicated %s users', self._source.name, len(users))
+
+    def search(self, term):
+        content = self._content
+        clean_term = normalize(term)
+        return [
+            self._result(content, position)
+            for position, values in enumerate(content.searched)
+            if any(clean_term in value for value in values)
+        ]
+
+    def first_match(self, term):
+        content = self._content
+        position = content.first_matched.get(term)
+        if position is None:
+            return None
+        return self._result(content, position)
+
+    def match_all(self, terms):
+        content = self._content
+        return {
+            term: self._result(content, content.first_matched[term])
+            for term in terms
+            if term in content.first_matched
+        }
+
+    def list(self, unique_ids):
+        content = self._content
+        return [
+            self._result(content, content.unique[unique_id])
+            for unique_id in dict.fromkeys(unique_ids)
+            if unique_id in content.unique
+        ]
+
+    def _result(self, content, position):
+        return self._source._source_result_from_entry(
+            content.users[position], content.uuid
+        )
+
+    def _new_content(self, uuid, users):
+        searched, first_matched, unique = [], {}, {}
+        for position, user in enumerate(users):
+            entry = self._source._source_result_from_entry(user, uuid)
+            searched.append(
+                [
+                    normalize(entry.fields.get(column))
+                    for column in self._source._searched_columns
+                ]
+            )
+            for column in self._source._first_matched_columns:
+                value = entry.fields.get(column)
+                if value:
+                    first_matched.setdefault(value, position)
+            unique.setdefault(entry.get_unique(), position)
+        return _ReplicaContent(uuid, users, searched, first_matched, unique)
+
+    def _is_from_another_stack(self, body):
+        origin_uuid = body.get('origin_uuid')
+        if not origin_uuid:
+            return False
+
+        try:
+            return origin_uuid != self._source._get_uuid()
+        except RequestException:
+            return False
+
+
+def _replicate(replica_ref, stopped, outdated, resync_interval, reload_delay):
+    while True:
+        replica = replica_ref()
+        if replica is None:
+            return
+        replica.reload()
+        del replica
+
+        outdated.wait(resync_interval)
+        if stopped.wait(reload_delay if outdated.is_set() else 0):
+            return
+        outdated.clear()
@@ -3,6 +3,7 @@
 
 from marshmallow import EXCLUDE
 from xivo.mallow import fields
+from xivo.mallow.validate import Range
 from xivo.mallow_helpers import ListSchema as _ListSchema
 from wazo_dird.schemas import (
     AuthConfigSchema,
@@ -19,6 +20,8 @@ class SourceSchema(BaseSourceSchema):
     confd = fields.Nested(
         ConfdConfigSchema, missing=lambda: ConfdConfigSchema().load({}), unknown=EXCLUDE
     )
+    replica = fields.Boolean(missing=False)
+    replica_resync_interval = fields.Float(validate=Range(min=1), missing=3600.0)
 
 
 class ListSchema(_ListSchema):
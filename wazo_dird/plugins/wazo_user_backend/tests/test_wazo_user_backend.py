@@ -16,7 +16,7 @@ from mock import Mock, call, patch
 from requests import RequestException
 
 from wazo_dird import make_result_class
-from ..plugin import WazoUserPlugin
+from ..plugin import WazoUserPlugin, _UserReplica
 
 TENANT_UUID = '02153e33-4b59-4a9f-8cd1-7e917b306e1d'
 AUTH_CONFIG = {
@@ -242,14 +242,41 @@ class TestWazoUserBackendSearch(_BaseTest):
 
         assert_that(result, has_entries({}))
 
-    def test_match_all_when_not_supported_column_then_fallback(self):
-        self._source._first_matched_columns = ['exten', 'unsupported']
+    def test_match_all_when_not_supported_column_then_fetch_all_users(self):
+        self._source._first_matched_columns = ['exten', 'userfield']
+        self._source._match_all_fetch_all_min_terms = 3
 
-        self._source.match_all(['12', '34'])
+        result = self._source.match_all(['666', '555', '34'])
 
-        call1 = call(recurse=True, view='directory', search='12')
-        call2 = call(recurse=True, view='directory', search='34')
-        self._confd_client.users.list.assert_has_calls([call1, call2])
+        self._confd_client.users.list.assert_called_once_with(
+            recurse=True, view='directory'
+        )
+        assert_that(result, equal_to({'666': SOURCE_1, '555': SOURCE_2}))
+
+    def test_match_all_when_not_supported_column_and_few_terms_then_fallback(self):
+        self._source._first_matched_columns = ['exten', 'userfield']
+
+        self._source.match_all(['666', '555'])
+
+        self._confd_client.users.list.assert_has_calls(
+            [
+                call(recurse=True, view='directory', search='666'),
+                call(recurse=True, view='directory', search='555'),
+            ]
+        )
+        assert_that(self._confd_client.users.list.call_count, equal_to(2))
+
+    def test_match_all_when_many_columns_match_then_first_entry_wins(self):
+        self._source._first_matched_columns = ['exten', 'mobile_phone_number']
+        user = dict(CONFD_USER_2, mobile_phone_number='666')
+        self._confd_client.users.list.return_value = {
+            'items': [user, CONFD_USER_1],
+            'total': 2,
+        }
+
+        result = self._source.match_all(['666', '1234'])
+
+        assert_that(result['666'].fields, has_entries(id=227))
 
     def test_match_all_when_first_match_faster_then_fallback(self):
         self._source._first_matched_columns = ['exten', 'mobile_phone_number']
@@ -300,3 +327,79 @@ class TestWazoUserBackendSearch(_BaseTest):
         result = self._source._fetch_entries()
 
         assert_that(result, empty())
+
+
+class TestWazoUserBackendReplica(_BaseTest):
+    def setUp(self):
+        super().setUp()
+        response = {'items': [CONFD_USER_1, CONFD_USER_2], 'total': 2}
+        self._confd_client.users.list.return_value = response
+        self._confd_client.infos.return_value = {'uuid': UUID}
+        self._source.name = 'my_test_xivo'
+        self._source._SourceResult = SourceResult
+        self._source._searched_columns = ['firstname', 'lastname']
+        self._source._first_matched_columns = ['exten', 'mobile_phone_number']
+        self._replica = _UserReplica(self._source, 3600)
+        self._source._replica = self._replica
+
+    def test_that_the_replica_is_not_used_before_its_first_load(self):
+        self._source.search(term='paul')
+
+        self._confd_client.users.list.assert_called_once_with(
+            recurse=True, view='directory', search='paul'
+        )
+
+    def test_search(self):
+        self._replica.reload()
+        self._confd_client.users.list.reset_mock()
+
+        result = self._source.search(term='accént')
+
+        assert_that(result, contains(SOURCE_2))
+        self._confd_client.users.list.assert_not_called()
+
+    def test_first_match(self):
+        self._replica.reload()
+
+        assert_that(self._source.first_match('5555551234'), equal_to(SOURCE_1))
+        assert_that(self._source.first_match('5555'), none())
+
+    def test_match_all(self):
+        self._replica.reload()
+
+        result = self._source.match_all(['666', '1234', '42'])
+
+        assert_that(result, equal_to({'666': SOURCE_1, '1234': SOURCE_2}))
+
+    def test_list(self):
+        self._replica.reload()
+
+        result = self._source.list(unique_ids=['227', '42', '227'])
+
+        assert_that(result, contains(SOURCE_2))
+
+    def test_that_the_last_users_are_kept_when_the_reload_fails(self):
+        self._replica.reload()
+        self._confd_client.users.list.side_effect = RequestException()
+
+        self._replica.reload()
+
+        assert_that(self._source.list(unique_ids=['226']), contains(SOURCE_1))
+
+    def test_that_local_events_mark_the_replica_outdated(self):
+        self._replica.on_event({'name': 'user_edited', 'origin_uuid': UUID})
+
+        assert_that(self._replica._outdated.is_set(), is_(True))
+
+    def test_that_events_from_another_stack_are_ignored(self):
+        self._replica.on_event({'name': 'user_edited', 'origin_uuid': 'other'})
+
+        assert_that(self._replica._outdated.is_set(), is_(False))
+
+    def test_that_each_lookup_returns_new_results(self):
+        self._replica.reload()
+
+        result = self._source.first_match('666')
+        result.fields['favorite'] = True
+
+        assert_that(self._source.first_match('666'), equal_to(SOURCE_1))
@@ -6,7 +6,7 @@ import unittest
 from hamcrest import assert_that
 from hamcrest import equal_to
 
-from wazo_dird.helpers import RaiseStopper
+from wazo_dird.helpers import RaiseStopper, normalize, used_fields
 
 
 def _ok(ignored, returned):
@@ -30,3 +30,28 @@ class TestNoThrowExecute(unittest.TestCase):
         result = RaiseStopper(return_on_raise=['one', 'two']).execute(_throwing)
 
         assert_that(result, equal_to(['one', 'two']))
+
+
+class TestNormalize(unittest.TestCase):
+    def test_that_values_are_lowercased_and_transliterated(self):
+        assert_that(normalize('Àccént'), equal_to('accent'))
+
+    def test_that_non_string_values_are_normalized(self):
+        assert_that(normalize(None), equal_to(''))
+        assert_that(normalize(1234), equal_to('1234'))
+
+
+class TestUsedFields(unittest.TestCase):
+    def test_that_format_columns_fields_are_included(self):
+        fields = used_fields(
+            ['name'],
+            ['numbers'],
+            {'phone': '{numbers_by_label[mobile]}', 'title': '{org.title} {name}'},
+        )
+
+        assert_that(fields, equal_to({'name', 'numbers', 'numbers_by_label', 'org'}))
+
+    def test_that_invalid_format_strings_are_ignored(self):
+        fields = used_fields([], [], {'broken': '{name'})
+
+        assert_that(fields, equal_to(set()))